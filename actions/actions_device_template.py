@@ -12,5 +12,8 @@ OFFSETS = {
     # "MOVE_START": (0, 0),
     # "TURN_180_R": (0, 0),
 }
+# 4) Input transport: None follows AUTO_INPUT_TRANSPORT (default "persistent").
+#    Also "oneshot", "sendevent" or "scrcpy".
+TRANSPORT = None
 
-bind_actions(globals(), mapping_module=MAPPING_MODULE, offsets=OFFSETS)
+bind_actions(globals(), mapping_module=MAPPING_MODULE, offsets=OFFSETS, transport=TRANSPORT)
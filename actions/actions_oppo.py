@@ -2,5 +2,6 @@ from .global_actions import bind_actions
 
 MAPPING_MODULE = "mapping.oppo_findx9pro"
 OFFSETS = {}
+TRANSPORT = None
 
-bind_actions(globals(), mapping_module=MAPPING_MODULE, offsets=OFFSETS)
+bind_actions(globals(), mapping_module=MAPPING_MODULE, offsets=OFFSETS, transport=TRANSPORT)
@@ -0,0 +1,164 @@
+"""Per-device dispatch latency of the input transports, and its compensation.
+
+A tap call returns once the device ran `input tap`; a swipe call once the
+gesture of duration_ms finished. Whatever a call takes beyond the gesture is
+dispatch overhead (host process or shell round trip, `input` start-up on the
+phone). tools/calibrate_dispatch.py measures its distribution per transport
+kind and stores it next to the device's mapping module, e.g.
+mapping/oppo_findx9pro.dispatch.json.
+
+With AUTO_DISPATCH_COMPENSATION=1 the step scheduler shortens the STEP_DELAY
+sleep after each step by the calibrated median overhead of the taps and swipes
+the step sent, down to AUTO_DISPATCH_MIN_GAP_SEC. A step then takes its
+nominal duration plus STEP_DELAY on every phone, whatever its transport costs.
+Only the legacy StepScheduler sleeps STEP_DELAY after a step: with
+AUTO_DEADLINE_SCHEDULER=1 or AUTO_COMPILED_ROUTES=1 steps start at absolute
+deadlines that already absorb the overhead, so no compensator is built there.
+"""
+import importlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence
+
+from .transport import InputTransport, add_dispatch_hook
+
+DISPATCH_COMPENSATION = os.environ.get("AUTO_DISPATCH_COMPENSATION", "0") == "1"
+DISPATCH_MIN_GAP_SEC = float(os.environ.get("AUTO_DISPATCH_MIN_GAP_SEC", "0.1"))
+
+
+@dataclass(frozen=True)
+class LatencyStats:
+    count: int
+    p10_ms: float
+    p50_ms: float
+    p90_ms: float
+    max_ms: float
+
+    @classmethod
+    def from_samples(cls, samples_ms: Sequence[float]) -> "LatencyStats":
+        ordered = sorted(samples_ms)
+        if not ordered:
+            raise ValueError("no latency samples")
+
+        def quantile(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+
+        return cls(len(ordered), quantile(0.1), quantile(0.5), quantile(0.9), round(ordered[-1], 2))
+
+    def describe(self) -> str:
+        return (
+            f"n={self.count} p10={self.p10_ms:.1f}ms p50={self.p50_ms:.1f}ms "
+            f"p90={self.p90_ms:.1f}ms max={self.max_ms:.1f}ms"
+        )
+
+
+@dataclass(frozen=True)
+class DispatchLatency:
+    transport: str
+    tap: LatencyStats
+    swipe: LatencyStats
+    swipe_ms: int
+    measured: str
+
+    def overhead_sec(self, kind: str) -> float:
+        return (self.tap if kind == "tap" else self.swipe).p50_ms / 1000.0
+
+
+def profile_path(mapping_module: str) -> str:
+    """mapping/<device>.dispatch.json next to the device's mapping module."""
+    module = importlib.import_module(mapping_module)
+    base, _ = os.path.splitext(module.__file__)
+    return base + ".dispatch.json"
+
+
+def measure(transport: InputTransport, count: int, x: int, y: int, swipe_ms: int) -> Dict[str, List[float]]:
+    """Overhead samples (ms) of `count` taps and `count` zero-distance swipes at (x, y)."""
+    samples: Dict[str, List[float]] = {"tap": [], "swipe": []}
+    for _ in range(count):
+        started = time.perf_counter()
+        transport.tap(x, y)
+        samples["tap"].append((time.perf_counter() - started) * 1000.0)
+        started = time.perf_counter()
+        transport.swipe(x, y, x, y, swipe_ms)
+        samples["swipe"].append(max(0.0, (time.perf_counter() - started) * 1000.0 - swipe_ms))
+    return samples
+
+
+def load_profile(path: str) -> Dict[str, DispatchLatency]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        kind: DispatchLatency(
+            transport=kind,
+            tap=LatencyStats(**entry["tap"]),
+            swipe=LatencyStats(**entry["swipe"]),
+            swipe_ms=int(entry["swipe_ms"]),
+            measured=entry.get("measured", ""),
+        )
+        for kind, entry in data.get("transports", {}).items()
+    }
+
+
+def save_latency(path: str, latency: DispatchLatency) -> None:
+    """Store one transport's calibration; other transports in the file are kept."""
+    profiles = load_profile(path)
+    profiles[latency.transport] = latency
+    data = {
+        "transports": {
+            kind: {key: value for key, value in asdict(entry).items() if key != "transport"}
+            for kind, entry in sorted(profiles.items())
+        }
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+class DispatchCompensator:
+    """Cumulative calibrated overhead of every tap/swipe sent through a transport."""
+
+    def __init__(self, latency: DispatchLatency):
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._total_sec = 0.0
+
+    def dispatched(self, kind: str, elapsed_sec: float, duration_ms: int) -> None:
+        with self._lock:
+            self._total_sec += self.latency.overhead_sec(kind)
+
+    def overhead_sec(self) -> float:
+        with self._lock:
+            return self._total_sec
+
+
+def get_compensator(
+    transport: InputTransport, mapping_module: str, deadline_mode: Optional[str] = None
+) -> Optional[DispatchCompensator]:
+    """The transport's compensator, or None when AUTO_DISPATCH_COMPENSATION is off or it was never calibrated.
+
+    deadline_mode names the active setting that times steps by absolute deadlines
+    (e.g. "AUTO_COMPILED_ROUTES"); compensation has nothing to shorten there and is skipped.
+    """
+    if not DISPATCH_COMPENSATION:
+        return None
+    if deadline_mode is not None:
+        print(f"[DISPATCH][WARN] {deadline_mode}=1 runs steps on absolute deadlines; AUTO_DISPATCH_COMPENSATION is ignored.")
+        return None
+    path = profile_path(mapping_module)
+    latency = load_profile(path).get(transport.kind)
+    if latency is None:
+        print(
+            f"[DISPATCH][WARN] No {transport.kind} calibration in {path}; "
+            "run tools/calibrate_dispatch.py. STEP_DELAY is not compensated."
+        )
+        return None
+    print(f"[DISPATCH] {transport.kind} tap {latency.tap.describe()} | swipe {latency.swipe.describe()}")
+    compensator = DispatchCompensator(latency)
+    add_dispatch_hook(transport, compensator.dispatched)
+    return compensator
@@ -1,7 +1,10 @@
 import importlib
 import os
 import time
-from typing import Dict, Iterable, Mapping, MutableMapping, Optional, Tuple
+from typing import Callable, Dict, Iterable, Mapping, MutableMapping, Optional, Tuple, Union
+
+from .screen_state import get_screen_waiter
+from .transport import InputTransport, resolve_transport
 
 OffsetMap = Mapping[str, Tuple[int, int]]
 PointMap = Dict[str, Tuple[int, int]]
@@ -132,8 +135,18 @@ def build_actions(
     mapping_module: str = BASE_MAPPING_MODULE,
     offsets: Optional[OffsetMap] = None,
     use_env_offsets: bool = False,
+    transport: Union[None, str, InputTransport] = None,
+    sleeper: Optional[Callable[[float], None]] = None,
+    screen_waiter: Optional[Callable[[str, float], object]] = None,
+    prepare_transport: bool = True,
 ) -> Dict[str, object]:
+    """prepare_transport=False skips transport.prepare(): the transport is shared per device, and
+    only the actions module that drives it may set it up for its resolution."""
     device_offsets = offsets or {}
+    input_transport = resolve_transport(transport)
+    wait = sleeper or time.sleep
+    if screen_waiter is None:
+        screen_waiter = get_screen_waiter(input_transport.serial, mapping_module)
     base_wh = _load_resolution(BASE_MAPPING_MODULE)
     target_wh = _load_resolution(mapping_module)
 
@@ -145,14 +158,16 @@ def build_actions(
         name: _resolve_point(name, mapped_xy, device_offsets, use_env_offsets)
         for name, mapped_xy in mapped_points.items()
     }
+    if prepare_transport:
+        input_transport.prepare(points, target_wh)
     glide_hold_ms = int(os.environ.get("AUTO_GLIDE_UTIL_HOLD_MS", "1400"))
     glide_after_util_delay = float(os.environ.get("AUTO_GLIDE_AFTER_UTIL_DELAY_SEC", "0.7"))
 
     def tap(x: int, y: int):
-        os.system(f"adb shell input tap {x} {y}")
+        input_transport.tap(x, y)
 
     def swipe(x1: int, y1: int, x2: int, y2: int, d: int):
-        os.system(f"adb shell input swipe {x1} {y1} {x2} {y2} {d}")
+        input_transport.swipe(x1, y1, x2, y2, d)
 
     def move(seconds):
         swipe(*points["MOVE_START"], *points["MOVE_END"], int(seconds * 1000))
@@ -206,29 +221,29 @@ def build_actions(
 
     def combat():
         fig2()
-        time.sleep(0.5)
+        wait(0.5)
         long_util()
-        time.sleep(1)
+        wait(1)
         fig3()
-        time.sleep(1)
+        wait(1)
         util()
-        time.sleep(1)
+        wait(1)
         fig1()
-        time.sleep(1)
+        wait(1)
         util()
-        time.sleep(1)
+        wait(1)
         long_attack(5)
         fig2()
-        time.sleep(1)
+        wait(1)
 
     def glide(seconds):
         long_util(glide_hold_ms / 1000.0)
-        time.sleep(glide_after_util_delay)
+        wait(glide_after_util_delay)
         tap(*points["JUMP"])
         move(seconds)
 
     def sleep(seconds):
-        time.sleep(seconds)
+        wait(seconds)
 
     def turn_180():
         swipe(*points["TURN_180_L"], *points["TURN_180_R"], 800)
@@ -257,34 +272,44 @@ def build_actions(
     def turn_left_135():
         swipe(*points["TURN_135_L_L"], *points["TURN_135_L_R"], 700)
 
+    def wait_for_screen(state: str, fallback_sec: float) -> bool:
+        """Return once `state` is on screen; a plain sleep without screen-state detection.
+
+        True only when the state was actually seen.
+        """
+        if screen_waiter is None:
+            wait(fallback_sec)
+            return False
+        return screen_waiter(state, fallback_sec)
+
     def open_map():
         tap(*points["OPEN_MAP"])
 
     def confirm_teleport():
         tap(*points["CONFIRM_TELEPORT"])
-        time.sleep(5.0)
+        wait_for_screen("loaded", 5.0)
 
     def adjust_game_time():
         tap(*points["ADJUST_GAME_TIME_P1"])
-        time.sleep(1)
+        wait(1)
         tap(*points["ADJUST_GAME_TIME_P2"])
-        time.sleep(1)
+        wait(1)
 
         swipe(*points["ADJUST_GAME_TIME_S1"], *points["ADJUST_GAME_TIME_S2"], 300)
-        time.sleep(0.2)
+        wait(0.2)
         swipe(*points["ADJUST_GAME_TIME_S2"], *points["ADJUST_GAME_TIME_S3"], 300)
-        time.sleep(0.2)
+        wait(0.2)
         swipe(*points["ADJUST_GAME_TIME_S3"], *points["ADJUST_GAME_TIME_S4"], 300)
-        time.sleep(0.2)
+        wait(0.2)
         swipe(*points["ADJUST_GAME_TIME_S4"], *points["ADJUST_GAME_TIME_S5"], 300)
-        time.sleep(0.3)
+        wait(0.3)
 
         tap(*points["ADJUST_GAME_TIME_P3"])
-        time.sleep(20)
+        wait_for_screen("time_skip_done", 20)
         tap(*points["ADJUST_GAME_TIME_P4"])
-        time.sleep(1)
+        wait(1)
         tap(*points["ADJUST_GAME_TIME_P5"])
-        time.sleep(5)
+        wait(5)
 
     return {
         "tap": tap,
@@ -316,12 +341,15 @@ def build_actions(
         "turn_left_30": turn_left_30,
         "turn_right_135": turn_right_135,
         "turn_left_135": turn_left_135,
+        "wait_for_screen": wait_for_screen,
         "open_map": open_map,
         "confirm_teleport": confirm_teleport,
         "adjust_game_time": adjust_game_time,
         "POINTS": points,
         "BASE_RESOLUTION": base_wh,
         "TARGET_RESOLUTION": target_wh,
+        "INPUT_TRANSPORT": input_transport,
+        "SCREEN_WAITER": screen_waiter,
     }
 
 
@@ -330,12 +358,27 @@ def bind_actions(
     offsets: Optional[OffsetMap] = None,
     mapping_module: str = BASE_MAPPING_MODULE,
     use_env_offsets: bool = False,
+    transport: Union[None, str, InputTransport] = None,
+    prepare_transport: bool = True,
 ):
-    exports = build_actions(mapping_module=mapping_module, offsets=offsets, use_env_offsets=use_env_offsets)
+    exports = build_actions(
+        mapping_module=mapping_module,
+        offsets=offsets,
+        use_env_offsets=use_env_offsets,
+        transport=transport,
+        prepare_transport=prepare_transport,
+    )
     namespace.update(exports)
     namespace["OFFSETS"] = dict(offsets or {})
     namespace["MAPPING_MODULE"] = mapping_module
 
 
-# Baseline export: baseline resolution + no offset.
-bind_actions(globals(), offsets={}, mapping_module=BASE_MAPPING_MODULE, use_env_offsets=False)
+# Baseline export: baseline resolution + no offset. Every device module imports this one first, so it
+# only prepares the shared transport when it is itself the configured actions module.
+bind_actions(
+    globals(),
+    offsets={},
+    mapping_module=BASE_MAPPING_MODULE,
+    use_env_offsets=False,
+    prepare_transport=os.environ.get("GLOBAL_ACTIONS_MODULE", __name__) == __name__,
+)
@@ -0,0 +1,285 @@
+"""Touch injection over a scrcpy control socket.
+
+Starts a control-only scrcpy server on the device (pushed jar + `app_process`,
+forward tunnel) and writes INJECT_TOUCH_EVENT messages into its control
+socket. Gestures therefore cost one socket write per event instead of an
+`adb shell input` process. The scrcpy client used for recording keeps its own
+sockets to itself, so this session runs next to it with its own scid.
+
+A failed socket write restarts the server and reconnects once; a gesture cut
+off mid-way resumes with a fresh touch-down at the last position. close()
+kills the server on the device by its scid, since cleanup=false leaves no
+device-side watcher that would do it when the host adb shell goes away.
+"""
+import os
+import random
+import socket
+import struct
+import subprocess
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from recording.scrcpy_recorder import SCRCPY_BIN
+
+from .transport import (
+    InputTransport,
+    PersistentShellTransport,
+    adb_command,
+    register_transport_kind,
+)
+
+SCRCPY_SERVER_PATH = os.environ.get(
+    "SCRCPY_SERVER_PATH",
+    os.path.join(os.path.dirname(SCRCPY_BIN), "scrcpy-server"),
+)
+SCRCPY_SERVER_VERSION = os.environ.get("SCRCPY_SERVER_VERSION", "3.3.3")
+# Separate from the recorder client's jar, which it overwrites and deletes on exit.
+DEVICE_SERVER_PATH = "/data/local/tmp/pco-scrcpy-server.jar"
+CONNECT_TIMEOUT = float(os.environ.get("AUTO_SCRCPY_CONTROL_CONNECT_TIMEOUT", "5.0"))
+FRAME_INTERVAL_MS = int(os.environ.get("AUTO_SCRCPY_CONTROL_FRAME_MS", "16"))
+TAP_HOLD_MS = int(os.environ.get("AUTO_SCRCPY_CONTROL_TAP_HOLD_MS", "40"))
+
+TYPE_INJECT_TOUCH_EVENT = 2
+ACTION_DOWN = 0
+ACTION_UP = 1
+ACTION_MOVE = 2
+POINTER_ID = 1
+PRESSURE_DOWN = 0xFFFF
+
+# type, action, pointer_id, x, y, screen_w, screen_h, pressure, action_button, buttons
+_TOUCH_EVENT = struct.Struct(">BBqiiHHHII")
+
+
+def encode_touch(action: int, x: int, y: int, screen_wh: Tuple[int, int], pointer_id: int = POINTER_ID) -> bytes:
+    pressure = 0 if action == ACTION_UP else PRESSURE_DOWN
+    return _TOUCH_EVENT.pack(TYPE_INJECT_TOUCH_EVENT, action, pointer_id, x, y, screen_wh[0], screen_wh[1], pressure, 0, 0)
+
+
+def decode_touch(payload: bytes) -> Tuple[int, int, int, int, int, int, int]:
+    """-> (action, pointer_id, x, y, screen_w, screen_h, pressure)."""
+    msg_type, action, pointer_id, x, y, w, h, pressure, _, _ = _TOUCH_EVENT.unpack(payload)
+    if msg_type != TYPE_INJECT_TOUCH_EVENT:
+        raise ValueError(f"Unexpected control message type {msg_type}")
+    return action, pointer_id, x, y, w, h, pressure
+
+
+def _free_local_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sleep_until(deadline: float) -> None:
+    remaining = deadline - time.perf_counter()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+class ScrcpyControlTransport(InputTransport):
+    """tap/swipe as scrcpy touch events; shell commands go to the resident adb shell.
+
+    `connect_address` skips the device server start and connects directly, used
+    with FakeScrcpyServer offline.
+    """
+
+    kind = "scrcpy"
+
+    def __init__(
+        self,
+        serial: Optional[str] = None,
+        adb_cmd: Optional[Sequence[str]] = None,
+        connect_address: Optional[Tuple[str, int]] = None,
+        screen_wh: Optional[Tuple[int, int]] = None,
+    ):
+        super().__init__(serial)
+        self.adb_cmd = adb_command(serial, adb_cmd)
+        self.connect_address = connect_address
+        self.screen_wh = screen_wh
+        self.shell = PersistentShellTransport(serial=serial, adb_cmd=adb_cmd)
+        self._sock: Optional[socket.socket] = None
+        self._server: Optional[subprocess.Popen] = None
+        self._port: Optional[int] = None
+        self._scid: Optional[str] = None
+        # Last down/move position while a gesture is in progress.
+        self._pointer: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def prepare(self, points, screen_wh: Tuple[int, int]) -> None:
+        self.screen_wh = screen_wh
+
+    def _adb(self, *args: str) -> None:
+        subprocess.run(self.adb_cmd + list(args), check=True, capture_output=True)
+
+    def _start_server(self) -> Tuple[str, int]:
+        scid = self._scid = f"{random.getrandbits(31):08x}"
+        self._port = _free_local_port()
+        self._adb("push", SCRCPY_SERVER_PATH, DEVICE_SERVER_PATH)
+        self._adb("forward", f"tcp:{self._port}", f"localabstract:scrcpy_{scid}")
+        server_args = [
+            f"CLASSPATH={DEVICE_SERVER_PATH}",
+            "app_process",
+            "/",
+            "com.genymobile.scrcpy.Server",
+            SCRCPY_SERVER_VERSION,
+            f"scid={scid}",
+            "log_level=warn",
+            "tunnel_forward=true",
+            "video=false",
+            "audio=false",
+            "control=true",
+            "send_device_meta=false",
+            "cleanup=false",
+        ]
+        self._server = subprocess.Popen(self.adb_cmd + ["shell", " ".join(server_args)])
+        return "127.0.0.1", self._port
+
+    def _connect(self) -> socket.socket:
+        address = self.connect_address or self._start_server()
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            sock = None
+            try:
+                sock = socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+                # Forward tunnels accept before the server listens; the dummy byte confirms it is live.
+                if sock.recv(1) == b"\x00":
+                    sock.settimeout(None)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    return sock
+            except OSError:
+                pass
+            if sock is not None:
+                sock.close()
+            if time.monotonic() >= deadline:
+                raise ConnectionError(f"scrcpy control socket not ready at {address} after {CONNECT_TIMEOUT}s")
+            time.sleep(0.05)
+
+    def _send(self, action: int, x: int, y: int, wh: Tuple[int, int]) -> None:
+        payload = encode_touch(action, x, y, wh)
+        for attempt in range(2):
+            try:
+                if self._sock is None:
+                    self._sock = self._connect()
+                if attempt and self._pointer is not None and action != ACTION_DOWN:
+                    # The new server never saw the touch-down; resume the gesture where it broke off.
+                    self._sock.sendall(encode_touch(ACTION_DOWN, self._pointer[0], self._pointer[1], wh))
+                self._sock.sendall(payload)
+                break
+            except OSError as exc:
+                self._close_locked()
+                if attempt:
+                    self._pointer = None
+                    raise
+                print(f"[SCRCPY][WARN] control socket failed ({exc}); restarting the server and reconnecting once.")
+        self._pointer = None if action == ACTION_UP else (x, y)
+
+    def _screen(self) -> Tuple[int, int]:
+        if self.screen_wh is None:
+            raise RuntimeError("ScrcpyControlTransport needs prepare() or an explicit screen_wh.")
+        return self.screen_wh
+
+    def tap(self, x: int, y: int) -> None:
+        wh = self._screen()
+        with self._lock:
+            self._send(ACTION_DOWN, x, y, wh)
+            time.sleep(TAP_HOLD_MS / 1000.0)
+            self._send(ACTION_UP, x, y, wh)
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int) -> None:
+        wh = self._screen()
+        steps = max(1, int(duration_ms // max(1, FRAME_INTERVAL_MS)))
+        step_sec = duration_ms / 1000.0 / steps
+        with self._lock:
+            start = time.perf_counter()
+            self._send(ACTION_DOWN, x1, y1, wh)
+            for index in range(1, steps + 1):
+                _sleep_until(start + index * step_sec)
+                alpha = index / steps
+                x = round(x1 + (x2 - x1) * alpha)
+                y = round(y1 + (y2 - y1) * alpha)
+                self._send(ACTION_MOVE, x, y, wh)
+            self._send(ACTION_UP, x2, y2, wh)
+
+    def run(self, command: str) -> None:
+        self.shell.run(command)
+
+    def _close_locked(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._server is not None:
+            self._server.terminate()
+            self._server.wait()
+            self._server = None
+        if self._scid is not None:
+            # Killing the host `adb shell` does not stop app_process on the device.
+            subprocess.run(
+                self.adb_cmd + ["shell", f"pkill -f scid={self._scid}"], check=False, capture_output=True
+            )
+            self._scid = None
+        if self._port is not None:
+            subprocess.run(self.adb_cmd + ["forward", "--remove", f"tcp:{self._port}"], check=False, capture_output=True)
+            self._port = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+        self.shell.close()
+
+
+class FakeScrcpyServer:
+    """Local socket stand-in for the device server.
+
+    Accepts control connections one after another, sends the dummy byte and
+    records every touch message as (monotonic, action, pointer_id, x, y,
+    screen_w, screen_h, pressure). drop() closes the current connection, like a
+    server that died.
+    """
+
+    def __init__(self):
+        self.events: List[Tuple[float, int, int, int, int, int, int, int]] = []
+        self.connections = 0
+        self._conn: Optional[socket.socket] = None
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(1)
+        self.address: Tuple[str, int] = self._listener.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self._conn = conn
+            with conn:
+                self._serve_one(conn)
+
+    def _serve_one(self, conn: socket.socket) -> None:
+        try:
+            conn.sendall(b"\x00")
+            buffer = b""
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                buffer += chunk
+                while len(buffer) >= _TOUCH_EVENT.size:
+                    payload, buffer = buffer[:_TOUCH_EVENT.size], buffer[_TOUCH_EVENT.size:]
+                    self.events.append((time.monotonic(),) + decode_touch(payload))
+        except OSError:
+            return
+
+    def drop(self) -> None:
+        if self._conn is not None:
+            self._conn.shutdown(socket.SHUT_RDWR)
+
+    def close(self) -> None:
+        self._listener.close()
+        self._thread.join(timeout=1)
+
+
+register_transport_kind(ScrcpyControlTransport.kind, ScrcpyControlTransport)
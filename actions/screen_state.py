@@ -0,0 +1,244 @@
+"""Wait for a screen state (map open, loading finished) instead of sleeping.
+
+`adb exec-out screencap` without -p returns the raw framebuffer: a little-endian
+header (width, height, pixel format[, colour space]) followed by 4-byte pixels,
+so no PNG encoding happens on the device. A frame is point-sampled into a small
+gray image over a template's region and compared to the template by mean
+absolute difference. Templates live in AUTO_SCREEN_TEMPLATE_DIR (default
+screen_templates/<mapping module>/) as `<state>[.<n>].json` files written by
+tools/screen_templates.py; a state matches when any of its templates does.
+
+States without templates, a disabled waiter (AUTO_SCREEN_STATE=0, the default)
+and failed captures all fall back to the old fixed sleep.
+"""
+import json
+import os
+import struct
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .transport import adb_command
+
+SCREEN_STATE = os.environ.get("AUTO_SCREEN_STATE", "0") == "1"
+SCREEN_TEMPLATE_ROOT = os.environ.get(
+    "AUTO_SCREEN_TEMPLATE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "screen_templates"),
+)
+SCREEN_POLL_SEC = float(os.environ.get("AUTO_SCREEN_POLL_SEC", "0.2"))
+SCREEN_STATE_TIMEOUT_SEC = float(os.environ.get("AUTO_SCREEN_STATE_TIMEOUT_SEC", "15"))
+SCREEN_MATCH_THRESHOLD = float(os.environ.get("AUTO_SCREEN_MATCH_THRESHOLD", "12"))
+TEMPLATE_SIZE = (48, 27)
+FULL_REGION = (0.0, 0.0, 1.0, 1.0)
+
+# screencap pixel formats with 4 bytes per pixel -> byte offsets of (r, g, b).
+_CHANNELS = {1: (0, 1, 2), 2: (0, 1, 2), 5: (2, 1, 0)}
+
+
+@dataclass(frozen=True)
+class Frame:
+    width: int
+    height: int
+    pixel_format: int
+    pixels: bytes  # 4 bytes per pixel, row-major
+
+
+@dataclass(frozen=True)
+class Template:
+    state: str
+    region: Tuple[float, float, float, float]  # normalized x0, y0, x1, y1
+    size: Tuple[int, int]
+    pixels: bytes  # 8-bit gray, size[0] * size[1]
+    threshold: float = SCREEN_MATCH_THRESHOLD
+    name: str = ""
+
+
+def parse_screencap(data: bytes) -> Frame:
+    if len(data) < 12:
+        raise ValueError(f"screencap returned {len(data)} bytes")
+    width, height, pixel_format = struct.unpack_from("<III", data)
+    if pixel_format not in _CHANNELS:
+        raise ValueError(f"unsupported screencap pixel format {pixel_format}")
+    payload = width * height * 4
+    header = len(data) - payload
+    if header not in (12, 16):
+        raise ValueError(f"screencap size {len(data)} does not match {width}x{height}")
+    return Frame(width, height, pixel_format, data[header:])
+
+
+def capture_frame(serial: Optional[str] = None, timeout_sec: float = 5.0) -> Frame:
+    result = subprocess.run(
+        adb_command(serial) + ["exec-out", "screencap"], capture_output=True, timeout=timeout_sec, check=False
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"screencap failed: {result.stderr.decode(errors='replace').strip()}")
+    return parse_screencap(result.stdout)
+
+
+def load_frame(path: str) -> Frame:
+    """A raw dump of `adb exec-out screencap` (fixture frames for offline checks)."""
+    with open(path, "rb") as f:
+        return parse_screencap(f.read())
+
+
+def downsample(
+    frame: Frame, region: Sequence[float] = FULL_REGION, size: Tuple[int, int] = TEMPLATE_SIZE
+) -> bytes:
+    """Gray image of `size` point-sampled at the cell centres of `region`."""
+    r_off, g_off, b_off = _CHANNELS[frame.pixel_format]
+    x0, y0, x1, y1 = region
+    out_w, out_h = size
+    left, top = x0 * frame.width, y0 * frame.height
+    cell_w = (x1 - x0) * frame.width / out_w
+    cell_h = (y1 - y0) * frame.height / out_h
+    columns = [min(frame.width - 1, int(left + (i + 0.5) * cell_w)) * 4 for i in range(out_w)]
+    pixels = frame.pixels
+    gray = bytearray(out_w * out_h)
+    for j in range(out_h):
+        row = min(frame.height - 1, int(top + (j + 0.5) * cell_h)) * frame.width * 4
+        for i, column in enumerate(columns):
+            p = row + column
+            gray[j * out_w + i] = (
+                pixels[p + r_off] * 77 + pixels[p + g_off] * 150 + pixels[p + b_off] * 29
+            ) >> 8
+    return bytes(gray)
+
+
+def match_score(frame: Frame, template: Template) -> float:
+    sample = downsample(frame, template.region, template.size)
+    return sum(abs(a - b) for a, b in zip(sample, template.pixels)) / len(template.pixels)
+
+
+def template_from_frame(
+    frame: Frame,
+    state: str,
+    region: Sequence[float] = FULL_REGION,
+    size: Tuple[int, int] = TEMPLATE_SIZE,
+    threshold: float = SCREEN_MATCH_THRESHOLD,
+) -> Template:
+    region = tuple(float(v) for v in region)
+    return Template(state, region, size, downsample(frame, region, size), threshold)
+
+
+def save_template(template: Template, path: str) -> None:
+    data = {
+        "state": template.state,
+        "region": list(template.region),
+        "size": list(template.size),
+        "threshold": template.threshold,
+        "pixels": template.pixels.hex(),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+
+
+def load_template(path: str) -> Template:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return Template(
+        state=data["state"],
+        region=tuple(data["region"]),
+        size=tuple(data["size"]),
+        pixels=bytes.fromhex(data["pixels"]),
+        threshold=float(data.get("threshold", SCREEN_MATCH_THRESHOLD)),
+        name=os.path.basename(path),
+    )
+
+
+def load_templates(template_dir: str) -> Dict[str, List[Template]]:
+    templates: Dict[str, List[Template]] = {}
+    if not os.path.isdir(template_dir):
+        return templates
+    for name in sorted(os.listdir(template_dir)):
+        if not name.endswith(".json"):
+            continue
+        template = load_template(os.path.join(template_dir, name))
+        templates.setdefault(template.state, []).append(template)
+    return templates
+
+
+def template_dir_for(mapping_module: str) -> str:
+    return os.path.join(SCREEN_TEMPLATE_ROOT, mapping_module.rsplit(".", 1)[-1])
+
+
+@dataclass
+class _StateStats:
+    waited: List[float] = field(default_factory=list)
+    timeouts: int = 0
+    fallbacks: int = 0
+
+
+class ScreenStateWaiter:
+    """Callable (state, fallback_sec): returns once the state is on screen or the timeout passed."""
+
+    def __init__(
+        self,
+        templates: Dict[str, List[Template]],
+        capture: Callable[[], Frame],
+        timeout_sec: float = SCREEN_STATE_TIMEOUT_SEC,
+        poll_sec: float = SCREEN_POLL_SEC,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.templates = templates
+        self.capture = capture
+        self.timeout_sec = timeout_sec
+        self.poll_sec = poll_sec
+        self.sleep = sleep
+        self.clock = clock
+        self.stats: Dict[str, _StateStats] = {}
+
+    def matches(self, frame: Frame, state: str) -> bool:
+        return any(match_score(frame, template) <= template.threshold for template in self.templates.get(state, ()))
+
+    def __call__(self, state: str, fallback_sec: float) -> bool:
+        stats = self.stats.setdefault(state, _StateStats())
+        started = self.clock()
+        if state not in self.templates:
+            stats.fallbacks += 1
+            self.sleep(fallback_sec)
+            return False
+        # Never give up before the fixed sleep this wait replaces would have ended.
+        timeout_sec = max(self.timeout_sec, fallback_sec)
+        deadline = started + timeout_sec
+        while True:
+            polled = self.clock()
+            try:
+                frame = self.capture()
+            except Exception as exc:
+                print(f"[SCREEN][WARN] capture failed while waiting for {state}: {exc}; sleeping {fallback_sec}s")
+                stats.fallbacks += 1
+                self.sleep(max(0.0, started + fallback_sec - self.clock()))
+                return False
+            if self.matches(frame, state):
+                stats.waited.append(self.clock() - started)
+                return True
+            if self.clock() >= deadline:
+                print(f"[SCREEN][WARN] {state} not reached within {timeout_sec:.0f}s; continuing")
+                stats.timeouts += 1
+                return False
+            self.sleep(max(0.0, polled + self.poll_sec - self.clock()))
+
+    def describe(self) -> List[str]:
+        lines = []
+        for state in sorted(self.stats):
+            stats = self.stats[state]
+            waited = sorted(stats.waited)
+            summary = f"n={len(waited)}"
+            if waited:
+                summary += f" p50={waited[len(waited) // 2]:.2f}s max={waited[-1]:.2f}s"
+            lines.append(f"{state}: {summary} timeouts={stats.timeouts} fallbacks={stats.fallbacks}")
+        return lines
+
+
+def get_screen_waiter(serial: Optional[str], mapping_module: str) -> Optional[ScreenStateWaiter]:
+    """The device's waiter, or None when AUTO_SCREEN_STATE is off or no templates exist."""
+    if not SCREEN_STATE:
+        return None
+    templates = load_templates(template_dir_for(mapping_module))
+    if not templates:
+        return None
+    serial = serial or os.environ.get("ANDROID_SERIAL") or None
+    return ScreenStateWaiter(templates, lambda: capture_frame(serial))
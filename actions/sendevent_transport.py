@@ -0,0 +1,513 @@
+"""Touch injection with raw multi-touch events instead of `input`.
+
+`input tap/swipe` start a fresh `app_process` JVM on every call. This backend
+compiles each gesture once per device into raw multi-touch (protocol B) events.
+
+AUTO_SENDEVENT_MODE=stream (default): one resident `cat > /dev/input/eventN`
+per device, started over `adb exec-in`, receives the packed input_event structs.
+The host writes each frame at its deadline, so a frame costs one pipe write and
+no device-side process; a `("move", 10)` swipe lasts its 10 s.
+
+AUTO_SENDEVENT_MODE=script: the gesture is uploaded as a script under
+/data/local/tmp and replayed with `sh <script>` through the resident adb shell.
+Every event starts a `sendevent` and every frame a `sleep` process; set
+AUTO_SENDEVENT_FRAME_COST_MS to the measured cost per frame
+(tools/bench_transport.py) or long swipes overrun their duration.
+"""
+import os
+import re
+import struct
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .transport import (
+    InputTransport,
+    PersistentShellTransport,
+    adb_command,
+    register_transport_kind,
+)
+
+EV_SYN = 0
+EV_KEY = 1
+EV_ABS = 3
+SYN_REPORT = 0
+BTN_TOUCH = 0x14A
+ABS_MT_SLOT = 0x2F
+ABS_MT_POSITION_X = 0x35
+ABS_MT_POSITION_Y = 0x36
+ABS_MT_TRACKING_ID = 0x39
+ABS_MT_PRESSURE = 0x3A
+
+SENDEVENT_MODE = os.environ.get("AUTO_SENDEVENT_MODE", "stream").strip().lower()
+if SENDEVENT_MODE not in ("stream", "script"):
+    raise ValueError(f"Unknown AUTO_SENDEVENT_MODE={SENDEVENT_MODE!r}. Use stream or script.")
+# sizeof(struct input_event): 24 on 64-bit kernels, 16 on 32-bit; empty -> from ro.product.cpu.abi.
+EVENT_SIZE = os.environ.get("AUTO_SENDEVENT_EVENT_SIZE", "").strip()
+SCRIPT_DIR = os.environ.get("AUTO_SENDEVENT_DIR", "/data/local/tmp/pco_touch")
+FRAME_INTERVAL_MS = int(os.environ.get("AUTO_SENDEVENT_FRAME_MS", "16"))
+# Script mode: device-side cost of one frame (sendevent + sleep spawns), subtracted from each sleep.
+FRAME_COST_MS = float(os.environ.get("AUTO_SENDEVENT_FRAME_COST_MS", "0"))
+TAP_HOLD_MS = int(os.environ.get("AUTO_SENDEVENT_TAP_HOLD_MS", "40"))
+
+Event = Tuple[int, int, int]
+# (sleep_ms_before_frame, events)
+Frame = Tuple[float, Tuple[Event, ...]]
+
+
+@dataclass(frozen=True)
+class TouchPanel:
+    device: str
+    max_x: int
+    max_y: int
+    # Landscape screen size the ADB coordinates refer to.
+    screen_w: int
+    screen_h: int
+    # Android surface rotation: 0, 1 (90), 2 (180), 3 (270).
+    rotation: int = 1
+    has_slot: bool = True
+    has_pressure: bool = False
+
+    def to_panel(self, x: int, y: int) -> Tuple[int, int]:
+        w, h = self.screen_w, self.screen_h
+        if self.rotation == 1:
+            nx, ny, nw, nh = h - 1 - y, x, h, w
+        elif self.rotation == 2:
+            nx, ny, nw, nh = w - 1 - x, h - 1 - y, w, h
+        elif self.rotation == 3:
+            nx, ny, nw, nh = y, w - 1 - x, h, w
+        else:
+            nx, ny, nw, nh = x, y, w, h
+        return round(nx * (self.max_x + 1) / nw), round(ny * (self.max_y + 1) / nh)
+
+
+@dataclass(frozen=True)
+class TouchScript:
+    key: str
+    frames: Tuple[Frame, ...]
+
+    @property
+    def nominal_ms(self) -> float:
+        return sum(delay for delay, _ in self.frames)
+
+    def render(self, device: str, frame_cost_ms: float = FRAME_COST_MS) -> List[str]:
+        lines: List[str] = []
+        for delay, events in self.frames:
+            if delay > 0:
+                lines.append(f"sleep {max(0.0, delay - frame_cost_ms) / 1000.0:.4f}")
+            for ev_type, code, value in events:
+                lines.append(f"sendevent {device} {ev_type} {code} {value}")
+        return lines
+
+
+def _down(panel: TouchPanel, tracking_id: int, px: int, py: int) -> Tuple[Event, ...]:
+    events: List[Event] = []
+    if panel.has_slot:
+        events.append((EV_ABS, ABS_MT_SLOT, 0))
+    events += [
+        (EV_ABS, ABS_MT_TRACKING_ID, tracking_id),
+        (EV_ABS, ABS_MT_POSITION_X, px),
+        (EV_ABS, ABS_MT_POSITION_Y, py),
+    ]
+    if panel.has_pressure:
+        events.append((EV_ABS, ABS_MT_PRESSURE, 50))
+    events += [(EV_KEY, BTN_TOUCH, 1), (EV_SYN, SYN_REPORT, 0)]
+    return tuple(events)
+
+
+def _move(px: int, py: int) -> Tuple[Event, ...]:
+    return (EV_ABS, ABS_MT_POSITION_X, px), (EV_ABS, ABS_MT_POSITION_Y, py), (EV_SYN, SYN_REPORT, 0)
+
+
+def _up() -> Tuple[Event, ...]:
+    return (EV_ABS, ABS_MT_TRACKING_ID, -1), (EV_KEY, BTN_TOUCH, 0), (EV_SYN, SYN_REPORT, 0)
+
+
+def compile_tap(panel: TouchPanel, x: int, y: int, hold_ms: int = TAP_HOLD_MS, tracking_id: int = 1) -> TouchScript:
+    px, py = panel.to_panel(x, y)
+    return TouchScript(
+        key=f"tap_{x}_{y}",
+        frames=((0.0, _down(panel, tracking_id, px, py)), (float(hold_ms), _up())),
+    )
+
+
+def compile_swipe(
+    panel: TouchPanel,
+    x1: int,
+    y1: int,
+    x2: int,
+    y2: int,
+    duration_ms: int,
+    frame_ms: int = FRAME_INTERVAL_MS,
+    tracking_id: int = 1,
+) -> TouchScript:
+    """Linear interpolation like `input swipe`: down at start, moves every frame_ms, up at end."""
+    frames: List[Frame] = [(0.0, _down(panel, tracking_id, *panel.to_panel(x1, y1)))]
+    steps = max(1, int(duration_ms // max(1, frame_ms)))
+    step_ms = duration_ms / steps
+    for index in range(1, steps + 1):
+        alpha = index / steps
+        x = round(x1 + (x2 - x1) * alpha)
+        y = round(y1 + (y2 - y1) * alpha)
+        frames.append((step_ms, _move(*panel.to_panel(x, y))))
+    frames.append((0.0, _up()))
+    return TouchScript(key=f"swipe_{x1}_{y1}_{x2}_{y2}_{duration_ms}", frames=tuple(frames))
+
+
+_GETEVENT_DEVICE = re.compile(r"^add device \d+:\s*(\S+)")
+_GETEVENT_ABS = re.compile(r"\b([0-9a-f]{4})\s*:\s*value -?\d+, min -?\d+, max (\d+)")
+
+
+def parse_getevent(output: str) -> Dict[str, Dict[int, int]]:
+    """`getevent -p` output -> {device: {abs_code: max}}."""
+    devices: Dict[str, Dict[int, int]] = {}
+    current: Optional[str] = None
+    for line in output.splitlines():
+        match = _GETEVENT_DEVICE.match(line.strip())
+        if match is not None:
+            current = match.group(1)
+            devices[current] = {}
+            continue
+        if current is None:
+            continue
+        match = _GETEVENT_ABS.search(line)
+        if match is not None:
+            devices[current][int(match.group(1), 16)] = int(match.group(2))
+    return devices
+
+
+def probe_touch_panel(
+    screen_wh: Tuple[int, int],
+    serial: Optional[str] = None,
+    adb_cmd: Optional[Sequence[str]] = None,
+) -> TouchPanel:
+    """Find the multi-touch device via `getevent -p`. AUTO_TOUCH_* env vars override the probe."""
+    rotation = int(os.environ.get("AUTO_TOUCH_ROTATION", "1"))
+    device = os.environ.get("AUTO_TOUCH_DEVICE")
+    max_x = os.environ.get("AUTO_TOUCH_MAX_X")
+    max_y = os.environ.get("AUTO_TOUCH_MAX_Y")
+    if device and max_x and max_y:
+        return TouchPanel(device, int(max_x), int(max_y), screen_wh[0], screen_wh[1], rotation)
+
+    result = subprocess.run(
+        adb_command(serial, adb_cmd) + ["shell", "getevent", "-p"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    for name, axes in parse_getevent(result.stdout).items():
+        if device and name != device:
+            continue
+        if ABS_MT_POSITION_X in axes and ABS_MT_POSITION_Y in axes:
+            return TouchPanel(
+                device=name,
+                max_x=axes[ABS_MT_POSITION_X],
+                max_y=axes[ABS_MT_POSITION_Y],
+                screen_w=screen_wh[0],
+                screen_h=screen_wh[1],
+                rotation=rotation,
+                has_slot=ABS_MT_SLOT in axes,
+                has_pressure=ABS_MT_PRESSURE in axes,
+            )
+    raise RuntimeError("No multi-touch input device found in `getevent -p`. Set AUTO_TOUCH_DEVICE/MAX_X/MAX_Y.")
+
+
+_EVENT_FORMATS = {24: "<qqHHi", 16: "<iiHHi"}
+
+
+def pack_events(events: Sequence[Event], event_size: int) -> bytes:
+    """struct input_event with a zero timestamp (the kernel stamps injected events itself)."""
+    fmt = _EVENT_FORMATS[event_size]
+    return b"".join(struct.pack(fmt, 0, 0, ev_type, code, value) for ev_type, code, value in events)
+
+
+def probe_event_size(serial: Optional[str] = None, adb_cmd: Optional[Sequence[str]] = None) -> int:
+    if EVENT_SIZE:
+        return int(EVENT_SIZE)
+    result = subprocess.run(
+        adb_command(serial, adb_cmd) + ["shell", "getprop", "ro.product.cpu.abi"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    return 24 if "64" in result.stdout else 16
+
+
+class EventStream:
+    """One resident `cat > <device>` on the phone; frames are written to its stdin as input_event structs."""
+
+    def __init__(
+        self,
+        device: str,
+        event_size: int,
+        serial: Optional[str] = None,
+        adb_cmd: Optional[Sequence[str]] = None,
+    ):
+        if event_size not in _EVENT_FORMATS:
+            raise ValueError(f"Unsupported input_event size {event_size}")
+        self.device = device
+        self.event_size = event_size
+        self.command = adb_command(serial, adb_cmd) + ["exec-in", f"cat > {device}"]
+        self._proc: Optional[subprocess.Popen] = None
+
+    def _alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self) -> None:
+        if not self._alive():
+            self._proc = subprocess.Popen(self.command, stdin=subprocess.PIPE, bufsize=0)
+
+    def write(self, events: Sequence[Event]) -> None:
+        self.start()
+        self._proc.stdin.write(pack_events(events, self.event_size))
+
+    def close(self) -> None:
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+
+
+class RecordingEventStream:
+    """Fake EventStream with a virtual clock: pass `sleep`/`clock` to SendeventTransport too.
+
+    Records (virtual_ms, type, code, value) for every written event.
+    """
+
+    def __init__(self):
+        self.events: List[Tuple[float, int, int, int]] = []
+        self.clock_ms = 0.0
+
+    def start(self) -> None:
+        pass
+
+    def write(self, events: Sequence[Event]) -> None:
+        self.events += [(self.clock_ms, ev_type, code, value) for ev_type, code, value in events]
+
+    def sleep(self, seconds: float) -> None:
+        self.clock_ms += seconds * 1000.0
+
+    def clock(self) -> float:
+        return self.clock_ms / 1000.0
+
+    def close(self) -> None:
+        pass
+
+
+class SendeventTransport(InputTransport):
+    """tap/swipe compiled once per device into raw touch events.
+
+    Stream mode writes the frames to `stream` (an EventStream started on the
+    panel device, or a RecordingEventStream in tests). Script mode replays
+    uploaded scripts through `shell`; by default the resident adb shell
+    session, or a RecordingTouchDevice in tests. Other commands (render config
+    info etc.) always go through `shell` unchanged.
+    """
+
+    kind = "sendevent"
+
+    def __init__(
+        self,
+        serial: Optional[str] = None,
+        shell: Optional[InputTransport] = None,
+        panel: Optional[TouchPanel] = None,
+        script_dir: str = SCRIPT_DIR,
+        mode: str = SENDEVENT_MODE,
+        stream=None,
+        adb_cmd: Optional[Sequence[str]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(serial)
+        self.shell = shell or PersistentShellTransport(serial=serial, adb_cmd=adb_cmd)
+        self.panel = panel
+        self.script_dir = script_dir
+        self.mode = mode
+        self.adb_cmd = adb_cmd
+        self.sleep = sleep
+        self.clock = clock
+        self._stream = stream
+        self._points: Dict[str, Tuple[int, int]] = {}
+        self._screen_wh: Optional[Tuple[int, int]] = None
+        self._scripts: Dict[Tuple[int, ...], TouchScript] = {}
+        self._uploaded: Dict[str, TouchScript] = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, points: Dict[str, Tuple[int, int]], screen_wh: Tuple[int, int]) -> None:
+        """Resolve the panel and get the injector ready now rather than on the first gesture of a route.
+
+        A later call with another screen size (the device bind after a baseline one) rescales the
+        panel, drops every compiled script and restarts the stream.
+        """
+        with self._lock:
+            if self._screen_wh is not None and tuple(screen_wh) != tuple(self._screen_wh):
+                self._rebind_locked(screen_wh)
+                self._points = {}
+            self._points.update(points)
+            self._screen_wh = tuple(screen_wh)
+        if self.mode == "stream":
+            with self._lock:
+                for xy in self._points.values():
+                    self._compiled(xy)
+            self.stream().start()
+        else:
+            self.precompile()
+
+    def _rebind_locked(self, screen_wh: Tuple[int, int]) -> None:
+        if self.panel is not None:
+            self.panel = replace(self.panel, screen_w=screen_wh[0], screen_h=screen_wh[1])
+        self._scripts.clear()
+        self._uploaded.clear()
+        if self._stream is not None:
+            self._stream.close()
+
+    def stream(self):
+        if self._stream is None:
+            panel = self._panel()
+            self._stream = EventStream(
+                panel.device, probe_event_size(self.serial, self.adb_cmd), serial=self.serial, adb_cmd=self.adb_cmd
+            )
+        return self._stream
+
+    def play(self, script: TouchScript) -> None:
+        """Write each frame at its offset from the gesture start; returns when the gesture ended."""
+        stream = self.stream()
+        started = self.clock()
+        offset = 0.0
+        with self._lock:
+            for delay, events in script.frames:
+                offset += delay / 1000.0
+                remaining = started + offset - self.clock()
+                if remaining > 0:
+                    self.sleep(remaining)
+                try:
+                    stream.write(events)
+                except OSError as exc:
+                    # The rest of the gesture is dropped, not replayed; lift the finger on a fresh stream.
+                    print(f"[SENDEVENT][WARN] event stream failed during {script.key} ({exc}); restarting it.")
+                    stream.close()
+                    stream.write(_up())
+                    return
+
+    def _panel(self) -> TouchPanel:
+        if self.panel is None:
+            if self._screen_wh is None:
+                raise RuntimeError("SendeventTransport needs prepare() or an explicit TouchPanel.")
+            self.panel = probe_touch_panel(self._screen_wh, serial=self.serial)
+        return self.panel
+
+    def script_path(self, script: TouchScript) -> str:
+        return f"{self.script_dir}/{script.key}.sh"
+
+    def _upload(self, scripts: Sequence[TouchScript]) -> None:
+        panel = self._panel()
+        parts = [f"mkdir -p {self.script_dir}"]
+        for script in scripts:
+            body = "\n".join(script.render(panel.device))
+            parts.append(f"cat > {self.script_path(script)} <<'PCO_EOF'\n{body}\nPCO_EOF")
+        self.shell.run("\n".join(parts) + "\ntrue")
+        for script in scripts:
+            self._uploaded[script.key] = script
+
+    def _compiled(self, key: Tuple[int, ...]) -> TouchScript:
+        script = self._scripts.get(key)
+        if script is None:
+            panel = self._panel()
+            script = compile_tap(panel, *key) if len(key) == 2 else compile_swipe(panel, *key)
+            self._scripts[key] = script
+        return script
+
+    def _upload_pending_locked(self, extra: Sequence[TouchScript] = ()) -> None:
+        scripts = [self._compiled(xy) for xy in self._points.values()] + list(extra)
+        pending = list({script.key: script for script in scripts if script.key not in self._uploaded}.values())
+        if pending:
+            self._upload(pending)
+
+    def precompile(self) -> None:
+        """Compile and upload taps for every prepared POINT in one shell round trip."""
+        with self._lock:
+            self._upload_pending_locked()
+
+    def replay(self, script: TouchScript) -> None:
+        if script.key not in self._uploaded:
+            with self._lock:
+                self._upload_pending_locked([script])
+        self.shell.run(f"sh {self.script_path(script)}")
+
+    def run(self, command: str) -> None:
+        self.shell.run(command)
+
+    def _dispatch(self, key: Tuple[int, ...]) -> None:
+        if self.mode == "stream":
+            with self._lock:
+                script = self._compiled(key)
+            self.play(script)
+        else:
+            self.replay(self._compiled(key))
+
+    def tap(self, x: int, y: int) -> None:
+        self._dispatch((x, y))
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int) -> None:
+        self._dispatch((x1, y1, x2, y2, duration_ms))
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+        self.shell.close()
+
+
+class RecordingTouchDevice(InputTransport):
+    """Fake device shell for SendeventTransport.
+
+    Keeps uploaded scripts in memory and, on `sh <script>`, records every
+    sendevent as (virtual_ms, device, type, code, value). The virtual clock only
+    advances by the script's sleeps, so emitted timing can be asserted exactly.
+    """
+
+    kind = "recording"
+
+    def __init__(self, serial: Optional[str] = None):
+        super().__init__(serial)
+        self.files: Dict[str, List[str]] = {}
+        self.events: List[Tuple[float, str, int, int, int]] = []
+        self.commands: List[str] = []
+        self.clock_ms = 0.0
+
+    def run(self, command: str) -> None:
+        self.commands.append(command)
+        lines = command.split("\n")
+        index = 0
+        while index < len(lines):
+            line = lines[index].strip()
+            index += 1
+            heredoc = re.match(r"^cat > (\S+) <<'(\w+)'$", line)
+            if heredoc is not None:
+                path, terminator = heredoc.groups()
+                body: List[str] = []
+                while index < len(lines) and lines[index] != terminator:
+                    body.append(lines[index])
+                    index += 1
+                index += 1
+                self.files[path] = body
+                continue
+            if line.startswith("sh "):
+                self._execute(self.files[line[3:].strip()])
+
+    def _execute(self, script_lines: Sequence[str]) -> None:
+        for line in script_lines:
+            parts = line.split()
+            if parts[0] == "sleep":
+                self.clock_ms += float(parts[1]) * 1000.0
+            elif parts[0] == "sendevent":
+                self.events.append((self.clock_ms, parts[1], int(parts[2]), int(parts[3]), int(parts[4])))
+
+
+register_transport_kind(SendeventTransport.kind, SendeventTransport)
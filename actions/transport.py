@@ -0,0 +1,294 @@
+import atexit
+import importlib
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+ADB_BIN = os.environ.get("ADB_BIN", "adb")
+DEFAULT_TRANSPORT = os.environ.get("AUTO_INPUT_TRANSPORT", "persistent")
+ADB_COMMAND_TIMEOUT = float(os.environ.get("AUTO_ADB_COMMAND_TIMEOUT", "30"))
+
+_DONE_MARKER = "__PCO_DONE__"
+
+
+def adb_command(serial: Optional[str] = None, adb_cmd: Optional[Sequence[str]] = None) -> List[str]:
+    cmd = list(adb_cmd) if adb_cmd else [ADB_BIN]
+    if serial:
+        cmd += ["-s", serial]
+    return cmd
+
+
+def tap_command(x: int, y: int) -> str:
+    return f"input tap {x} {y}"
+
+
+def swipe_command(x1: int, y1: int, x2: int, y2: int, duration_ms: int) -> str:
+    return f"input swipe {x1} {y1} {x2} {y2} {duration_ms}"
+
+
+class InputTransport:
+    """Dispatches device shell commands. tap/swipe return after the gesture finished."""
+
+    kind = "base"
+
+    def __init__(self, serial: Optional[str] = None):
+        self.serial = serial
+
+    def prepare(self, points: Dict[str, Tuple[int, int]], screen_wh: Tuple[int, int]) -> None:
+        """Called once by build_actions() with the resolved device points."""
+
+    def run(self, command: str) -> None:
+        raise NotImplementedError
+
+    def tap(self, x: int, y: int) -> None:
+        self.run(tap_command(x, y))
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int) -> None:
+        self.run(swipe_command(x1, y1, x2, y2, duration_ms))
+
+    def close(self) -> None:
+        pass
+
+
+class OneShotTransport(InputTransport):
+    """Legacy mode: one `adb shell <command>` host process per command."""
+
+    kind = "oneshot"
+
+    def __init__(self, serial: Optional[str] = None, adb_cmd: Optional[Sequence[str]] = None):
+        super().__init__(serial)
+        self.adb_cmd = adb_command(serial, adb_cmd)
+
+    def run(self, command: str) -> None:
+        subprocess.run(self.adb_cmd + ["shell", command], check=False)
+
+
+class PersistentShellTransport(InputTransport):
+    """One long-lived `adb shell` session per device; commands are written into its stdin.
+
+    Every command is followed by an echo marker so the call still blocks until the
+    device finished it, same as the one-shot mode. If the command cannot be written
+    to the session it is sent through OneShotTransport instead. Once written it is
+    never resent: a timeout or a dead session while waiting for the marker only
+    restarts the session and records the command in `uncertain`.
+    """
+
+    kind = "persistent"
+
+    def __init__(
+        self,
+        serial: Optional[str] = None,
+        adb_cmd: Optional[Sequence[str]] = None,
+        timeout: float = ADB_COMMAND_TIMEOUT,
+        fallback: bool = True,
+    ):
+        super().__init__(serial)
+        self.adb_cmd = adb_command(serial, adb_cmd)
+        self.timeout = timeout
+        self.fallback = OneShotTransport(serial, adb_cmd) if fallback else None
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._seq = 0
+        # Commands written to the session whose completion was never confirmed.
+        self.uncertain: List[str] = []
+
+    def _start(self) -> None:
+        self._proc = subprocess.Popen(
+            self.adb_cmd + ["shell"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+        )
+        self._lines = queue.Queue()
+        reader = threading.Thread(target=self._read_loop, args=(self._proc, self._lines), daemon=True)
+        reader.start()
+
+    @staticmethod
+    def _read_loop(proc: subprocess.Popen, lines: "queue.Queue[Optional[str]]") -> None:
+        for raw in iter(proc.stdout.readline, b""):
+            lines.put(raw.decode("utf-8", errors="replace").strip())
+        lines.put(None)
+
+    def _alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _write(self, command: str) -> str:
+        if not self._alive():
+            self._start()
+        self._seq += 1
+        marker = f"{_DONE_MARKER}{self._seq}"
+        self._proc.stdin.write(f"{command}; echo {marker}\n".encode("utf-8"))
+        self._proc.stdin.flush()
+        return marker
+
+    def _wait_done(self, command: str, marker: str) -> None:
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"adb shell did not finish {command!r} within {self.timeout}s")
+            try:
+                line = self._lines.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                raise ConnectionError("adb shell session closed")
+            if line == marker:
+                return
+            if line:
+                print(f"[ADB] {line}")
+
+    def run(self, command: str) -> None:
+        with self._lock:
+            try:
+                marker = self._write(command)
+            except OSError as exc:
+                # Nothing reached the device yet: safe to send it another way.
+                self._close_locked()
+                if self.fallback is None:
+                    raise
+                print(f"[WARN] Persistent adb shell failed ({exc}), fallback to one-shot adb.")
+            else:
+                try:
+                    self._wait_done(command, marker)
+                    return
+                except (OSError, TimeoutError, ConnectionError) as exc:
+                    # The command may already have run; sending it again could inject a gesture twice.
+                    self._close_locked()
+                    self.uncertain.append(command)
+                    print(f"[ADB][UNCERTAIN] {command!r} was sent but not confirmed ({exc}); not resent.")
+                    return
+        self.fallback.run(command)
+
+    def _close_locked(self) -> None:
+        proc = self._proc
+        self._proc = None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.write(b"exit\n")
+            proc.stdin.flush()
+            proc.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+            proc.wait()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+
+class FakeTransport(InputTransport):
+    """In-process stand-in: records commands, optionally simulates device time."""
+
+    kind = "fake"
+
+    def __init__(self, serial: Optional[str] = None, latency_ms: float = 0.0, time_scale: float = 0.0):
+        super().__init__(serial)
+        self.latency_ms = latency_ms
+        self.time_scale = time_scale
+        self.commands: List[Tuple[float, str]] = []
+
+    def run(self, command: str) -> None:
+        self.commands.append((time.monotonic(), command))
+        delay = self.latency_ms / 1000.0
+        parts = command.split()
+        if self.time_scale and parts[:2] == ["input", "swipe"] and len(parts) >= 7:
+            delay += int(parts[6]) / 1000.0 * self.time_scale
+        if delay > 0:
+            time.sleep(delay)
+
+
+TRANSPORT_KINDS = {
+    OneShotTransport.kind: OneShotTransport,
+    PersistentShellTransport.kind: PersistentShellTransport,
+    FakeTransport.kind: FakeTransport,
+}
+# Optional backends register themselves on import.
+_LAZY_TRANSPORT_MODULES = {
+    "sendevent": "actions.sendevent_transport",
+    "scrcpy": "actions.scrcpy_transport",
+}
+
+_TRANSPORTS: Dict[Tuple[str, Optional[str]], InputTransport] = {}
+_TRANSPORTS_LOCK = threading.Lock()
+
+
+def register_transport_kind(kind: str, factory) -> None:
+    TRANSPORT_KINDS[kind] = factory
+
+
+def get_transport(kind: Optional[str] = None, serial: Optional[str] = None) -> InputTransport:
+    """Shared transport per (kind, serial). Defaults: AUTO_INPUT_TRANSPORT, ANDROID_SERIAL."""
+    kind = kind or DEFAULT_TRANSPORT
+    serial = serial or os.environ.get("ANDROID_SERIAL") or None
+    if kind not in TRANSPORT_KINDS and kind in _LAZY_TRANSPORT_MODULES:
+        importlib.import_module(_LAZY_TRANSPORT_MODULES[kind])
+    if kind not in TRANSPORT_KINDS:
+        raise ValueError(f"Unknown input transport {kind!r}. Available: {sorted(TRANSPORT_KINDS)}")
+    key = (kind, serial)
+    with _TRANSPORTS_LOCK:
+        transport = _TRANSPORTS.get(key)
+        if transport is None:
+            transport = TRANSPORT_KINDS[kind](serial=serial)
+            _TRANSPORTS[key] = transport
+    return transport
+
+
+def resolve_transport(transport: Union[None, str, InputTransport] = None, serial: Optional[str] = None) -> InputTransport:
+    if isinstance(transport, InputTransport):
+        return transport
+    return get_transport(transport, serial)
+
+
+DispatchHook = Callable[[str, float, int], None]
+
+
+def add_dispatch_hook(transport: InputTransport, hook: DispatchHook) -> None:
+    """Call hook(kind, elapsed_sec, duration_ms) after every tap ("tap", duration 0) and swipe of this instance.
+
+    The wrappers are instance attributes: build_actions() closures, config packs and
+    execute_plan all look tap/swipe up on the shared instance when they dispatch.
+    """
+    hooks: Optional[List[DispatchHook]] = transport.__dict__.get("_dispatch_hooks")
+    if hooks is None:
+        hooks = transport._dispatch_hooks = []
+        tap, swipe = transport.tap, transport.swipe
+
+        def timed_tap(x: int, y: int) -> None:
+            started = time.perf_counter()
+            try:
+                tap(x, y)
+            finally:
+                elapsed = time.perf_counter() - started
+                for each in hooks:
+                    each("tap", elapsed, 0)
+
+        def timed_swipe(x1: int, y1: int, x2: int, y2: int, duration_ms: int) -> None:
+            started = time.perf_counter()
+            try:
+                swipe(x1, y1, x2, y2, duration_ms)
+            finally:
+                elapsed = time.perf_counter() - started
+                for each in hooks:
+                    each("swipe", elapsed, duration_ms)
+
+        transport.tap = timed_tap
+        transport.swipe = timed_swipe
+    hooks.append(hook)
+
+
+def close_transports() -> None:
+    with _TRANSPORTS_LOCK:
+        transports = list(_TRANSPORTS.values())
+        _TRANSPORTS.clear()
+    for transport in transports:
+        transport.close()
+
+
+atexit.register(close_transports)
@@ -0,0 +1,154 @@
+"""Precompiled render configs.
+
+At run start every picked config JSON is parsed, validated and scaled once to
+the device resolution, then kept as a tuple of flat step tuples:
+    (STEP_TAP, x, y)
+    (STEP_SWIPE, x1, y1, x2, y2, duration_ms)
+    (STEP_SLEEP, seconds)
+    (STEP_INFO, message)
+Compiled steps are cached on disk per (config file hash, resolution), so a
+config switch during recording only replays tuples.
+"""
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from actions.transport import InputTransport
+from config.switcher import scale_xy
+
+STEP_TAP = 0
+STEP_SWIPE = 1
+STEP_SLEEP = 2
+STEP_INFO = 3
+
+PACK_VERSION = 1
+PACK_CACHE_DIR = os.environ.get(
+    "AUTO_CONFIG_PACK_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "config_packs"),
+)
+
+Resolution = Optional[Tuple[Tuple[int, int], Tuple[int, int]]]
+
+
+@dataclass(frozen=True)
+class ConfigPack:
+    config_id: str
+    json_path: str
+    source_hash: str
+    steps: Tuple[tuple, ...]
+
+
+def _int_pair(value, where: str) -> Tuple[int, int]:
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ValueError(f"{where}: expected [x, y], got {value!r}")
+    return int(value[0]), int(value[1])
+
+
+def compile_steps(data: Dict[str, object], resolution: Resolution, source: str = "<config>") -> Tuple[tuple, ...]:
+    steps = data.get("steps") if isinstance(data, dict) else None
+    if not isinstance(steps, list):
+        raise ValueError(f"{source}: missing 'steps' list")
+
+    def xy(x: int, y: int) -> Tuple[int, int]:
+        return (x, y) if resolution is None else scale_xy(x, y, resolution[0], resolution[1])
+
+    compiled: List[tuple] = []
+    for index, step in enumerate(steps):
+        where = f"{source} step #{index}"
+        try:
+            kind = step["type"]
+            if kind == "tap":
+                compiled.append((STEP_TAP,) + xy(int(step["x"]), int(step["y"])))
+            elif kind == "swipe":
+                x1, y1 = xy(*_int_pair(step["start"], where))
+                x2, y2 = xy(*_int_pair(step["end"], where))
+                compiled.append((STEP_SWIPE, x1, y1, x2, y2, int(step["duration"])))
+            elif kind == "sleep":
+                compiled.append((STEP_SLEEP, float(step["time"])))
+            elif kind == "info":
+                compiled.append((STEP_INFO, str(step.get("message", ""))))
+            else:
+                raise ValueError(f"{where}: 未知 action 类型: {kind}")
+        except (KeyError, TypeError) as exc:
+            raise ValueError(f"{where}: malformed step {step!r}") from exc
+    return tuple(compiled)
+
+
+def _resolution_key(resolution: Resolution) -> str:
+    if resolution is None:
+        return "native"
+    (sw, sh), (dw, dh) = resolution
+    return f"{sw}x{sh}-{dw}x{dh}"
+
+
+def compile_config(
+    json_path: str,
+    config_id: str,
+    resolution: Resolution,
+    cache_dir: Optional[str] = PACK_CACHE_DIR,
+) -> ConfigPack:
+    with open(json_path, "rb") as f:
+        raw = f.read()
+    source_hash = hashlib.sha256(raw).hexdigest()[:16]
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"v{PACK_VERSION}_{source_hash}_{_resolution_key(resolution)}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                steps = tuple(tuple(step) for step in json.load(f))
+            return ConfigPack(config_id, json_path, source_hash, steps)
+
+    steps = compile_steps(json.loads(raw.decode("utf-8")), resolution, json_path)
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([list(step) for step in steps], f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    return ConfigPack(config_id, json_path, source_hash, steps)
+
+
+def precompile_configs(
+    configs: Sequence[Tuple[str, str]],
+    resolution: Resolution,
+    cache_dir: Optional[str] = PACK_CACHE_DIR,
+) -> Dict[str, ConfigPack]:
+    """Compile (json_path, config_id) pairs from _collect_configs, keyed by json_path.
+
+    resolution is load_action_resolution() of the device. Every config is
+    validated before the first one is applied.
+    """
+    return {json_path: compile_config(json_path, config_id, resolution, cache_dir) for json_path, config_id in configs}
+
+
+def replay_steps(
+    steps: Sequence[tuple],
+    transport: InputTransport,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    if not steps:
+        return
+    tap = transport.tap
+    swipe = transport.swipe
+    for step in steps:
+        code = step[0]
+        if code == STEP_TAP:
+            tap(step[1], step[2])
+        elif code == STEP_SWIPE:
+            swipe(step[1], step[2], step[3], step[4], step[5])
+        elif code == STEP_SLEEP:
+            sleep(step[1])
+        else:
+            print(f"[INFO] {step[1]}")
+    sleep(1)
+
+
+def replay_config_pack(
+    pack: ConfigPack,
+    transport: InputTransport,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    replay_steps(pack.steps, transport, sleep)
@@ -0,0 +1,219 @@
+"""Render-config visiting order and delta application.
+
+A precompiled config (config/config_pack.py) is split into blocks at its
+`info` steps; the block key is the info message. Two configs with the same
+block keys in the same order are switch-compatible: blocks that are identical
+in every picked config (menu navigation) are always replayed, the others
+(setting choices) only when they differ from the config currently applied.
+Configs with a different layout always get a full replay.
+
+Switch costs come from the compiled steps (input dispatch cost per tap/swipe,
+swipe durations, sleeps). The visiting order is a nearest-neighbour tour
+improved with 2-opt, and alternates direction per route so a route boundary
+re-applies the same config.
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from actions.transport import InputTransport
+from config.config_pack import STEP_INFO, STEP_SLEEP, STEP_SWIPE, STEP_TAP, ConfigPack, replay_steps
+
+# Dispatch cost of one tap/swipe, see tools/bench_transport.py for the current transport.
+INPUT_COST_SEC = float(os.environ.get("AUTO_CONFIG_INPUT_COST_SEC", "0.15"))
+TWO_OPT_PASSES = int(os.environ.get("AUTO_CONFIG_TWO_OPT_PASSES", "8"))
+
+BlockKey = Tuple[Optional[str], int]
+
+
+@dataclass(frozen=True)
+class ConfigBlock:
+    key: BlockKey
+    steps: Tuple[tuple, ...]
+
+
+@dataclass(frozen=True)
+class SwitchCost:
+    inputs: int
+    seconds: float
+
+    def __add__(self, other: "SwitchCost") -> "SwitchCost":
+        return SwitchCost(self.inputs + other.inputs, self.seconds + other.seconds)
+
+
+ZERO_COST = SwitchCost(0, 0.0)
+
+
+def split_blocks(steps: Sequence[tuple]) -> Tuple[ConfigBlock, ...]:
+    blocks: List[ConfigBlock] = []
+    seen: Dict[Optional[str], int] = {}
+    key: BlockKey = (None, 0)
+    current: List[tuple] = []
+    for step in steps:
+        if step[0] == STEP_INFO:
+            if current or key[0] is not None:
+                blocks.append(ConfigBlock(key, tuple(current)))
+            message = step[1]
+            seen[message] = seen.get(message, 0) + 1
+            key = (message, seen[message])
+            current = [step]
+        else:
+            current.append(step)
+    if current:
+        blocks.append(ConfigBlock(key, tuple(current)))
+    return tuple(blocks)
+
+
+def steps_cost(steps: Sequence[tuple]) -> SwitchCost:
+    inputs = 0
+    seconds = 0.0
+    for step in steps:
+        code = step[0]
+        if code == STEP_TAP:
+            inputs += 1
+            seconds += INPUT_COST_SEC
+        elif code == STEP_SWIPE:
+            inputs += 1
+            seconds += INPUT_COST_SEC + step[5] / 1000.0
+        elif code == STEP_SLEEP:
+            seconds += step[1]
+    return SwitchCost(inputs, seconds)
+
+
+@dataclass(frozen=True)
+class ConfigPlan:
+    order: Tuple[str, ...]  # json paths
+    fixed_keys: FrozenSet[BlockKey]
+    baseline: SwitchCost  # one route, sorted order, full replays
+    planned: SwitchCost  # one route, planned order, delta replays
+
+    def describe(self, route_count: int) -> str:
+        saved_inputs = (self.baseline.inputs - self.planned.inputs) * route_count
+        saved_sec = (self.baseline.seconds - self.planned.seconds) * route_count
+        return (
+            f"per route {self.baseline.inputs} -> {self.planned.inputs} inputs, "
+            f"{self.baseline.seconds:.1f}s -> {self.planned.seconds:.1f}s; "
+            f"{route_count} routes save {saved_inputs} inputs / {saved_sec / 60:.1f}min"
+        )
+
+
+class _Planner:
+    def __init__(self, packs: Sequence[ConfigPack]):
+        self.packs = list(packs)
+        self.blocks = [split_blocks(pack.steps) for pack in self.packs]
+        self.layouts = [tuple(block.key for block in blocks) for blocks in self.blocks]
+        self.fixed_keys = self._fixed_keys()
+        self.full = [steps_cost(pack.steps) for pack in self.packs]
+        n = len(self.packs)
+        self.cost = [[self._switch(i, j).seconds for j in range(n)] for i in range(n)]
+
+    def _fixed_keys(self) -> FrozenSet[BlockKey]:
+        contents: Dict[BlockKey, set] = {}
+        for blocks in self.blocks:
+            for block in blocks:
+                contents.setdefault(block.key, set()).add(block.steps)
+        return frozenset(key for key, variants in contents.items() if len(variants) == 1)
+
+    def _switch(self, i: int, j: int) -> SwitchCost:
+        if self.layouts[i] != self.layouts[j]:
+            return self.full[j]
+        total = ZERO_COST
+        for prev, block in zip(self.blocks[i], self.blocks[j]):
+            if block.key in self.fixed_keys or prev.steps != block.steps:
+                total = total + steps_cost(block.steps)
+        return total
+
+    def path_cost(self, order: Sequence[int]) -> float:
+        cost = self.cost
+        return sum(cost[a][b] for a, b in zip(order, order[1:]))
+
+    def nearest_neighbour(self, start: int) -> List[int]:
+        order = [start]
+        left = set(range(len(self.packs))) - {start}
+        while left:
+            last = order[-1]
+            nxt = min(left, key=lambda j: (self.cost[last][j], j))
+            order.append(nxt)
+            left.remove(nxt)
+        return order
+
+    def two_opt(self, order: List[int]) -> List[int]:
+        best = self.path_cost(order)
+        for _ in range(TWO_OPT_PASSES):
+            improved = False
+            for i in range(1, len(order) - 1):
+                for k in range(i + 1, len(order)):
+                    candidate = order[:i] + order[i:k + 1][::-1] + order[k + 1:]
+                    cost = self.path_cost(candidate)
+                    if cost < best - 1e-9:
+                        order, best, improved = candidate, cost, True
+            if not improved:
+                break
+        return order
+
+    def total(self, order: Sequence[int]) -> SwitchCost:
+        total = self.full[order[0]]
+        for a, b in zip(order, order[1:]):
+            total = total + self._switch(a, b)
+        return total
+
+
+def plan_config_order(packs: Sequence[ConfigPack]) -> ConfigPlan:
+    if not packs:
+        raise ValueError("No config to plan.")
+    planner = _Planner(packs)
+    n = len(packs)
+    tours = [planner.nearest_neighbour(start) for start in range(n)]
+    best = min(tours, key=lambda order: (planner.full[order[0]].seconds + planner.path_cost(order)))
+    best = planner.two_opt(best)
+    baseline = ZERO_COST
+    for cost in planner.full:
+        baseline = baseline + cost
+    return ConfigPlan(
+        order=tuple(packs[i].json_path for i in best),
+        fixed_keys=planner.fixed_keys,
+        baseline=baseline,
+        planned=planner.total(best),
+    )
+
+
+def order_for_route(configs: Sequence[Tuple[str, str]], plan: ConfigPlan, route_index: int) -> List[Tuple[str, str]]:
+    """Configs in planned order; odd route positions walk it backwards."""
+    by_path = {json_path: (json_path, config_id) for json_path, config_id in configs}
+    ordered = [by_path[json_path] for json_path in plan.order if json_path in by_path]
+    return ordered[::-1] if route_index % 2 else ordered
+
+
+class ConfigSwitcher:
+    """Applies packs, replaying only the changed setting blocks when plan is given."""
+
+    def __init__(self, plan: Optional[ConfigPlan] = None):
+        self.plan = plan
+        self.current: Optional[ConfigPack] = None
+
+    def steps_for(self, pack: ConfigPack) -> Tuple[tuple, ...]:
+        if self.plan is None or self.current is None:
+            return pack.steps
+        prev_blocks = split_blocks(self.current.steps)
+        blocks = split_blocks(pack.steps)
+        if [block.key for block in prev_blocks] != [block.key for block in blocks]:
+            return pack.steps
+        steps: List[tuple] = []
+        for prev, block in zip(prev_blocks, blocks):
+            if block.key in self.plan.fixed_keys or prev.steps != block.steps:
+                steps.extend(block.steps)
+        return tuple(steps)
+
+    def apply(
+        self,
+        pack: ConfigPack,
+        transport: InputTransport,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> int:
+        steps = self.steps_for(pack)
+        # Forget the applied state first: an interrupted replay leaves the game unknown.
+        self.current = None
+        replay_steps(steps, transport, sleep)
+        self.current = pack
+        return len(steps)
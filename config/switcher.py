@@ -8,13 +8,16 @@ from typing import Dict, Optional, Tuple
 from engine.executor import exec_action
 
 
-def load_action_resolution() -> Optional[Tuple[Tuple[int, int], Tuple[int, int]]]:
+def _load_actions_module():
     actions_module_name = os.environ.get("GLOBAL_ACTIONS_MODULE", "actions.global_actions")
     try:
-        actions_module = importlib.import_module(actions_module_name)
+        return importlib.import_module(actions_module_name)
     except ModuleNotFoundError:
-        actions_module = importlib.import_module("actions.global_actions")
+        return importlib.import_module("actions.global_actions")
+
 
+def load_action_resolution() -> Optional[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    actions_module = _load_actions_module()
     base = getattr(actions_module, "BASE_RESOLUTION", None)
     target = getattr(actions_module, "TARGET_RESOLUTION", None)
     if not base or not target:
@@ -46,12 +49,13 @@ def apply_render_config(json_path):
         data = json.load(f)
 
     resolution = load_action_resolution()
+    transport = getattr(_load_actions_module(), "INPUT_TRANSPORT", None)
     if resolution is None:
         for step in data["steps"]:
-            exec_action(step)
+            exec_action(step, transport)
     else:
         src_res, dst_res = resolution
         for step in data["steps"]:
-            exec_action(_map_step(step, src_res, dst_res))
+            exec_action(_map_step(step, src_res, dst_res), transport)
 
     time.sleep(1)
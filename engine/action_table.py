@@ -0,0 +1,56 @@
+import os
+import time
+from typing import Callable, Dict, Mapping
+
+# After a matched "loaded" state: characters and HUD still fade in.
+TELEPORT_SETTLE_SEC = float(os.environ.get("AUTO_TELEPORT_SETTLE_SEC", "1.0"))
+
+
+def build_action_table(actions: Mapping[str, object], sleep: Callable[[float], None] = time.sleep) -> Dict[str, Callable]:
+    """Route action name -> callable, for an exported actions namespace (module vars or build_actions())."""
+
+    wait_for_screen = actions.get("wait_for_screen") or (lambda state, fallback_sec: sleep(fallback_sec))
+    # Sleep that only follows a matched screen state; the route compiler records it as a conditional op.
+    settle = actions.get("settle") or sleep
+
+    def teleport(portal):
+        actions["open_map"]()
+        wait_for_screen("map_open", 1)
+        actions["tap"](*portal)
+        sleep(1)
+        actions["confirm_teleport"]()
+        # confirm_teleport already waited for "loaded", so a matching state returns at once here;
+        # keep a short settle instead of the fixed 3 s. Without screen states this still sleeps 3 s.
+        if wait_for_screen("loaded", 3):
+            settle(TELEPORT_SETTLE_SEC)
+
+    table = {
+        "move": actions["move"],
+        "walk": actions["walk"],
+        "climb": actions["climb"],
+        "swim": actions["swim"],
+        "run": actions["run"],
+        "dash": actions["dash"],
+        "attack": lambda: actions["attack"](),
+        "heavy_attack": lambda: actions["heavy_attack"](),
+        "jump": lambda: actions["jump"](),
+        "util": lambda: actions["util"](),
+        "long_util": lambda: actions["long_util"](),
+        "combat": lambda: actions["combat"](),
+        "glide": actions["glide"],
+        "turn_180": lambda: actions["turn_180"](),
+        "turn_right_90": lambda: actions["turn_right_90"](),
+        "turn_left_90": lambda: actions["turn_left_90"](),
+        "turn_right_45": lambda: actions["turn_right_45"](),
+        "turn_left_45": lambda: actions["turn_left_45"](),
+        "turn_right_30": lambda: actions["turn_right_30"](),
+        "turn_left_30": lambda: actions["turn_left_30"](),
+        "turn_right_135": lambda: actions["turn_right_135"](),
+        "turn_left_135": lambda: actions["turn_left_135"](),
+        "teleport": teleport,
+        "sleep": actions["sleep"],
+    }
+
+    if "adjust_game_time" in actions:
+        table["adjust_game_time"] = lambda: actions["adjust_game_time"]()
+    return table
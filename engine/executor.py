@@ -1,18 +1,20 @@
-import os
 import time
 
-def exec_action(step):
+from actions.transport import get_transport
+
+
+def exec_action(step, transport=None):
     t = step["type"]
 
     if t == "tap":
         x, y = step["x"], step["y"]
-        os.system(f"adb shell input tap {x} {y}")
+        (transport or get_transport()).tap(x, y)
 
     elif t == "swipe":
         x1, y1 = step["start"]
         x2, y2 = step["end"]
         d = step["duration"]
-        os.system(f"adb shell input swipe {x1} {y1} {x2} {y2} {d}")
+        (transport or get_transport()).swipe(x1, y1, x2, y2, d)
 
     elif t == "sleep":
         time.sleep(step["time"])
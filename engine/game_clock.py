@@ -0,0 +1,125 @@
+"""In-game time budget: adjust the game clock only when the next config would leave the lighting window.
+
+The game clock advances AUTO_GAME_MINUTES_PER_SEC game minutes per wall-clock
+second (1.0 = one game day per 24 real minutes) and adjust_game_time leaves it
+at AUTO_GAME_TIME_TARGET. Before each config the budget predicts the game time
+at the end of that config (route nominal duration, or the last measured config
+cycle if longer) and asks for an adjustment only if it would fall outside
+AUTO_GAME_TIME_WINDOW. The run is assumed to start right after an adjustment;
+set AUTO_GAME_TIME_START when it does not.
+
+AUTO_GAME_TIME=every3 (default) keeps the fixed rule: adjust before configs
+4, 7, 10, ... of every route; `off` never adjusts.
+"""
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+GAME_TIME_MODE = os.environ.get("AUTO_GAME_TIME", "every3").strip().lower()
+if GAME_TIME_MODE not in ("every3", "budget", "off"):
+    raise ValueError(f"Unknown AUTO_GAME_TIME={GAME_TIME_MODE!r}. Use every3, budget or off.")
+GAME_MINUTES_PER_SEC = float(os.environ.get("AUTO_GAME_MINUTES_PER_SEC", "1.0"))
+GAME_TIME_TARGET = os.environ.get("AUTO_GAME_TIME_TARGET", "08:00")
+GAME_TIME_WINDOW = os.environ.get("AUTO_GAME_TIME_WINDOW", "07:00-16:00")
+GAME_TIME_START = os.environ.get("AUTO_GAME_TIME_START", "").strip()
+LEGACY_EVERY = 3
+_DAY = 24 * 60
+
+
+def parse_clock(text: str) -> float:
+    hours, _, minutes = text.strip().partition(":")
+    value = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= value < _DAY:
+        raise ValueError(f"Invalid game time {text!r}; use HH:MM")
+    return float(value)
+
+
+def format_clock(minutes: float) -> str:
+    minutes = int(minutes) % _DAY
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_window(text: str) -> Tuple[float, float]:
+    start, sep, end = text.partition("-")
+    if not sep:
+        raise ValueError(f"Invalid AUTO_GAME_TIME_WINDOW {text!r}; use HH:MM-HH:MM")
+    return parse_clock(start), parse_clock(end)
+
+
+def legacy_adjusts(idx: int) -> bool:
+    """The fixed rule: before every third config of a route, starting with the fourth."""
+    return idx > 1 and (idx - 1) % LEGACY_EVERY == 0
+
+
+class GameTimeBudget:
+    def __init__(
+        self,
+        rate: float = GAME_MINUTES_PER_SEC,
+        target: Optional[float] = None,
+        window: Optional[Tuple[float, float]] = None,
+        start: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """target / window default to AUTO_GAME_TIME_TARGET / AUTO_GAME_TIME_WINDOW, parsed here rather
+        than at import, so malformed values only fail when a budget is actually built."""
+        target = parse_clock(GAME_TIME_TARGET) if target is None else target
+        window = parse_window(GAME_TIME_WINDOW) if window is None else window
+        self.rate = rate
+        self.target = target
+        self.window = window
+        self.clock = clock
+        if not self._inside(target, 0.0):
+            raise ValueError(
+                f"AUTO_GAME_TIME_TARGET {format_clock(target)} lies outside the window "
+                f"{format_clock(window[0])}-{format_clock(window[1])}"
+            )
+        self._anchor_game = target if start is None else start
+        self._anchor_wall = clock()
+        self._last_check: Optional[float] = None
+        self.last_cycle_sec = 0.0
+        self.adjust_sec: List[float] = []
+        self.legacy = 0
+
+    @property
+    def window_minutes(self) -> float:
+        return (self.window[1] - self.window[0]) % _DAY
+
+    def game_now(self) -> float:
+        return (self._anchor_game + self.rate * (self.clock() - self._anchor_wall)) % _DAY
+
+    def _inside(self, game_time: float, seconds: float) -> bool:
+        offset = (game_time - self.window[0]) % _DAY
+        return offset + self.rate * seconds <= self.window_minutes
+
+    def should_adjust(self, nominal_config_sec: float) -> bool:
+        """True when the coming config would end outside the window."""
+        now = self.clock()
+        if self._last_check is not None:
+            self.last_cycle_sec = now - self._last_check
+        self._last_check = now
+        return not self._inside(self.game_now(), max(nominal_config_sec, self.last_cycle_sec))
+
+    def adjusted(self, started: float) -> None:
+        """adjust_game_time() ran from `started` until now and left the clock at the target."""
+        now = self.clock()
+        self.adjust_sec.append(now - started)
+        self._anchor_game = self.target
+        self._anchor_wall = now
+        # The adjustment is not part of the next config cycle.
+        if self._last_check is not None:
+            self._last_check = now
+
+    def mean_adjust_sec(self, nominal_adjust_sec: float) -> float:
+        return sum(self.adjust_sec) / len(self.adjust_sec) if self.adjust_sec else nominal_adjust_sec
+
+    def saved_sec(self, nominal_adjust_sec: float) -> float:
+        """Wall time saved against the every-3 rule over the configs seen so far."""
+        return (self.legacy - len(self.adjust_sec)) * self.mean_adjust_sec(nominal_adjust_sec)
+
+    def describe(self, nominal_adjust_sec: float) -> str:
+        return (
+            f"adjustments={len(self.adjust_sec)} (every-{LEGACY_EVERY} rule: {self.legacy}) "
+            f"avg={self.mean_adjust_sec(nominal_adjust_sec):.1f}s saved~{self.saved_sec(nominal_adjust_sec):.0f}s "
+            f"window={format_clock(self.window[0])}-{format_clock(self.window[1])} "
+            f"game_now={format_clock(self.game_now())}"
+        )
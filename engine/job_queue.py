@@ -0,0 +1,187 @@
+"""SQLite-backed (route, config) work queue shared by phones of the same model.
+
+Several workers running the same DeviceProfile point AUTO_JOB_QUEUE at one
+database file. Every route is seeded once with its config list; workers then
+walk the routes in order, claim configs of the route they are standing in and
+move on through NEXT_PORTAL when that route has nothing left to claim. Claims
+are leases, so configs held by a worker that died are handed out again:
+reclaim_expired() returns them to pending in every route, including routes
+the other workers already walked past, and claimable_routes() tells a worker
+which of those it still has to go back to.
+"""
+import os
+import socket
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LEASE_SEC = float(os.environ.get("AUTO_JOB_LEASE_SEC", "900"))
+MAX_ATTEMPTS = int(os.environ.get("AUTO_JOB_MAX_ATTEMPTS", "3"))
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    route INTEGER PRIMARY KEY,
+    seeded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    route INTEGER NOT NULL,
+    config_id TEXT NOT NULL,
+    json_path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    finished_at REAL,
+    PRIMARY KEY (route, config_id)
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (route, state, position);
+"""
+
+
+def default_worker_id() -> str:
+    return os.environ.get("AUTO_JOB_WORKER") or os.environ.get("ANDROID_SERIAL") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    def __init__(
+        self,
+        path: str,
+        lease_sec: float = LEASE_SEC,
+        max_attempts: int = MAX_ATTEMPTS,
+        clock: Callable[[], float] = time.time,
+    ):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self.clock = clock
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE.
+        self._conn = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _write(self, fn: Callable[[sqlite3.Connection], object]):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(self._conn)
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        return result
+
+    def seed_route(
+        self,
+        route: int,
+        configs: Sequence[Tuple[str, str]],
+        on_seed: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """Insert (json_path, config_id) jobs for a route once. on_seed runs inside the
+        write lock, so e.g. clearing old outputs finishes before any worker can claim."""
+
+        def seed(conn: sqlite3.Connection) -> bool:
+            if conn.execute("SELECT 1 FROM routes WHERE route = ?", (route,)).fetchone():
+                return False
+            conn.execute("INSERT INTO routes (route, seeded_at) VALUES (?, ?)", (route, self.clock()))
+            conn.executemany(
+                "INSERT INTO jobs (route, config_id, json_path, position, state) VALUES (?, ?, ?, ?, ?)",
+                [(route, config_id, json_path, pos, PENDING) for pos, (json_path, config_id) in enumerate(configs)],
+            )
+            if on_seed is not None:
+                on_seed()
+            return True
+
+        return self._write(seed)
+
+    def claim(self, route: int, worker: str) -> Optional[Tuple[str, str, int]]:
+        """Lease the next config of a route. Returns (json_path, config_id, position) or None."""
+
+        def claim(conn: sqlite3.Connection):
+            now = self.clock()
+            row = conn.execute(
+                "SELECT config_id, json_path, position FROM jobs "
+                "WHERE route = ? AND (state = ? OR (state = ? AND lease_until < ?)) "
+                "ORDER BY position LIMIT 1",
+                (route, PENDING, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            config_id, json_path, position = row
+            conn.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                "WHERE route = ? AND config_id = ?",
+                (LEASED, worker, now + self.lease_sec, route, config_id),
+            )
+            return json_path, config_id, position
+
+        return self._write(claim)
+
+    def reclaim_expired(self) -> int:
+        """Return expired leases of all routes to pending (failed after max_attempts). -> rows changed.
+
+        The worker column is kept, so a slow holder can still complete the config.
+        """
+
+        def reclaim(conn: sqlite3.Connection) -> int:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "lease_until = NULL, error = ? WHERE state = ? AND lease_until < ?",
+                (self.max_attempts, FAILED, PENDING, "lease expired", LEASED, self.clock()),
+            )
+            return cursor.rowcount
+
+        return self._write(reclaim)
+
+    def claimable_routes(self) -> List[int]:
+        """Routes with a pending config or an expired lease, in route order."""
+        rows = self._conn.execute(
+            "SELECT DISTINCT route FROM jobs WHERE state = ? OR (state = ? AND lease_until < ?) ORDER BY route",
+            (PENDING, LEASED, self.clock()),
+        )
+        return [row[0] for row in rows]
+
+    def complete(self, route: int, config_id: str, worker: str) -> None:
+        self._write(
+            lambda conn: conn.execute(
+                "UPDATE jobs SET state = ?, lease_until = NULL, error = NULL, finished_at = ? "
+                "WHERE route = ? AND config_id = ? AND worker = ?",
+                (DONE, self.clock(), route, config_id, worker),
+            )
+        )
+
+    def release(self, route: int, config_id: str, worker: str, error: str) -> None:
+        """Give a config back after a failed attempt; it is parked as failed after max_attempts."""
+        self._write(
+            lambda conn: conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "lease_until = NULL, error = ? WHERE route = ? AND config_id = ? AND worker = ?",
+                (self.max_attempts, FAILED, PENDING, error, route, config_id, worker),
+            )
+        )
+
+    def counts(self, route: Optional[int] = None) -> Dict[str, int]:
+        query = "SELECT state, COUNT(*) FROM jobs"
+        params: tuple = ()
+        if route is not None:
+            query += " WHERE route = ?"
+            params = (route,)
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        for state, count in self._conn.execute(query + " GROUP BY state", params):
+            counts[state] = count
+        return counts
+
+    def done_config_ids(self, route: int):
+        rows = self._conn.execute(
+            "SELECT config_id FROM jobs WHERE route = ? AND state = ? ORDER BY position", (route, DONE)
+        )
+        return [row[0] for row in rows]
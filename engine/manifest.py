@@ -0,0 +1,71 @@
+"""Input-hash manifest for incremental re-recording.
+
+For every recorded (route, config) the manifest keeps one hash over the inputs
+that shaped its videos: the route file, the render config JSON, the device key
+(resolved POINTS incl. OFFSETS, resolution, step timing; see
+engine.route_compiler.device_key) and the recorder settings. A pair is up to
+date when its hash matches and all of its planned videos are finalized mp4s
+(recording.mp4_probe.videos_usable).
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, Mapping
+
+from recording.mp4_probe import videos_usable
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def input_hash(route_digest: str, config_path: str, device: str, recorder: Mapping[str, object]) -> str:
+    payload = {
+        "route": route_digest,
+        "config": file_digest(config_path),
+        "device": device,
+        "recorder": dict(recorder),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+
+
+class Manifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, object]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def _key(route: int, config_id: str) -> str:
+        return f"{route}/{config_id}"
+
+    def is_current(self, route: int, config_id: str, digest: str, video_paths: Iterable[str]) -> bool:
+        entry = self.entries.get(self._key(route, config_id))
+        if entry is None or entry.get("hash") != digest:
+            return False
+        return videos_usable(list(video_paths))
+
+    def record(self, route: int, config_id: str, digest: str, video_paths: Iterable[str]) -> None:
+        self.entries[self._key(route, config_id)] = {
+            "hash": digest,
+            "videos": [os.path.relpath(path, os.path.dirname(self.path)) for path in video_paths],
+            "time": time.time(),
+        }
+        self.save()
+
+    def forget_route(self, route: int) -> None:
+        prefix = f"{route}/"
+        for key in [key for key in self.entries if key.startswith(prefix)]:
+            del self.entries[key]
+        self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,1008 @@
+"""Shared multi-route recording loop.
+
+Device scripts (multiroute_*.py) set GLOBAL_ACTIONS_MODULE before importing
+this module, because engine.runner binds ACTION_TABLE at import time, and then
+call run_multi_routes() with their DeviceProfile. multiroute_all.py runs
+several of those scripts side by side, one process per phone.
+"""
+import importlib.util
+import os
+import time
+from dataclasses import asdict, dataclass, replace
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from config.config_pack import ConfigPack, precompile_configs
+from config.config_planner import ConfigPlan, ConfigSwitcher, order_for_route, plan_config_order
+from config.switcher import load_action_resolution, scale_xy
+from engine.game_clock import (
+    GAME_TIME_MODE,
+    GAME_TIME_START,
+    GameTimeBudget,
+    format_clock,
+    legacy_adjusts,
+    parse_clock,
+)
+from engine.job_queue import LEASED, PENDING, JobQueue, default_worker_id
+from engine.manifest import Manifest, file_digest, input_hash
+from engine.profiler import PROFILER
+from engine.progress import report
+from engine.route_compiler import CompiledRoute, compile_route_file, describe_plan, device_key, execute_plan
+from engine.route_segments import (
+    RouteSegment,
+    build_route_segments,
+    check_expected_videos,
+    cleanup_route_outputs,
+    planned_video_paths,
+    segment_expectations,
+    segment_video_path,
+)
+from actions.dispatch_latency import DISPATCH_MIN_GAP_SEC, get_compensator
+from actions.screen_state import capture_frame
+from engine.portal_check import PORTAL_CHECK, PortalChecker
+from engine.run_journal import RunJournal
+from engine.runner import ACTION_TABLE, ACTIONS_MODULE_NAME, INPUT_TRANSPORT, MAPPING_MODULE, SCREEN_WAITER
+from engine.scheduler import STEP_DELAY, StepScheduler, append_timings_jsonl, nominal_duration, summarize_timings
+from recording.finalizer import Finalizer
+from recording.readiness import STARTUP_LATENCY
+from recording.recorder import RECORDINGS_DEFERRED, recorder_settings
+from recording.remux import RECORD_CONTAINER, capture_path
+from recording.screenrecord_recorder import DEVICE_PULLS
+from recording.staging import STAGING_MOVER, staged_path
+from recording.segment_recorder import (
+    RECORD_MODE,
+    PrewarmedRecorder,
+    RecorderPoolStats,
+    SegmentSink,
+    make_segment_recorder,
+    record_start_cost,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROUTE_ROOT = os.path.join(REPO_ROOT, "routes", "natlan_v2")
+DEFAULT_PROJECT_ROOT = os.path.abspath(os.path.join(REPO_ROOT, "..", ".."))
+PROJECT_ROOT = os.environ.get("AUTO_PROJECT_ROOT", DEFAULT_PROJECT_ROOT)
+
+ROUTE_GAP = 1.0
+RECORD_START_SETTLE_SEC = float(os.environ.get("AUTO_RECORD_START_SETTLE_SEC", "0.3"))
+USE_DEADLINE_SCHEDULER = os.environ.get("AUTO_DEADLINE_SCHEDULER", "0") == "1"
+STEP_TIMING_LOG = os.environ.get("AUTO_STEP_TIMING_LOG", "").strip()
+USE_COMPILED_ROUTES = os.environ.get("AUTO_COMPILED_ROUTES", "0") == "1"
+# Shared SQLite queue for several phones of one profile; see engine/job_queue.py.
+JOB_QUEUE_PATH = os.environ.get("AUTO_JOB_QUEUE", "").strip()
+# Completed (route, config, segment) units; AUTO_RESUME=1 continues from it instead of re-recording routes.
+JOURNAL_FILE_NAME = "_run_journal.jsonl"
+RUN_JOURNAL_PATH = os.environ.get("AUTO_RUN_JOURNAL", "").strip()
+RESUME = os.environ.get("AUTO_RESUME", "0") == "1"
+# Input hash per recorded (route, config); AUTO_INCREMENTAL=1 only re-records stale or missing pairs.
+MANIFEST_FILE_NAME = "_manifest.json"
+INCREMENTAL = os.environ.get("AUTO_INCREMENTAL", "0") == "1"
+# Reorder configs for cheap switches and replay only changed setting blocks; see config/config_planner.py.
+USE_CONFIG_PLAN = os.environ.get("AUTO_CONFIG_PLAN", "0") == "1"
+# Continuous-mode raw streams (AUTO_RECORD_MODE=continuous) under <video_base>.
+RAW_STREAM_DIR = "_raw"
+# Warm/cold start counters of AUTO_RECORD_MODE=prewarm over the whole run.
+POOL_STATS = RecorderPoolStats()
+# AUTO_ASYNC_FINALIZE=1: wait for scrcpy/ffmpeg on background threads; a config counts as done
+# (journal, manifest, queue) only after all of its segments were finalized. mkv captures
+# (AUTO_RECORD_CONTAINER=mkv) are always remuxed there, concurrently with the next recordings.
+ASYNC_FINALIZE = os.environ.get("AUTO_ASYNC_FINALIZE", "0") == "1" or RECORD_CONTAINER == "mkv"
+FINALIZER = Finalizer() if ASYNC_FINALIZE else None
+# Segments reach segment_video_path only at route end: pulled from the phone and/or moved off staging.
+OUTPUTS_DEFERRED = RECORDINGS_DEFERRED or STAGING_MOVER is not None
+# AUTO_GAME_TIME=budget: adjust the game clock only when a config would leave the lighting window.
+GAME_CLOCK = (
+    GameTimeBudget(start=parse_clock(GAME_TIME_START) if GAME_TIME_START else None)
+    if GAME_TIME_MODE == "budget"
+    else None
+)
+# AUTO_PORTAL_CHECK=1: compare the minimap after every teleport with the route's portal signature
+# and skip a config that would start from the wrong place; see engine/portal_check.py.
+PORTAL_CHECKER = (
+    PortalChecker(
+        ROUTE_ROOT,
+        MAPPING_MODULE,
+        lambda: capture_frame(INPUT_TRANSPORT.serial),
+        lambda portal: _teleport(portal),
+    )
+    if PORTAL_CHECK
+    else None
+)
+
+# AUTO_DISPATCH_COMPENSATION=1: shorten STEP_DELAY by the calibrated dispatch overhead of each step's
+# inputs; see actions/dispatch_latency.py. Legacy scheduler only: deadline and compiled steps need none.
+DISPATCH_COMPENSATOR = get_compensator(
+    INPUT_TRANSPORT,
+    MAPPING_MODULE,
+    "AUTO_COMPILED_ROUTES" if USE_COMPILED_ROUTES else "AUTO_DEADLINE_SCHEDULER" if USE_DEADLINE_SCHEDULER else None,
+)
+
+# Route PORTAL/NEXT_PORTAL and render configs are maintained in huaweipura coordinates;
+# identity on the baseline.
+ACTION_RESOLUTION = load_action_resolution()
+if ACTION_RESOLUTION is None:
+    raise RuntimeError("Failed to load action resolution for portal scaling.")
+PORTAL_SRC_RESOLUTION, PORTAL_DST_RESOLUTION = ACTION_RESOLUTION
+
+
+@dataclass(frozen=True)
+class DeviceProfile:
+    name: str
+    config_root: str
+    video_base: str
+    route_suffixes: Optional[Sequence[int]] = None
+    skip_route_suffixes: Sequence[int] = ()
+    total_configs_per_route: int = 80
+    start_from_route: Optional[int] = None
+    end_at_route: Optional[int] = None
+
+
+def _resolve_skip_route_suffixes(profile: DeviceProfile) -> List[int]:
+    skip = set(profile.skip_route_suffixes)
+    raw = os.environ.get("AUTO_SKIP_ROUTE_SUFFIXES", "").strip()
+    if not raw:
+        return sorted(skip)
+
+    for token in raw.split(","):
+        item = token.strip()
+        if not item:
+            continue
+        if not item.isdigit():
+            raise ValueError(
+                f"Invalid route suffix in AUTO_SKIP_ROUTE_SUFFIXES: {item!r}. "
+                "Use comma-separated positive integers, e.g. 2,5,9"
+            )
+        skip.add(int(item))
+    return sorted(skip)
+
+
+def _resolve_optional_route_suffix(default_value: Optional[int], env_key: str) -> Optional[int]:
+    raw = os.environ.get(env_key, "").strip()
+    if not raw:
+        return default_value
+    if not raw.isdigit() or int(raw) <= 0:
+        raise ValueError(f"{env_key} must be a positive integer route suffix.")
+    return int(raw)
+
+
+def _load_route_module(route_suffix: int):
+    route_path = os.path.join(ROUTE_ROOT, f"{route_suffix}.py")
+    module_name = f"natlan_route_{route_suffix}"
+    spec = importlib.util.spec_from_file_location(module_name, route_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Failed to load route module from {route_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _discover_route_suffixes() -> List[int]:
+    suffixes: List[int] = []
+    for name in os.listdir(ROUTE_ROOT):
+        base, ext = os.path.splitext(name)
+        if ext != ".py" or not base.isdigit():
+            continue
+        suffixes.append(int(base))
+    suffixes.sort()
+    return suffixes
+
+
+def _apply_route_window(profile: DeviceProfile, route_suffixes: List[int]) -> List[int]:
+    start_from = _resolve_optional_route_suffix(profile.start_from_route, "AUTO_START_FROM_ROUTE")
+    end_at = _resolve_optional_route_suffix(profile.end_at_route, "AUTO_END_AT_ROUTE")
+
+    if start_from is not None and start_from not in route_suffixes:
+        raise ValueError(f"START_FROM_ROUTE={start_from} not in active routes: {route_suffixes}")
+    if end_at is not None and end_at not in route_suffixes:
+        raise ValueError(f"END_AT_ROUTE={end_at} not in active routes: {route_suffixes}")
+    if start_from is not None and end_at is not None and start_from > end_at:
+        raise ValueError("START_FROM_ROUTE must be <= END_AT_ROUTE.")
+
+    if start_from is not None:
+        route_suffixes = [suffix for suffix in route_suffixes if suffix >= start_from]
+        print(f"[INFO] Start from route: {start_from}")
+    if end_at is not None:
+        route_suffixes = [suffix for suffix in route_suffixes if suffix <= end_at]
+        print(f"[INFO] End at route: {end_at}")
+    return route_suffixes
+
+
+CONFIG_SWITCHER = ConfigSwitcher()
+
+
+def _build_portal(portal_xy) -> List[int]:
+    return list(scale_xy(portal_xy[0], portal_xy[1], PORTAL_SRC_RESOLUTION, PORTAL_DST_RESOLUTION))
+
+
+def _collect_configs(root_folder: str, limit: int) -> List[Tuple[str, str]]:
+    picked: List[Tuple[str, str]] = []
+    for res_folder in sorted(os.listdir(root_folder)):
+        full_path = os.path.join(root_folder, res_folder)
+        if not os.path.isdir(full_path):
+            continue
+
+        for file_name in sorted(os.listdir(full_path)):
+            if not file_name.endswith(".json"):
+                continue
+            config_id = (
+                f"{res_folder}_{os.path.splitext(file_name)[0]}"
+                if res_folder
+                else os.path.splitext(file_name)[0]
+            )
+            picked.append((os.path.join(full_path, file_name), config_id))
+            if len(picked) >= limit:
+                return picked
+    return picked
+
+
+def _load_configs(
+    profile: DeviceProfile, route_count: int
+) -> Tuple[List[Tuple[str, str]], Dict[str, ConfigPack], Optional[ConfigPlan]]:
+    configs = _collect_configs(profile.config_root, profile.total_configs_per_route)
+    if not configs:
+        raise ValueError("No config json found.")
+    started = time.perf_counter()
+    packs = precompile_configs(configs, ACTION_RESOLUTION)
+    print(f"[CONFIG] Precompiled {len(packs)} configs in {(time.perf_counter() - started) * 1000:.0f}ms")
+    if not USE_CONFIG_PLAN:
+        return configs, packs, None
+
+    plan = plan_config_order(list(packs.values()))
+    CONFIG_SWITCHER.plan = plan
+    print(f"[CONFIG-PLAN] {plan.describe(route_count)}")
+    return configs, packs, plan
+
+
+def _raw_stream_path(video_base_dir: str, route_suffix: Optional[int], config_id: str) -> str:
+    raw_path = os.path.join(video_base_dir, RAW_STREAM_DIR, f"r{route_suffix or 0:02d}_{config_id}.mp4")
+    return capture_path(staged_path(raw_path))
+
+
+def _segment_sink(journal: Optional[RunJournal], route_suffix: Optional[int], config_id: str) -> SegmentSink:
+    def on_finished(segment_index: int, video_path: str) -> None:
+        if journal is not None:
+            journal.segment_done(route_suffix, config_id, segment_index, video_path)
+
+    return SegmentSink(on_finished, FINALIZER, route_suffix, config_id)
+
+
+def _report_pool_stats(recorder, config_id: str) -> None:
+    if isinstance(recorder, PrewarmedRecorder):
+        POOL_STATS.add(recorder.stats)
+        print(f"[RECORD-POOL] {config_id}: {recorder.stats.describe()} | run total: {POOL_STATS.describe()}")
+        report("recorder_pool", **asdict(POOL_STATS))
+
+
+def _report_startup_latency() -> None:
+    """Cumulative histogram of scrcpy spawn -> live latency, per device."""
+    for device in STARTUP_LATENCY.devices():
+        lines = STARTUP_LATENCY.describe(device)
+        print(f"[SCRCPY-READY][{device}] {lines[0]}")
+        for line in lines[1:]:
+            print(f"[SCRCPY-READY][{device}]   {line}")
+
+
+def _begin_profile(profile: DeviceProfile) -> None:
+    if PROFILER.enabled:
+        PROFILER.begin(profile.name)
+        PROFILER.instrument_transport(INPUT_TRANSPORT)
+
+
+def _report_profile() -> None:
+    """Where the run's wall time went, per route (AUTO_PROFILE=1)."""
+    if not PROFILER.enabled:
+        return
+    for line in PROFILER.describe():
+        print(f"[PROFILE][{PROFILER.device}] {line}")
+    if PROFILER.trace_path:
+        print(f"[PROFILE] Span trace: {PROFILER.trace_path}")
+    seconds = {category: round(value, 1) for category, value in PROFILER.totals().items()}
+    report("profile", wall_sec=round(PROFILER.wall_sec(), 1), seconds=seconds)
+    PROFILER.close()
+
+
+def _teleport(portal: Sequence[int]) -> None:
+    with PROFILER.span("teleport", "teleport", portal=list(portal)):
+        ACTION_TABLE["teleport"](portal)
+
+
+def _report_screen_waits() -> None:
+    """How long teleports waited for each screen state (AUTO_SCREEN_STATE=1)."""
+    if SCREEN_WAITER is None:
+        return
+    for line in SCREEN_WAITER.describe():
+        print(f"[SCREEN] {line}")
+
+
+def run_route_recording(
+    route: Sequence[Sequence[object]],
+    current_portal: List[int],
+    video_base_dir: str,
+    config_id: str,
+    segments: Sequence[RouteSegment],
+    teleport_portal=None,
+    route_suffix: Optional[int] = None,
+    journal: Optional[RunJournal] = None,
+) -> bool:
+    recorder = make_segment_recorder(
+        _segment_sink(journal, route_suffix, config_id),
+        _raw_stream_path(video_base_dir, route_suffix, config_id),
+        RECORD_START_SETTLE_SEC,
+    )
+    segment_cursor = 0
+    teleport_used = False
+
+    def start_segment(segment: RouteSegment, video_path: str):
+        with PROFILER.span("recorder.start", "recorder", segment=segment.segment_index):
+            recorder.start_segment(segment.segment_index, video_path)
+
+    def stop_segment():
+        with PROFILER.span("recorder.stop", "recorder"):
+            recorder.stop_segment()
+            if segment_cursor < len(segments):
+                recorder.prepare()
+
+    recorder.begin()
+    if segments:
+        recorder.prepare()
+    scheduler = StepScheduler(
+        STEP_DELAY,
+        deadline=USE_DEADLINE_SCHEDULER,
+        overhead=DISPATCH_COMPENSATOR.overhead_sec if DISPATCH_COMPENSATOR is not None else None,
+        min_gap=DISPATCH_MIN_GAP_SEC,
+    )
+    try:
+        for step in route:
+            name = step[0]
+            args = step[1:] if len(step) > 1 else []
+            print(f"[ACTION] {name} {tuple(args)}")
+
+            if name == "record_start":
+                if segment_cursor >= len(segments):
+                    raise ValueError("record_start count does not match precomputed route segments.")
+                segment = segments[segment_cursor]
+                segment_cursor += 1
+                video_path = segment_video_path(video_base_dir, config_id, segment)
+                os.makedirs(os.path.dirname(video_path), exist_ok=True)
+                scheduler.run_marker(
+                    name,
+                    lambda: start_segment(segment, video_path),
+                    nominal=record_start_cost(RECORD_START_SETTLE_SEC),
+                )
+                continue
+
+            if name == "record_stop":
+                scheduler.run_marker(name, stop_segment)
+                continue
+
+            if name == "teleport":
+                target_portal = teleport_portal if teleport_portal is not None else current_portal
+                scheduler.run_action(name, (target_portal,), _teleport, elastic=SCREEN_WAITER is not None)
+                teleport_used = True
+            else:
+                scheduler.run_action(name, args, ACTION_TABLE[name])
+        scheduler.finish()
+    except BaseException:
+        try:
+            scheduler.finish()
+        finally:
+            recorder.abort()
+        raise
+    with PROFILER.span("recorder.finish", "recorder"):
+        recorder.finish()
+    _report_pool_stats(recorder, config_id)
+
+    compensation = f" dispatch_comp=-{scheduler.compensated_sec:.2f}s" if DISPATCH_COMPENSATOR is not None else ""
+    print(f"[TIMING] {config_id}: {summarize_timings(scheduler.timings)}{compensation}")
+    if STEP_TIMING_LOG:
+        append_timings_jsonl(STEP_TIMING_LOG, scheduler.timings, route=route_suffix, config_id=config_id)
+
+    if segment_cursor != len(segments):
+        raise ValueError(
+            f"Route consumed {segment_cursor} record_start actions, expected {len(segments)}."
+        )
+    return teleport_used
+
+
+def run_compiled_route_recording(
+    plan: CompiledRoute,
+    video_base_dir: str,
+    config_id: str,
+    segments: Sequence[RouteSegment],
+    teleport_portal: List[int],
+    route_suffix: Optional[int] = None,
+    journal: Optional[RunJournal] = None,
+) -> bool:
+    recorder = make_segment_recorder(
+        _segment_sink(journal, route_suffix, config_id),
+        _raw_stream_path(video_base_dir, route_suffix, config_id),
+        0.0,
+    )
+    started_segments = 0
+
+    def start_segment(segment_index: int):
+        nonlocal started_segments
+        started_segments += 1
+        video_path = segment_video_path(video_base_dir, config_id, segments[segment_index - 1])
+        os.makedirs(os.path.dirname(video_path), exist_ok=True)
+        with PROFILER.span("recorder.start", "recorder", segment=segment_index):
+            recorder.start_segment(segment_index, video_path)
+
+    def stop_segment():
+        with PROFILER.span("recorder.stop", "recorder"):
+            recorder.stop_segment()
+            if started_segments < len(segments):
+                recorder.prepare()
+
+    recorder.begin()
+    if segments:
+        recorder.prepare()
+    try:
+        actual = execute_plan(
+            plan, INPUT_TRANSPORT, teleport_portal, start_segment, stop_segment, wait_state=SCREEN_WAITER
+        )
+    except BaseException:
+        recorder.abort()
+        raise
+    with PROFILER.span("recorder.finish", "recorder"):
+        recorder.finish()
+    _report_pool_stats(recorder, config_id)
+
+    print(f"[TIMING] {config_id}: planned={plan.nominal_duration:.2f}s actual={actual:.2f}s")
+    return any(step.name == "teleport" for step in plan.steps)
+
+
+@dataclass(frozen=True)
+class _RouteContext:
+    route_suffix: int
+    route: Sequence[Sequence[object]]
+    current_portal: List[int]
+    next_portal: Optional[List[int]]
+    segments: List[RouteSegment]
+    plan: Optional[CompiledRoute]
+
+
+def _load_route_context(route_suffix: int) -> _RouteContext:
+    route_module = _load_route_module(route_suffix)
+    next_portal_raw = getattr(route_module, "NEXT_PORTAL", None)
+    return _RouteContext(
+        route_suffix=route_suffix,
+        route=route_module.ROUTE,
+        current_portal=_build_portal(route_module.PORTAL),
+        next_portal=_build_portal(next_portal_raw) if next_portal_raw else None,
+        segments=build_route_segments(route_module.ROUTE, "natlan", route_suffix),
+        plan=None,
+    )
+
+
+def _prepare_route(route_suffix: int) -> _RouteContext:
+    ctx = _load_route_context(route_suffix)
+    print(f"\n[ROUTE] Start route {route_suffix}")
+    print(f"[ROUTE] Current portal: {ctx.current_portal}")
+    if ctx.next_portal is not None:
+        print(f"[ROUTE] Next portal: {ctx.next_portal}")
+    print(f"[ROUTE] Segment count: {len(ctx.segments)}")
+
+    if not USE_COMPILED_ROUTES:
+        return ctx
+    plan = compile_route_file(
+        os.path.join(ROUTE_ROOT, f"{route_suffix}.py"),
+        ACTIONS_MODULE_NAME,
+        STEP_DELAY,
+        record_start_cost(RECORD_START_SETTLE_SEC),
+    )
+    if len(plan.segments) != len(ctx.segments):
+        raise ValueError(f"Compiled route {route_suffix} has {len(plan.segments)} segments, expected {len(ctx.segments)}.")
+    print(f"[PLAN] Route {route_suffix}: {describe_plan(plan)}")
+    return replace(ctx, plan=plan)
+
+
+@lru_cache(maxsize=None)
+def _input_fingerprint() -> Tuple[str, Dict[str, object]]:
+    device = device_key(ACTIONS_MODULE_NAME, STEP_DELAY, record_start_cost(RECORD_START_SETTLE_SEC))
+    return device, {**recorder_settings(), "mode": RECORD_MODE}
+
+
+def _route_nominal_sec(ctx: _RouteContext) -> float:
+    if ctx.plan is not None:
+        return ctx.plan.nominal_duration
+    total = 0.0
+    for step in ctx.route:
+        name = step[0]
+        if name == "record_start":
+            total += record_start_cost(RECORD_START_SETTLE_SEC)
+        elif name != "record_stop":
+            total += nominal_duration(name, tuple(step[1:])) + STEP_DELAY
+    return total
+
+
+def _maybe_adjust_game_time(ctx: _RouteContext, idx: int) -> None:
+    if GAME_TIME_MODE == "off":
+        return
+    if GAME_CLOCK is None:
+        if not legacy_adjusts(idx):
+            return
+        note = ""
+    else:
+        GAME_CLOCK.legacy += legacy_adjusts(idx)
+        if not GAME_CLOCK.should_adjust(_route_nominal_sec(ctx)):
+            return
+        note = f" (game time {format_clock(GAME_CLOCK.game_now())})"
+    if "adjust_game_time" not in ACTION_TABLE:
+        print("[WARN] adjust_game_time not available in current action module.")
+        return
+    print(f"[TIME][R{ctx.route_suffix}] adjust before config #{idx}{note}")
+    started = GAME_CLOCK.clock() if GAME_CLOCK is not None else 0.0
+    with PROFILER.span("adjust_game_time", "time_adjust", route=ctx.route_suffix, config_index=idx):
+        ACTION_TABLE["adjust_game_time"]()
+    if GAME_CLOCK is not None:
+        GAME_CLOCK.adjusted(started)
+
+
+def _report_game_time() -> None:
+    if GAME_CLOCK is None:
+        return
+    nominal = nominal_duration("adjust_game_time")
+    print(f"[TIME] {GAME_CLOCK.describe(nominal)}")
+    report(
+        "game_time",
+        adjustments=len(GAME_CLOCK.adjust_sec),
+        legacy_adjustments=GAME_CLOCK.legacy,
+        saved_sec=round(GAME_CLOCK.saved_sec(nominal), 1),
+    )
+
+
+def _record_config(
+    profile: DeviceProfile,
+    ctx: _RouteContext,
+    config_id: str,
+    teleport_target,
+    journal: Optional[RunJournal] = None,
+) -> bool:
+    if ctx.plan is not None:
+        with PROFILER.span("run_compiled_route_recording", "recording", route=ctx.route_suffix, config_id=config_id):
+            return run_compiled_route_recording(
+                plan=ctx.plan,
+                video_base_dir=profile.video_base,
+                config_id=config_id,
+                segments=ctx.segments,
+                teleport_portal=teleport_target,
+                route_suffix=ctx.route_suffix,
+                journal=journal,
+            )
+    with PROFILER.span("run_route_recording", "recording", route=ctx.route_suffix, config_id=config_id):
+        return run_route_recording(
+            route=ctx.route,
+            current_portal=ctx.current_portal,
+            video_base_dir=profile.video_base,
+            config_id=config_id,
+            segments=ctx.segments,
+            teleport_portal=teleport_target,
+            route_suffix=ctx.route_suffix,
+            journal=journal,
+        )
+
+
+def _apply_render_config(route_suffix: int, config_id: str, pack: ConfigPack) -> None:
+    with PROFILER.span("apply_render_config", "config_switch", route=route_suffix, config_id=config_id):
+        CONFIG_SWITCHER.apply(pack, INPUT_TRANSPORT)
+
+
+def _teleported(route_suffix: int, kind: str, target: Sequence[int]) -> None:
+    if PORTAL_CHECKER is not None:
+        PORTAL_CHECKER.arrived(route_suffix, kind, target)
+
+
+def _at_expected_portal(route_suffix: int, config_id: str) -> bool:
+    """Verify the last teleport before recording; False means the config must be skipped."""
+    if PORTAL_CHECKER is None or PORTAL_CHECKER.verify(f"R{route_suffix} {config_id}"):
+        return True
+    print(f"[PORTAL][ABORT] R{route_suffix} {config_id}: not at the expected position, config skipped.")
+    report("portal_miss", route=route_suffix, config_id=config_id)
+    return False
+
+
+def _finalized(route_suffix: int, config_id: str) -> bool:
+    """Wait for the config's background finalization; False if any segment failed."""
+    if FINALIZER is None:
+        return True
+    failures = FINALIZER.drain(config_id)
+    for failure in failures:
+        print(f"[FINALIZE][FAIL] {failure.describe()}")
+        report("finalize_failed", route=route_suffix, config_id=config_id, segments=list(failure.segment_indexes))
+    return not failures
+
+
+def _drain_finalizer() -> None:
+    """Let segments still finalizing when a run stops reach disk (and the journal)."""
+    if FINALIZER is None:
+        return
+    for failure in FINALIZER.drain():
+        print(f"[FINALIZE][FAIL] {failure.describe()}")
+
+
+def _pull_device_recordings(route_suffix: Optional[int]) -> Set[str]:
+    """Pull recordings staged on the phone (AUTO_RECORDER_BACKEND=screenrecord); returns failed paths."""
+    failures = DEVICE_PULLS.pull_all()
+    for failure in failures:
+        print(f"[PULL][FAIL] {failure.video_path}: {failure.error}")
+        report("pull_failed", route=route_suffix, video_path=failure.video_path)
+    return {failure.video_path for failure in failures}
+
+
+def _collect_outputs(route_suffix: Optional[int]) -> Set[str]:
+    """Barrier for deferred outputs: device pulls, then staging moves. Returns paths that did not arrive."""
+    failed = _pull_device_recordings(route_suffix)
+    if STAGING_MOVER is not None:
+        for failure in STAGING_MOVER.flush():
+            print(f"[STAGING][FAIL] {failure.video_path}: {failure.error}")
+            report("staging_failed", route=route_suffix, video_path=failure.video_path)
+            failed.add(failure.video_path)
+    return failed
+
+
+def _wait_staging_space() -> None:
+    if STAGING_MOVER is None:
+        return
+    waited = STAGING_MOVER.wait_for_space()
+    if waited > 0.1:
+        print(f"[STAGING] waited {waited:.1f}s for staging space ({STAGING_MOVER.outstanding} moves pending)")
+
+
+def _remove_partial_outputs(profile: DeviceProfile, ctx: _RouteContext, config_id: str) -> None:
+    for video_path in planned_video_paths(profile.video_base, config_id, ctx.segments):
+        produced = staged_path(video_path)
+        for path in {video_path, capture_path(video_path), produced, capture_path(produced)}:
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"[RESUME] Removed partial output {path}")
+
+
+def _report_missing(profile: DeviceProfile, ctx: _RouteContext, config_ids: Sequence[str]) -> List[str]:
+    problems = check_expected_videos(
+        config_ids, profile.video_base, ctx.segments, segment_expectations(ctx.route, STEP_DELAY)
+    )
+    missing = list(problems)
+    if missing:
+        preview = ", ".join(f"{path} ({problems[path]})" for path in missing[:3])
+        print(
+            f"[WARN] Route {ctx.route_suffix} completed but missing {len(missing)} expected videos (absent or invalid). "
+            f"Examples: {preview}"
+        )
+    else:
+        print(f"[ROUTE] Finished route {ctx.route_suffix} ({len(config_ids)}/{len(config_ids)})")
+    return missing
+
+
+def run_one_route(
+    profile: DeviceProfile,
+    route_suffix: int,
+    configs: Sequence[Tuple[str, str]],
+    packs: Dict[str, ConfigPack],
+    journal: Optional[RunJournal] = None,
+    manifest: Optional[Manifest] = None,
+):
+    with PROFILER.span("run_one_route", "other", route=route_suffix, configs=len(configs)):
+        return _run_one_route(profile, route_suffix, configs, packs, journal, manifest)
+
+
+def _run_one_route(
+    profile: DeviceProfile,
+    route_suffix: int,
+    configs: Sequence[Tuple[str, str]],
+    packs: Dict[str, ConfigPack],
+    journal: Optional[RunJournal],
+    manifest: Optional[Manifest],
+):
+    ctx = _prepare_route(route_suffix)
+    config_ids = [config_id for _, config_id in configs]
+    transitioned_in_last_run = False
+
+    digests = {}
+    if manifest is not None:
+        route_digest = file_digest(os.path.join(ROUTE_ROOT, f"{route_suffix}.py"))
+        device, recorder = _input_fingerprint()
+        digests = {config_id: input_hash(route_digest, json_path, device, recorder) for json_path, config_id in configs}
+
+    done = set()
+    if RESUME and journal is not None:
+        done = journal.completed_configs.get(route_suffix, set()) & set(config_ids)
+        if done:
+            print(f"[RESUME] Route {route_suffix}: {len(done)}/{len(configs)} configs already recorded, keep outputs.")
+    if INCREMENTAL and manifest is not None:
+        current = {
+            config_id
+            for config_id in config_ids
+            if manifest.is_current(
+                route_suffix,
+                config_id,
+                digests[config_id],
+                planned_video_paths(profile.video_base, config_id, ctx.segments),
+            )
+        }
+        print(f"[INCREMENTAL] Route {route_suffix}: {len(current)}/{len(configs)} configs up to date.")
+        done |= current
+    if not done:
+        cleanup_route_outputs(profile.video_base, ctx.segments)
+        if journal is not None:
+            journal.route_reset(route_suffix)
+        if manifest is not None:
+            manifest.forget_route(route_suffix)
+        if ctx.segments:
+            print(f"[ROUTE] Cleared stable outputs for route {route_suffix}.")
+    report("route_start", route=route_suffix, configs=len(configs) - len(done), segments=len(ctx.segments))
+
+    awaiting_outputs: List[Tuple[int, str]] = []
+
+    def commit(idx: int, config_id: str) -> None:
+        if not _finalized(route_suffix, config_id):
+            return
+        if OUTPUTS_DEFERRED:
+            awaiting_outputs.append((idx, config_id))
+            return
+        record_done(idx, config_id)
+
+    def record_done(idx: int, config_id: str) -> None:
+        if journal is not None:
+            journal.config_done(route_suffix, config_id)
+        if manifest is not None:
+            manifest.record(
+                route_suffix,
+                config_id,
+                digests[config_id],
+                planned_video_paths(profile.video_base, config_id, ctx.segments),
+            )
+        report("config_done", route=route_suffix, config_id=config_id, index=idx, total=len(configs))
+
+    pending: Optional[Tuple[int, str]] = None
+    for idx, (json_path, config_id) in enumerate(configs, start=1):
+        if config_id in done:
+            continue
+        print(f"[CONFIG][R{route_suffix}][{idx}/{len(configs)}] {json_path}")
+        if done:
+            _remove_partial_outputs(profile, ctx, config_id)
+        _maybe_adjust_game_time(ctx, idx)
+        _apply_render_config(route_suffix, config_id, packs[json_path])
+        # The previous config finalized in the background while this one was applied.
+        if pending is not None:
+            commit(*pending)
+            pending = None
+
+        is_last_config = idx == len(configs)
+        next_portal = ctx.next_portal
+        teleport_target = next_portal if (is_last_config and next_portal is not None) else ctx.current_portal
+        if not _at_expected_portal(route_suffix, config_id):
+            continue
+        _wait_staging_space()
+        teleport_used = _record_config(profile, ctx, config_id, teleport_target, journal)
+        if is_last_config and teleport_target == next_portal and teleport_used:
+            transitioned_in_last_run = True
+            _teleported(route_suffix, "next_portal", teleport_target)
+        elif teleport_used:
+            _teleported(route_suffix, "portal", teleport_target)
+        if FINALIZER is None:
+            commit(idx, config_id)
+        else:
+            pending = (idx, config_id)
+    if pending is not None:
+        commit(*pending)
+    if awaiting_outputs:
+        failed = _collect_outputs(route_suffix)
+        for idx, config_id in awaiting_outputs:
+            if failed.isdisjoint(planned_video_paths(profile.video_base, config_id, ctx.segments)):
+                record_done(idx, config_id)
+
+    missing = _report_missing(profile, ctx, config_ids)
+    _report_startup_latency()
+    _report_screen_waits()
+    report("route_done", route=route_suffix, missing=len(missing))
+    return ctx.next_portal, len(configs), transitioned_in_last_run
+
+
+def _resolve_route_list(profile: DeviceProfile) -> List[int]:
+    route_suffixes = list(profile.route_suffixes) if profile.route_suffixes is not None else _discover_route_suffixes()
+    if not route_suffixes:
+        raise ValueError("No route suffix found.")
+
+    route_suffixes = _apply_route_window(profile, route_suffixes)
+    skip_suffixes = set(_resolve_skip_route_suffixes(profile))
+    if skip_suffixes:
+        route_suffixes = [suffix for suffix in route_suffixes if suffix not in skip_suffixes]
+        print(f"[INFO] Skip routes: {sorted(skip_suffixes)}")
+    if not route_suffixes:
+        raise ValueError("No route suffix left after route window and skip filter.")
+    return route_suffixes
+
+
+def _transition(route_suffix: int, next_portal: Optional[List[int]]) -> None:
+    if next_portal is None:
+        raise ValueError(
+            f"Route {route_suffix} has no NEXT_PORTAL. "
+            "Please add NEXT_PORTAL = [x, y] in this route file."
+        )
+    print(f"[TRANSITION] Route {route_suffix} -> next route via NEXT_PORTAL {next_portal}")
+    with PROFILER.span("transition", "other", route=route_suffix):
+        _teleport(next_portal)
+        _teleported(route_suffix, "next_portal", next_portal)
+        time.sleep(ROUTE_GAP)
+
+
+def run_multi_routes(profile: DeviceProfile):
+    if JOB_QUEUE_PATH:
+        run_multi_routes_queued(profile, JOB_QUEUE_PATH)
+        return
+
+    route_suffixes = _resolve_route_list(profile)
+    configs, packs, config_plan = _load_configs(profile, len(route_suffixes))
+
+    os.makedirs(profile.video_base, exist_ok=True)
+    journal = RunJournal(RUN_JOURNAL_PATH or os.path.join(profile.video_base, JOURNAL_FILE_NAME))
+    manifest = Manifest(os.path.join(profile.video_base, MANIFEST_FILE_NAME))
+    config_ids = {config_id for _, config_id in configs}
+    if RESUME:
+        skipped = 0
+        for suffix in route_suffixes:
+            if not config_ids <= journal.completed_configs.get(suffix, set()):
+                break
+            print(f"[RESUME] Route {suffix} already complete in {journal.path}, skip.")
+            skipped += 1
+        route_suffixes = route_suffixes[skipped:]
+        if not route_suffixes:
+            print("[RESUME] Every route is already complete.")
+            journal.close()
+            return
+        print(f"[RESUME] Continue at route {route_suffixes[0]}; character must stand at its PORTAL.")
+    print(f"[INFO] Route list: {route_suffixes}")
+    print(f"[INFO] Config count per route: {len(configs)}")
+    report("run_start", routes=list(route_suffixes), configs=len(configs))
+    _begin_profile(profile)
+
+    try:
+        _run_route_sequence(profile, route_suffixes, configs, packs, config_plan, journal, manifest)
+    finally:
+        _drain_finalizer()
+        _collect_outputs(None)
+        _report_game_time()
+        _report_profile()
+        journal.close()
+
+
+def _run_route_sequence(
+    profile: DeviceProfile,
+    route_suffixes: Sequence[int],
+    configs: Sequence[Tuple[str, str]],
+    packs: Dict[str, ConfigPack],
+    config_plan: Optional[ConfigPlan],
+    journal: RunJournal,
+    manifest: Manifest,
+) -> None:
+    for idx, route_suffix in enumerate(route_suffixes):
+        route_configs = order_for_route(configs, config_plan, idx) if config_plan is not None else configs
+        next_portal, completed, transitioned_in_last_run = run_one_route(
+            profile, route_suffix, route_configs, packs, journal, manifest
+        )
+
+        if idx < len(route_suffixes) - 1:
+            if completed < len(configs):
+                raise ValueError(
+                    f"Route {route_suffix} did not complete {len(configs)} configs, "
+                    "stop multi-route transition."
+                )
+            if transitioned_in_last_run:
+                print(
+                    f"[TRANSITION] Route {route_suffix} already moved to NEXT_PORTAL "
+                    "during last config run."
+                )
+            else:
+                _transition(route_suffix, next_portal)
+
+
+def _reclaim_expired(queue: JobQueue) -> None:
+    reclaimed = queue.reclaim_expired()
+    if reclaimed:
+        print(f"[QUEUE] Reclaimed {reclaimed} expired lease(s) across all routes.")
+
+
+def _run_queued_route(
+    profile: DeviceProfile,
+    queue: JobQueue,
+    route_suffix: int,
+    worker: str,
+    configs: Sequence[Tuple[str, str]],
+    packs: Dict[str, ConfigPack],
+) -> _RouteContext:
+    """Record configs of one route until it has nothing left to claim."""
+    with PROFILER.span("queued_route", "other", route=route_suffix, worker=worker):
+        ctx = _prepare_route(route_suffix)
+        report("route_start", route=route_suffix, configs=len(configs), segments=len(ctx.segments))
+        recorded = 0
+        while True:
+            job = queue.claim(route_suffix, worker)
+            if job is None:
+                break
+            json_path, config_id, position = job
+            recorded += 1
+            print(f"[CONFIG][R{route_suffix}][{position + 1}/{len(configs)}][{worker}] {json_path}")
+            _maybe_adjust_game_time(ctx, recorded)
+            try:
+                _apply_render_config(route_suffix, config_id, packs[json_path])
+                if not _at_expected_portal(route_suffix, config_id):
+                    # Leave the route's remaining configs to the other phones.
+                    queue.release(route_suffix, config_id, worker, "portal miss")
+                    recorded -= 1
+                    break
+                _wait_staging_space()
+                if _record_config(profile, ctx, config_id, ctx.current_portal):
+                    _teleported(route_suffix, "portal", ctx.current_portal)
+            except BaseException as exc:
+                queue.release(route_suffix, config_id, worker, repr(exc))
+                raise
+            if not _finalized(route_suffix, config_id):
+                queue.release(route_suffix, config_id, worker, "finalize failed")
+                continue
+            # Queued configs are handed back one by one, so deferred outputs are collected right away.
+            if OUTPUTS_DEFERRED and _collect_outputs(route_suffix):
+                queue.release(route_suffix, config_id, worker, "outputs not delivered")
+                continue
+            queue.complete(route_suffix, config_id, worker)
+            report("config_done", route=route_suffix, config_id=config_id, index=position + 1, total=len(configs))
+
+        counts = queue.counts(route_suffix)
+        print(f"[QUEUE] Route {route_suffix}: recorded {recorded} here, state {counts}")
+        missing_count = None
+        if recorded and counts[PENDING] == 0 and counts[LEASED] == 0:
+            missing_count = len(_report_missing(profile, ctx, queue.done_config_ids(route_suffix)))
+        _report_startup_latency()
+        _report_screen_waits()
+        report("route_done", route=route_suffix, recorded=recorded, missing=missing_count)
+    return ctx
+
+
+def run_multi_routes_queued(profile: DeviceProfile, queue_path: str, worker: Optional[str] = None):
+    """Share the route x config matrix with other phones of the same profile.
+
+    Every phone walks the same route list. In each route it records whatever
+    configs are still unclaimed, always teleporting back to the route PORTAL,
+    then moves on with an explicit NEXT_PORTAL teleport. Route outputs are
+    cleared once, by whichever worker seeds the route. Expired leases are swept
+    in every route before each route, and after the last route the worker goes
+    back once to every route that still has configs to claim.
+    """
+    worker = worker or default_worker_id()
+    route_suffixes = _resolve_route_list(profile)
+    configs, packs, config_plan = _load_configs(profile, len(route_suffixes))
+
+    os.makedirs(profile.video_base, exist_ok=True)
+    queue = JobQueue(queue_path)
+    print(f"[QUEUE] {queue_path} worker={worker}")
+    print(f"[INFO] Route list: {route_suffixes}")
+    print(f"[INFO] Config count per route: {len(configs)}")
+    for route_index, route_suffix in enumerate(route_suffixes):
+        segments = _load_route_context(route_suffix).segments
+        route_configs = order_for_route(configs, config_plan, route_index) if config_plan is not None else configs
+        if queue.seed_route(route_suffix, route_configs, lambda: cleanup_route_outputs(profile.video_base, segments)):
+            print(f"[QUEUE] Seeded route {route_suffix} and cleared its stable outputs.")
+    report("run_start", routes=list(route_suffixes), configs=len(configs), worker=worker)
+    _begin_profile(profile)
+
+    try:
+        for idx, route_suffix in enumerate(route_suffixes):
+            _reclaim_expired(queue)
+            ctx = _run_queued_route(profile, queue, route_suffix, worker, configs, packs)
+            if idx < len(route_suffixes) - 1:
+                _transition(route_suffix, ctx.next_portal)
+
+        # Leases of workers that died after this one passed their route expire behind it.
+        _reclaim_expired(queue)
+        for route_suffix in [route for route in queue.claimable_routes() if route in route_suffixes]:
+            print(f"[QUEUE] Revisiting route {route_suffix}: it has configs left to claim.")
+            portal = _load_route_context(route_suffix).current_portal
+            _teleport(portal)
+            _teleported(route_suffix, "portal", portal)
+            _run_queued_route(profile, queue, route_suffix, worker, configs, packs)
+    finally:
+        _drain_finalizer()
+        _collect_outputs(None)
+        _report_game_time()
+        _report_profile()
+        queue.close()
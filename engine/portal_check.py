@@ -0,0 +1,97 @@
+"""Post-teleport position check against per-route reference signatures.
+
+A signature is a screen_state.Template of the minimap/HUD region captured while
+standing where a teleport should land. Signatures live next to the route files:
+routes/<set>/portal_signatures/<mapping module>/<suffix>.portal.json for the
+route's PORTAL and <suffix>.next_portal.json for its NEXT_PORTAL, written by
+`tools/screen_templates.py signature`.
+
+multiroute reports every teleport with `arrived()` and calls `verify()` before
+the next config records. On a mismatch the same teleport is retried; if the
+position is still wrong the config is skipped instead of recording a full run
+from the wrong place. A missing signature or a failed capture never blocks.
+"""
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from actions.screen_state import Frame, Template, load_template, match_score
+
+PORTAL_CHECK = os.environ.get("AUTO_PORTAL_CHECK", "0") == "1"
+PORTAL_CHECK_RETRIES = int(os.environ.get("AUTO_PORTAL_CHECK_RETRIES", "1"))
+MINIMAP_REGION = (0.0, 0.0, 0.15, 0.3)
+SIGNATURE_KINDS = ("portal", "next_portal")
+
+
+def signature_path(route_root: str, mapping_module: str, route_suffix: int, kind: str) -> str:
+    if kind not in SIGNATURE_KINDS:
+        raise ValueError(f"Unknown portal signature kind {kind!r}")
+    device = mapping_module.rsplit(".", 1)[-1]
+    return os.path.join(route_root, "portal_signatures", device, f"{route_suffix}.{kind}.json")
+
+
+@dataclass(frozen=True)
+class Arrival:
+    route_suffix: int
+    kind: str
+    target: Tuple[int, int]  # portal tapped; tapped again on a miss
+
+
+class PortalChecker:
+    def __init__(
+        self,
+        route_root: str,
+        mapping_module: str,
+        capture: Callable[[], Frame],
+        teleport: Callable[[Sequence[int]], None],
+        retries: int = PORTAL_CHECK_RETRIES,
+    ):
+        self.route_root = route_root
+        self.mapping_module = mapping_module
+        self.capture = capture
+        self.teleport = teleport
+        self.retries = retries
+        self.arrival: Optional[Arrival] = None
+        self.misses = 0
+        self._signatures: Dict[Tuple[int, str], Optional[Template]] = {}
+
+    def _signature(self, arrival: Arrival) -> Optional[Template]:
+        key = (arrival.route_suffix, arrival.kind)
+        if key not in self._signatures:
+            path = signature_path(self.route_root, self.mapping_module, arrival.route_suffix, arrival.kind)
+            self._signatures[key] = load_template(path) if os.path.exists(path) else None
+        return self._signatures[key]
+
+    def arrived(self, route_suffix: int, kind: str, target: Sequence[int]) -> None:
+        self.arrival = Arrival(route_suffix, kind, (int(target[0]), int(target[1])))
+
+    def verify(self, label: str) -> bool:
+        """True when the last teleport landed where its signature says (or cannot be checked)."""
+        arrival = self.arrival
+        if arrival is None:
+            return True
+        signature = self._signature(arrival)
+        if signature is None:
+            self.arrival = None
+            return True
+        where = f"R{arrival.route_suffix} {arrival.kind} {list(arrival.target)}"
+        for attempt in range(self.retries + 1):
+            try:
+                score = match_score(self.capture(), signature)
+            except Exception as exc:
+                print(f"[PORTAL][WARN] {where}: capture failed ({exc}); not checked before {label}")
+                self.arrival = None
+                return True
+            if score <= signature.threshold:
+                if attempt:
+                    print(f"[PORTAL] {where}: position recovered after {attempt} retry(s)")
+                self.arrival = None
+                return True
+            self.misses += 1
+            print(
+                f"[PORTAL][MISS] {where} before {label}: score={score:.1f} > {signature.threshold:.1f} "
+                f"(attempt {attempt + 1}/{self.retries + 1})"
+            )
+            if attempt < self.retries:
+                self.teleport(list(arrival.target))
+        return False
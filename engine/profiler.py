@@ -0,0 +1,195 @@
+"""Wall-clock phase profile of a run: which phases the hours go to.
+
+Every hook charges its time to one category:
+
+    recording      run_route_recording / run_compiled_route_recording (actions, gestures)
+    config_switch  applying a render config (CONFIG_SWITCHER.apply)
+    time_adjust    adjust_game_time
+    teleport       route, retry and transition teleports
+    recorder       recorder start/stop (scrcpy spawn, settle, stop request)
+    step_delay     idle between steps (STEP_DELAY, waiting for the next planned start)
+    adb_dispatch   tap/swipe call time beyond the gesture itself
+    other          the rest: route setup, validation, finalize waits, ROUTE_GAP, ...
+
+Spans nest and each one only keeps its self time (duration minus the spans and
+charges inside it), so the categories add up to the wall time of the run.
+Compiled plans (AUTO_COMPILED_ROUTES=1) replay teleports and step gaps as plain
+ops; there both count as recording.
+
+AUTO_PROFILE=1 prints the breakdown per route at the end of the run and reports
+it to multiroute_all.py. AUTO_PROFILE_TRACE=<path> (implies AUTO_PROFILE=1) also
+appends one JSON line per span; per-step charges are summed, not traced.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from actions.transport import InputTransport, add_dispatch_hook
+
+PROFILE_TRACE = os.environ.get("AUTO_PROFILE_TRACE", "").strip()
+PROFILE = os.environ.get("AUTO_PROFILE", "0") == "1" or bool(PROFILE_TRACE)
+CATEGORIES = (
+    "recording",
+    "config_switch",
+    "time_adjust",
+    "teleport",
+    "recorder",
+    "step_delay",
+    "adb_dispatch",
+    "other",
+)
+
+
+@dataclass(eq=False)
+class _Span:
+    name: str
+    category: str
+    route: Optional[int]
+    started: float
+    child_sec: float = 0.0
+
+
+def _format_sec(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{int(seconds // 3600)}h{int(seconds % 3600 // 60):02d}m"
+    if seconds >= 60:
+        return f"{int(seconds // 60)}m{int(seconds % 60):02d}s"
+    return f"{seconds:.1f}s"
+
+
+def format_breakdown(seconds: Dict[str, float], total: float) -> str:
+    parts = [
+        f"{category} {_format_sec(value)} ({value / total * 100:.1f}%)"
+        for category, value in sorted(seconds.items(), key=lambda item: -item[1])
+        if value >= 0.05 and total > 0
+    ]
+    return f"{_format_sec(total)}: " + (", ".join(parts) or "nothing recorded")
+
+
+class PhaseProfiler:
+    """Self time per (route, category). Steps never overlap, so one span stack serves all threads."""
+
+    def __init__(self, trace_path: str = "", enabled: bool = True, clock: Callable[[], float] = time.perf_counter):
+        self.trace_path = trace_path
+        self.enabled = enabled
+        self.clock = clock
+        self.device = ""
+        self.seconds: Dict[Tuple[Optional[int], str], float] = {}
+        self._stack: List[_Span] = []
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._trace = None
+        self._instrumented: List[InputTransport] = []
+
+    def begin(self, device: str) -> None:
+        if not self.enabled:
+            return
+        self.device = device
+        self._started = self.clock()
+        if self.trace_path and self._trace is None:
+            os.makedirs(os.path.dirname(self.trace_path) or ".", exist_ok=True)
+            self._trace = open(self.trace_path, "a", encoding="utf-8")
+
+    def _charge_locked(self, route: Optional[int], category: str, self_sec: float, total_sec: float) -> None:
+        key = (route, category)
+        self.seconds[key] = self.seconds.get(key, 0.0) + self_sec
+        if self._stack:
+            self._stack[-1].child_sec += total_sec
+
+    def charge(self, category: str, seconds: float) -> None:
+        """Time spent inside the current span that belongs to `category` (per-step, not traced)."""
+        if not self.enabled or seconds <= 0:
+            return
+        with self._lock:
+            route = self._stack[-1].route if self._stack else None
+            self._charge_locked(route, category, seconds, seconds)
+
+    @contextmanager
+    def span(self, name: str, category: str, route: Optional[int] = None, **fields: object) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        with self._lock:
+            if route is None and self._stack:
+                route = self._stack[-1].route
+            span = _Span(name, category, route, self.clock())
+            self._stack.append(span)
+        try:
+            yield
+        finally:
+            ended = self.clock()
+            duration = ended - span.started
+            self_sec = max(0.0, duration - span.child_sec)
+            with self._lock:
+                self._stack.remove(span)
+                self._charge_locked(route, category, self_sec, duration)
+                if self._trace is not None:
+                    origin = span.started if self._started is None else self._started
+                    record = {
+                        "device": self.device,
+                        "name": name,
+                        "category": category,
+                        "route": route,
+                        **fields,
+                        "start": round(span.started - origin, 4),
+                        "duration": round(duration, 4),
+                        "self": round(self_sec, 4),
+                    }
+                    self._trace.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    self._trace.flush()
+
+    def instrument_transport(self, transport: InputTransport) -> None:
+        """Charge the part of every tap/swipe call that is not the gesture itself to adb_dispatch."""
+        if not self.enabled or transport in self._instrumented:
+            return
+        self._instrumented.append(transport)
+        add_dispatch_hook(
+            transport, lambda kind, elapsed, duration_ms: self.charge("adb_dispatch", elapsed - duration_ms / 1000.0)
+        )
+
+    def wall_sec(self) -> float:
+        return 0.0 if self._started is None else self.clock() - self._started
+
+    def by_route(self) -> Dict[Optional[int], Dict[str, float]]:
+        """Seconds per category for every route; None holds what ran outside a route, incl. untracked time."""
+        with self._lock:
+            seconds = dict(self.seconds)
+        routes: Dict[Optional[int], Dict[str, float]] = {}
+        for (route, category), value in seconds.items():
+            routes.setdefault(route, {})[category] = value
+        untracked = self.wall_sec() - sum(seconds.values())
+        if untracked > 0:
+            outside = routes.setdefault(None, {})
+            outside["other"] = outside.get("other", 0.0) + untracked
+        return routes
+
+    def totals(self) -> Dict[str, float]:
+        totals = {category: 0.0 for category in CATEGORIES}
+        for categories in self.by_route().values():
+            for category, value in categories.items():
+                totals[category] = totals.get(category, 0.0) + value
+        return totals
+
+    def describe(self) -> List[str]:
+        routes = self.by_route()
+        totals = self.totals()
+        lines = [f"total {format_breakdown(totals, sum(totals.values()))}"]
+        for route in sorted(route for route in routes if route is not None):
+            lines.append(f"R{route} {format_breakdown(routes[route], sum(routes[route].values()))}")
+        outside = routes.get(None, {})
+        if sum(outside.values()) >= 0.05:
+            lines.append(f"outside routes {format_breakdown(outside, sum(outside.values()))}")
+        return lines
+
+    def close(self) -> None:
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+
+PROFILER = PhaseProfiler(PROFILE_TRACE, enabled=PROFILE)
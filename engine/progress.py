@@ -0,0 +1,19 @@
+import time
+from typing import Callable, Dict, Optional
+
+Reporter = Callable[[str, Dict[str, object]], None]
+
+_reporter: Optional[Reporter] = None
+
+
+def set_reporter(reporter: Optional[Reporter]) -> None:
+    """Install a progress sink, e.g. a multiprocessing queue writer in multiroute_all.py."""
+    global _reporter
+    _reporter = reporter
+
+
+def report(event: str, **fields: object) -> None:
+    if _reporter is None:
+        return
+    fields.setdefault("time", time.time())
+    _reporter(event, fields)
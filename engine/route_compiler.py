@@ -0,0 +1,316 @@
+"""Compile a ROUTE into a flat, pre-resolved execution plan for one device.
+
+The plan is produced by running the real actions (actions/global_actions.py,
+engine/runner.py) against a tracing transport and a virtual clock, so composite
+actions (run, glide, combat, teleport, ...) expand to exactly the taps, swipes
+and waits they would perform. Every op carries its planned start time relative
+to the route start; `execute_plan` replays it against those deadlines.
+
+Op layout (plain tuples, opcode first, planned start second):
+    (OP_TAP, t, x, y)
+    (OP_SWIPE, t, x1, y1, x2, y2, duration_ms)
+    (OP_WAIT, t, seconds)
+    (OP_PORTAL, t)                 tap on the portal chosen at run time
+    (OP_RECORD_START, t, segment_index)
+    (OP_RECORD_STOP, t)
+    (OP_WAIT_STATE, t, state, seconds)  wait for a screen state; planned as `seconds`
+    (OP_SETTLE, t, seconds)        pause that only follows a matched OP_WAIT_STATE
+
+After an OP_WAIT_STATE returns, the remaining deadlines move by the difference
+between its actual and planned end, so a state reached early shortens the route.
+Routes are compiled as if every state matched; when the state before an
+OP_SETTLE was not seen (fallback, timeout, no waiter) the settle is dropped and
+the later deadlines move earlier by its length, as in the interpreted teleport.
+"""
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from actions.global_actions import build_actions
+from actions.transport import InputTransport
+from engine.action_table import build_action_table
+from engine.scheduler import sleep_until
+
+OP_TAP = 0
+OP_SWIPE = 1
+OP_WAIT = 2
+OP_PORTAL = 3
+OP_RECORD_START = 4
+OP_RECORD_STOP = 5
+OP_WAIT_STATE = 6
+OP_SETTLE = 7
+
+COMPILER_VERSION = 3
+PLAN_CACHE_DIR = os.environ.get(
+    "AUTO_ROUTE_PLAN_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "route_plans"),
+)
+
+# Stand-in portal; taps on it become OP_PORTAL.
+_PORTAL_SENTINEL = (-10001, -10001)
+
+
+@dataclass(frozen=True)
+class PlannedSegment:
+    segment_index: int
+    start: float
+    stop: float
+
+    @property
+    def duration(self) -> float:
+        return self.stop - self.start
+
+
+@dataclass(frozen=True)
+class PlannedStep:
+    name: str
+    args: tuple
+    start: float
+    end: float
+
+
+@dataclass(frozen=True)
+class CompiledRoute:
+    source_hash: str
+    device_key: str
+    ops: Tuple[tuple, ...]
+    steps: Tuple[PlannedStep, ...]
+    segments: Tuple[PlannedSegment, ...]
+    nominal_duration: float
+
+
+class _Tracer(InputTransport):
+    kind = "trace"
+
+    def __init__(self):
+        super().__init__()
+        self.now = 0.0
+        self.ops: List[tuple] = []
+
+    def wait(self, seconds: float) -> None:
+        seconds = float(seconds)
+        if seconds > 0:
+            self.ops.append((OP_WAIT, self.now, seconds))
+            self.advance(seconds)
+
+    def wait_state(self, state: str, seconds: float) -> bool:
+        self.ops.append((OP_WAIT_STATE, self.now, state, float(seconds)))
+        self.advance(float(seconds))
+        return True
+
+    def settle(self, seconds: float) -> None:
+        seconds = float(seconds)
+        if seconds > 0:
+            self.ops.append((OP_SETTLE, self.now, seconds))
+            self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        self.now = round(self.now + seconds, 6)
+
+    def tap(self, x: int, y: int) -> None:
+        if (x, y) == _PORTAL_SENTINEL:
+            self.ops.append((OP_PORTAL, self.now))
+        else:
+            self.ops.append((OP_TAP, self.now, int(x), int(y)))
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int) -> None:
+        self.ops.append((OP_SWIPE, self.now, int(x1), int(y1), int(x2), int(y2), int(duration_ms)))
+        self.advance(int(duration_ms) / 1000.0)
+
+    def run(self, command: str) -> None:
+        raise ValueError(f"Route actions must only tap/swipe, got shell command {command!r}")
+
+
+def _device_actions(actions_module: str, tracer: _Tracer) -> Dict[str, object]:
+    module = importlib.import_module(actions_module)
+    actions = build_actions(
+        mapping_module=getattr(module, "MAPPING_MODULE"),
+        offsets=getattr(module, "OFFSETS", {}),
+        transport=tracer,
+        sleeper=tracer.wait,
+        screen_waiter=tracer.wait_state,
+    )
+    actions["settle"] = tracer.settle
+    return actions
+
+
+def device_key(actions_module: str, step_delay: float, record_start_sec: float) -> str:
+    tracer = _Tracer()
+    actions = _device_actions(actions_module, tracer)
+    payload = {
+        "compiler": COMPILER_VERSION,
+        "actions_module": actions_module,
+        "points": sorted(actions["POINTS"].items()),
+        "resolution": actions["TARGET_RESOLUTION"],
+        "glide_env": [os.environ.get("AUTO_GLIDE_UTIL_HOLD_MS"), os.environ.get("AUTO_GLIDE_AFTER_UTIL_DELAY_SEC")],
+        "step_delay": step_delay,
+        "record_start_sec": record_start_sec,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def compile_route(
+    route: Sequence[Sequence[object]],
+    actions_module: str,
+    step_delay: float,
+    record_start_sec: float,
+    source_hash: str = "",
+    key: Optional[str] = None,
+) -> CompiledRoute:
+    """Expand ROUTE for a device. record_start_sec is the recorder start + settle time."""
+    tracer = _Tracer()
+    table = build_action_table(_device_actions(actions_module, tracer), sleep=tracer.wait)
+    steps: List[PlannedStep] = []
+    segments: List[PlannedSegment] = []
+    open_segment: Optional[Tuple[int, float]] = None
+
+    for step in route:
+        name = step[0]
+        args = tuple(step[1:])
+        start = tracer.now
+        if name == "record_start":
+            if open_segment is not None:
+                segments.append(PlannedSegment(open_segment[0], open_segment[1], start))
+            segment_index = len(segments) + 1
+            tracer.ops.append((OP_RECORD_START, start, segment_index))
+            tracer.advance(record_start_sec)
+            open_segment = (segment_index, start)
+        elif name == "record_stop":
+            tracer.ops.append((OP_RECORD_STOP, start))
+            if open_segment is not None:
+                segments.append(PlannedSegment(open_segment[0], open_segment[1], start))
+                open_segment = None
+        elif name == "teleport":
+            table["teleport"](_PORTAL_SENTINEL)
+        else:
+            table[name](*args)
+        steps.append(PlannedStep(name, args, start, tracer.now))
+        if name not in ("record_start", "record_stop"):
+            tracer.wait(step_delay)
+
+    if open_segment is not None:
+        segments.append(PlannedSegment(open_segment[0], open_segment[1], tracer.now))
+    return CompiledRoute(
+        source_hash=source_hash,
+        device_key=key or device_key(actions_module, step_delay, record_start_sec),
+        ops=tuple(tracer.ops),
+        steps=tuple(steps),
+        segments=tuple(segments),
+        nominal_duration=tracer.now,
+    )
+
+
+def _plan_to_json(plan: CompiledRoute) -> Dict[str, object]:
+    return {
+        "source_hash": plan.source_hash,
+        "device_key": plan.device_key,
+        "ops": [list(op) for op in plan.ops],
+        "steps": [[step.name, list(step.args), step.start, step.end] for step in plan.steps],
+        "segments": [[seg.segment_index, seg.start, seg.stop] for seg in plan.segments],
+        "nominal_duration": plan.nominal_duration,
+    }
+
+
+def _plan_from_json(data: Dict[str, object]) -> CompiledRoute:
+    return CompiledRoute(
+        source_hash=data["source_hash"],
+        device_key=data["device_key"],
+        ops=tuple(tuple(op) for op in data["ops"]),
+        steps=tuple(PlannedStep(name, tuple(args), start, end) for name, args, start, end in data["steps"]),
+        segments=tuple(PlannedSegment(index, start, stop) for index, start, stop in data["segments"]),
+        nominal_duration=data["nominal_duration"],
+    )
+
+
+def _load_route(route_path: str):
+    name = f"compiled_route_{os.path.splitext(os.path.basename(route_path))[0]}"
+    spec = importlib.util.spec_from_file_location(name, route_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Failed to load route module from {route_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.ROUTE
+
+
+def compile_route_file(
+    route_path: str,
+    actions_module: str,
+    step_delay: float,
+    record_start_sec: float,
+    cache_dir: Optional[str] = PLAN_CACHE_DIR,
+) -> CompiledRoute:
+    """compile_route with an on-disk cache keyed by route file hash and device key."""
+    with open(route_path, "rb") as f:
+        source_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    key = device_key(actions_module, step_delay, record_start_sec)
+    cache_path = None
+    if cache_dir:
+        stem = os.path.splitext(os.path.basename(route_path))[0]
+        cache_path = os.path.join(cache_dir, f"{stem}_{source_hash}_{key}.json")
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return _plan_from_json(json.load(f))
+
+    plan = compile_route(_load_route(route_path), actions_module, step_delay, record_start_sec, source_hash, key)
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_plan_to_json(plan), f)
+        os.replace(tmp_path, cache_path)
+    return plan
+
+
+def execute_plan(
+    plan: CompiledRoute,
+    transport: InputTransport,
+    portal: Sequence[int],
+    on_record_start: Callable[[int], None],
+    on_record_stop: Callable[[], None],
+    clock: Callable[[], float] = time.monotonic,
+    wait_state: Optional[Callable[[str, float], object]] = None,
+) -> float:
+    """Replay ops against absolute deadlines. Returns the actual duration in seconds.
+
+    Without wait_state an OP_WAIT_STATE is just its planned wait.
+    """
+    tap = transport.tap
+    swipe = transport.swipe
+    portal_x, portal_y = int(portal[0]), int(portal[1])
+    started = origin = clock()
+    matched = False
+    for op in plan.ops:
+        code = op[0]
+        if code == OP_SETTLE:
+            if not matched:
+                origin -= op[2]
+            continue
+        if code == OP_WAIT or (code == OP_WAIT_STATE and wait_state is None):
+            continue
+        sleep_until(origin + op[1], clock)
+        if code == OP_TAP:
+            tap(op[2], op[3])
+        elif code == OP_SWIPE:
+            swipe(op[2], op[3], op[4], op[5], op[6])
+        elif code == OP_PORTAL:
+            tap(portal_x, portal_y)
+        elif code == OP_RECORD_START:
+            on_record_start(op[2])
+        elif code == OP_RECORD_STOP:
+            on_record_stop()
+        elif code == OP_WAIT_STATE:
+            matched = bool(wait_state(op[2], op[3]))
+            origin = clock() - (op[1] + op[3])
+    sleep_until(origin + plan.nominal_duration, clock)
+    return clock() - started
+
+
+def describe_plan(plan: CompiledRoute) -> str:
+    parts = [f"nominal={plan.nominal_duration:.1f}s", f"ops={len(plan.ops)}"]
+    parts += [f"s{seg.segment_index:02d}={seg.duration:.1f}s" for seg in plan.segments]
+    return " ".join(parts)
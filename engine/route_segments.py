@@ -2,7 +2,14 @@ import os
 import shutil
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Iterable, List, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from engine.scheduler import nominal_duration
+from recording.mp4_probe import VIDEO_VALIDATION, ProbeCache, VideoInfo, probe_many
+
+MIN_DURATION_RATIO = float(os.environ.get("AUTO_VIDEO_MIN_DURATION_RATIO", "0.8"))
+MIN_DURATION_SEC = float(os.environ.get("AUTO_VIDEO_MIN_DURATION_SEC", "0.5"))
+EXPECTED_CODEC = os.environ.get("AUTO_VIDEO_EXPECTED_CODEC", "").strip()
 
 
 @dataclass(frozen=True)
@@ -14,6 +21,21 @@ class RouteSegment:
     segment_dir_name: str
 
 
+@dataclass(frozen=True)
+class VideoExpectation:
+    min_duration: float = 0.0
+    codec: str = ""  # sample entry fourcc, e.g. avc1 / hvc1; empty accepts any
+
+    def problem(self, info: VideoInfo) -> Optional[str]:
+        if not info.ok:
+            return info.error
+        if info.duration < self.min_duration:
+            return f"duration {info.duration:.2f}s < expected {self.min_duration:.2f}s"
+        if self.codec and info.codec != self.codec:
+            return f"codec {info.codec or '?'} != {self.codec}"
+        return None
+
+
 def _next_recorded_action(route: Sequence[Sequence[object]], start_index: int) -> str:
     for step in route[start_index + 1:]:
         name = step[0]
@@ -56,18 +78,63 @@ def planned_video_paths(video_base_dir: str, config_id: str, segments: Iterable[
     return [segment_video_path(video_base_dir, config_id, segment) for segment in segments]
 
 
-def validate_expected_videos(
+def segment_expectations(
+    route: Sequence[Sequence[object]],
+    step_delay: float,
+    ratio: float = MIN_DURATION_RATIO,
+    floor_sec: float = MIN_DURATION_SEC,
+    codec: str = EXPECTED_CODEC,
+) -> Dict[int, VideoExpectation]:
+    """Per segment_index: the recording must last ratio x the nominal time of its recorded steps."""
+    expectations: Dict[int, VideoExpectation] = {}
+    segment_index = 0
+    nominal: Optional[float] = None
+    for step in route:
+        name, args = step[0], tuple(step[1:])
+        if name == "record_start":
+            segment_index += 1
+            nominal = 0.0
+        elif name == "record_stop":
+            if nominal is not None:
+                expectations[segment_index] = VideoExpectation(max(floor_sec, ratio * nominal), codec)
+            nominal = None
+        elif nominal is not None:
+            nominal += nominal_duration(name, args) + step_delay
+    return expectations
+
+
+def check_expected_videos(
     config_ids: Iterable[str],
     video_base_dir: str,
     segments: Iterable[RouteSegment],
-) -> List[str]:
-    missing: List[str] = []
+    expectations: Optional[Dict[int, VideoExpectation]] = None,
+    cache: Optional[ProbeCache] = None,
+) -> Dict[str, str]:
+    """Planned path -> problem for every missing or unusable recording, in plan order."""
+    planned: Dict[str, VideoExpectation] = {}
     segment_list = list(segments)
     for config_id in config_ids:
-        for path in planned_video_paths(video_base_dir, config_id, segment_list):
-            if not os.path.exists(path):
-                missing.append(path)
-    return missing
+        for segment in segment_list:
+            expectation = (expectations or {}).get(segment.segment_index, VideoExpectation())
+            planned[segment_video_path(video_base_dir, config_id, segment)] = expectation
+    if VIDEO_VALIDATION == "exists":
+        return {path: "missing" for path in planned if not os.path.exists(path)}
+    infos = probe_many(list(planned), cache)
+    problems: Dict[str, str] = {}
+    for path, expectation in planned.items():
+        problem = expectation.problem(infos[path])
+        if problem is not None:
+            problems[path] = problem
+    return problems
+
+
+def validate_expected_videos(
+    config_ids: Iterable[str],
+    video_base_dir: str,
+    segments: Iterable[RouteSegment],
+    expectations: Optional[Dict[int, VideoExpectation]] = None,
+) -> List[str]:
+    return list(check_expected_videos(config_ids, video_base_dir, segments, expectations))
 
 
 def cleanup_route_outputs(video_base_dir: str, segments: Iterable[RouteSegment]) -> None:
@@ -0,0 +1,71 @@
+"""Append-only journal of finished recording units, used to resume multiroute runs.
+
+One JSON object per line, flushed and fsync'd before the next step runs:
+    {"event": "route_reset", "route": 3}                  outputs of route 3 were cleared
+    {"event": "segment", "route": 3, "config_id": ..., "segment": 2, "path": ...}
+    {"event": "config", "route": 3, "config_id": ...}     every segment of the config is on disk
+A route_reset drops everything recorded earlier for that route. A torn last
+line (crash mid-write) is ignored.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Set, Tuple
+
+
+class RunJournal:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.completed_configs: Dict[int, Set[str]] = defaultdict(set)
+        self.completed_segments: Dict[int, Set[Tuple[str, int]]] = defaultdict(set)
+        self.seen_routes: Set[int] = set()
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry: Dict[str, object]) -> None:
+        route = entry.get("route")
+        event = entry.get("event")
+        self.seen_routes.add(route)
+        if event == "route_reset":
+            self.completed_configs.pop(route, None)
+            self.completed_segments.pop(route, None)
+        elif event == "segment":
+            self.completed_segments[route].add((entry["config_id"], entry["segment"]))
+        elif event == "config":
+            self.completed_configs[route].add(entry["config_id"])
+
+    def _append(self, entry: Dict[str, object]) -> None:
+        # Segment entries may arrive from recording/finalizer.py worker threads.
+        entry["time"] = time.time()
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(entry)
+
+    def route_reset(self, route: int) -> None:
+        self._append({"event": "route_reset", "route": route})
+
+    def segment_done(self, route: int, config_id: str, segment_index: int, path: str) -> None:
+        self._append({"event": "segment", "route": route, "config_id": config_id, "segment": segment_index, "path": path})
+
+    def config_done(self, route: int, config_id: str) -> None:
+        self._append({"event": "config", "route": route, "config_id": config_id})
+
+    def close(self) -> None:
+        self._file.close()
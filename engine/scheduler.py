@@ -0,0 +1,203 @@
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, List, Optional, Sequence
+
+from engine.profiler import PROFILER
+
+# Idle time after every route step (legacy mode) or between planned steps (deadline mode).
+STEP_DELAY = 0.4
+# Busy-wait window before a deadline; Windows sleep granularity is ~15.6 ms.
+SPIN_SEC = float(os.environ.get("AUTO_SCHEDULER_SPIN_SEC", "0.016" if os.name == "nt" else "0.002"))
+
+_GLIDE_HOLD_SEC = int(os.environ.get("AUTO_GLIDE_UTIL_HOLD_MS", "1400")) / 1000.0
+_GLIDE_AFTER_UTIL_SEC = float(os.environ.get("AUTO_GLIDE_AFTER_UTIL_DELAY_SEC", "0.7"))
+
+# Nominal seconds of each ACTION_TABLE entry, i.e. the sleeps and swipe durations in
+# actions/global_actions.py and engine/runner.py. Taps count as 0.
+FIXED_DURATIONS = {
+    "attack": 0.0,
+    "jump": 0.0,
+    "dash": 0.0,
+    "util": 0.0,
+    "heavy_attack": 1.0,
+    "long_util": 1.0,
+    "combat": 12.5,
+    "turn_180": 0.8,
+    "turn_right_90": 0.6,
+    "turn_left_90": 0.6,
+    "turn_right_45": 0.6,
+    "turn_left_45": 0.6,
+    "turn_right_30": 0.6,
+    "turn_left_30": 0.6,
+    "turn_right_135": 0.7,
+    "turn_left_135": 0.7,
+    "teleport": 10.0,
+    "adjust_game_time": 30.1,
+}
+TIMED_DURATIONS = {
+    "move": 0.0,
+    "walk": 0.0,
+    "climb": 0.0,
+    "swim": 0.0,
+    "sleep": 0.0,
+    "run": 0.1,
+    "glide": _GLIDE_HOLD_SEC + _GLIDE_AFTER_UTIL_SEC,
+}
+
+
+def nominal_duration(name: str, args: Sequence[object] = ()) -> float:
+    if name in TIMED_DURATIONS:
+        return TIMED_DURATIONS[name] + float(args[0] if args else 0.0)
+    return FIXED_DURATIONS.get(name, 0.0)
+
+
+def sleep_until(deadline: float, clock: Callable[[], float] = time.monotonic, spin_sec: float = SPIN_SEC) -> None:
+    while True:
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return
+        if remaining > spin_sec:
+            time.sleep(remaining - spin_sec)
+
+
+@dataclass
+class StepTiming:
+    index: int
+    name: str
+    args: tuple
+    planned_start: float
+    planned_end: float
+    actual_start: Optional[float] = None
+    actual_end: Optional[float] = None
+
+    @property
+    def start_lateness(self) -> float:
+        return (self.actual_start or 0.0) - self.planned_start
+
+    @property
+    def end_lateness(self) -> float:
+        return (self.actual_end or 0.0) - self.planned_end
+
+
+class StepScheduler:
+    """Runs route steps against a plan of start/end times relative to a monotonic origin.
+
+    deadline=False keeps the legacy behaviour (call, then sleep step_delay) and only
+    records timings. deadline=True dispatches every action at its absolute planned
+    start, so dispatch overhead and sleep granularity do not accumulate across the
+    route. Everything runs on the calling thread. Steps never overlap: a step that
+    overruns its slot delays the next start, and the gap before the following step
+    shrinks.
+
+    overhead: cumulative dispatch overhead in seconds (actions/dispatch_latency.py). In
+    legacy mode the STEP_DELAY sleep after a step shrinks by what the step's inputs
+    cost, down to min_gap; deadline mode already absorbs it in the absolute starts.
+    """
+
+    def __init__(
+        self,
+        step_delay: float,
+        deadline: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+        overhead: Optional[Callable[[], float]] = None,
+        min_gap: float = 0.0,
+    ):
+        self.step_delay = step_delay
+        self.deadline = deadline
+        self.clock = clock
+        self.overhead = overhead
+        self.min_gap = min(min_gap, step_delay)
+        self.compensated_sec = 0.0
+        self.timings: List[StepTiming] = []
+        self._origin = clock()
+        self._cursor = 0.0
+
+    def _now(self) -> float:
+        return self.clock() - self._origin
+
+    def _plan(self, name: str, args: Sequence[object], nominal: float) -> StepTiming:
+        timing = StepTiming(
+            index=len(self.timings),
+            name=name,
+            args=tuple(args),
+            planned_start=self._cursor,
+            planned_end=self._cursor + nominal,
+        )
+        self.timings.append(timing)
+        return timing
+
+    def _wait_planned_start(self, timing: StepTiming) -> None:
+        idle = self.clock()
+        sleep_until(self._origin + timing.planned_start, self.clock)
+        PROFILER.charge("step_delay", self.clock() - idle)
+
+    def _run(self, timing: StepTiming, fn: Callable, args: Sequence[object]) -> None:
+        timing.actual_start = self._now()
+        try:
+            fn(*args)
+        finally:
+            timing.actual_end = self._now()
+
+    def run_action(
+        self,
+        name: str,
+        args: Sequence[object],
+        fn: Callable,
+        nominal: Optional[float] = None,
+        elastic: bool = False,
+    ) -> StepTiming:
+        """elastic: the step's length is not known up front (e.g. it waits for a screen state), so
+        the steps after it are planned from its actual end."""
+        nominal = nominal_duration(name, args) if nominal is None else nominal
+        timing = self._plan(name, args, nominal)
+        self._cursor = timing.planned_end + self.step_delay
+        if not self.deadline:
+            before = self.overhead() if self.overhead is not None else 0.0
+            self._run(timing, fn, args)
+            gap = self.step_delay
+            if self.overhead is not None:
+                gap = max(self.min_gap, gap - (self.overhead() - before))
+                self.compensated_sec += self.step_delay - gap
+            idle = self.clock()
+            time.sleep(gap)
+            PROFILER.charge("step_delay", self.clock() - idle)
+            return timing
+
+        self._wait_planned_start(timing)
+        self._run(timing, fn, args)
+        if elastic:
+            self._cursor = timing.actual_end + self.step_delay
+        return timing
+
+    def run_marker(self, name: str, fn: Callable, nominal: float = 0.0) -> StepTiming:
+        timing = self._plan(name, (), nominal)
+        self._cursor = timing.planned_end
+        if self.deadline:
+            self._wait_planned_start(timing)
+        self._run(timing, fn, ())
+        return timing
+
+    def finish(self) -> List[StepTiming]:
+        return self.timings
+
+
+def summarize_timings(timings: Sequence[StepTiming]) -> str:
+    done = [timing for timing in timings if timing.actual_end is not None]
+    if not done:
+        return "no steps"
+    planned = done[-1].planned_end
+    actual = done[-1].actual_end
+    worst = max(done, key=lambda timing: timing.start_lateness)
+    return (
+        f"planned={planned:.2f}s actual={actual:.2f}s drift={actual - planned:+.2f}s "
+        f"max_start_late={worst.start_lateness * 1000:.0f}ms ({worst.name}#{worst.index})"
+    )
+
+
+def append_timings_jsonl(path: str, timings: Sequence[StepTiming], **context: object) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for timing in timings:
+            f.write(json.dumps({**context, **asdict(timing)}, ensure_ascii=False) + "\n")
@@ -0,0 +1,200 @@
+"""Record several phones at once from one launcher.
+
+This script only supervises: every selected device, and every serial of a
+device, runs its multiroute_<device>.py profile in its own multiprocessing
+worker process (spawn context) bound to its adb serial (ANDROID_SERIAL, used
+by the input transports and scrcpy). Workers stream progress events back over
+a queue; a failing device is reported and does not stop the others.
+
+A serial env var may list several phones of the same model
+(AUTO_SERIAL_HUAWEIPURA=serialA,serialB). Those workers share one job queue
+(engine/job_queue.py) and split the route x config matrix between them.
+"""
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from engine.profiler import format_breakdown
+
+# device name -> (profile script module, serial env var)
+DEVICES: Dict[str, tuple] = {
+    "huaweipura": ("multiroute_huaweipura", "AUTO_SERIAL_HUAWEIPURA"),
+    "huaweimate": ("multiroute_huaweimate", "AUTO_SERIAL_HUAWEIMATE"),
+    "oppofindx": ("multiroute_oppofindx", "AUTO_SERIAL_OPPOFINDX"),
+}
+# None -> every device whose serial env var is set. Env: AUTO_DEVICES=huaweipura,oppofindx
+ACTIVE_DEVICES: Optional[List[str]] = None
+PROGRESS_INTERVAL_SEC = 30.0
+JOB_QUEUE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "job_queues")
+
+
+def _resolve_active_devices() -> List[str]:
+    raw = os.environ.get("AUTO_DEVICES", "").strip()
+    names = [item.strip() for item in raw.split(",") if item.strip()] if raw else ACTIVE_DEVICES
+    if names is None:
+        names = [name for name, (_, serial_env) in DEVICES.items() if os.environ.get(serial_env, "").strip()]
+    unknown = [name for name in names if name not in DEVICES]
+    if unknown:
+        raise ValueError(f"Unknown devices {unknown}. Available: {sorted(DEVICES)}")
+    if not names:
+        raise ValueError("No device selected. Set AUTO_DEVICES or AUTO_SERIAL_<DEVICE>.")
+    return names
+
+
+def _split_serials(raw: str) -> List[str]:
+    return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+def _plan_workers(names: List[str]) -> List[tuple]:
+    """(worker name, script module, serial, job queue path or '') per phone."""
+    workers = []
+    for name in names:
+        script_module, serial_env = DEVICES[name]
+        serials = _split_serials(os.environ.get(serial_env, "")) or [""]
+        if len(serials) == 1:
+            workers.append((name, script_module, serials[0], ""))
+            continue
+        queue_path = os.environ.get("AUTO_JOB_QUEUE", "").strip() or os.path.join(JOB_QUEUE_DIR, f"{name}.sqlite")
+        for serial in serials:
+            workers.append((f"{name}@{serial}", script_module, serial, queue_path))
+    return workers
+
+
+def _worker(name: str, script_module: str, serial: str, queue_path: str, events) -> None:
+    if serial:
+        os.environ["ANDROID_SERIAL"] = serial
+    if queue_path:
+        os.environ["AUTO_JOB_QUEUE"] = queue_path
+        os.environ["AUTO_JOB_WORKER"] = name
+    os.environ.pop("GLOBAL_ACTIONS_MODULE", None)
+
+    def forward(event: str, fields: Dict[str, object]) -> None:
+        events.put((name, event, fields))
+
+    try:
+        import importlib
+
+        from engine.progress import report, set_reporter
+
+        set_reporter(forward)
+        module = importlib.import_module(script_module)
+        module.run_multi_routes(module.PROFILE)
+        report("worker_done")
+    except BaseException as exc:
+        events.put((name, "worker_failed", {"error": repr(exc), "traceback": traceback.format_exc()}))
+        raise SystemExit(1)
+
+
+class _DeviceState:
+    def __init__(self):
+        self.route: Optional[int] = None
+        self.config_index = 0
+        self.config_total = 0
+        self.configs_done = 0
+        self.status = "starting"
+        self.game_time_saved_sec: Optional[float] = None
+        self.phase_seconds: Optional[Dict[str, float]] = None
+
+    def describe(self) -> str:
+        if self.route is None:
+            return self.status
+        return f"{self.status} R{self.route} {self.config_index}/{self.config_total} (configs done: {self.configs_done})"
+
+
+def _apply_event(state: _DeviceState, event: str, fields: Dict[str, object]) -> None:
+    if event == "route_start":
+        state.route = fields["route"]
+        state.config_index = 0
+        state.config_total = fields["configs"]
+        state.status = "running"
+    elif event == "config_done":
+        state.config_index = fields["index"]
+        state.configs_done += 1
+    elif event == "game_time":
+        state.game_time_saved_sec = fields["saved_sec"]
+    elif event == "profile":
+        state.phase_seconds = fields["seconds"]
+    elif event == "worker_done":
+        state.status = "done"
+    elif event == "worker_failed":
+        state.status = "failed"
+
+
+def _print_progress(states: Dict[str, _DeviceState]) -> None:
+    print("[PROGRESS] " + " | ".join(f"{name}: {state.describe()}" for name, state in states.items()))
+
+
+def _print_phase_summary(states: Dict[str, _DeviceState]) -> None:
+    """Per-device and combined phase breakdown of AUTO_PROFILE=1 runs."""
+    combined: Dict[str, float] = {}
+    for name, state in states.items():
+        if state.phase_seconds is None:
+            continue
+        print(f"[SUMMARY] Time by phase {name}: {format_breakdown(state.phase_seconds, sum(state.phase_seconds.values()))}")
+        for category, seconds in state.phase_seconds.items():
+            combined[category] = combined.get(category, 0.0) + seconds
+    if combined:
+        print(f"[SUMMARY] Time by phase, all devices: {format_breakdown(combined, sum(combined.values()))}")
+
+
+def run_all_devices() -> int:
+    names = _resolve_active_devices()
+    ctx = multiprocessing.get_context("spawn")
+    events = ctx.Queue()
+    workers = {}
+    plan = _plan_workers(names)
+    states = {name: _DeviceState() for name, _, _, _ in plan}
+    for name, script_module, serial, queue_path in plan:
+        queue_note = f" queue={queue_path}" if queue_path else ""
+        print(f"[DEVICE] {name}: {script_module} serial={serial or '<adb default>'}{queue_note}")
+        proc = ctx.Process(
+            target=_worker, args=(name, script_module, serial, queue_path, events), name=f"record-{name}"
+        )
+        proc.start()
+        workers[name] = proc
+
+    last_print = time.monotonic()
+    while any(proc.is_alive() for proc in workers.values()) or not events.empty():
+        try:
+            name, event, fields = events.get(timeout=1.0)
+        except queue.Empty:
+            pass
+        else:
+            _apply_event(states[name], event, fields)
+            if event == "worker_failed":
+                print(f"[DEVICE][FAIL] {name}: {fields['error']}\n{fields['traceback']}")
+            elif event in ("route_done", "worker_done"):
+                _print_progress(states)
+        if time.monotonic() - last_print >= PROGRESS_INTERVAL_SEC:
+            _print_progress(states)
+            last_print = time.monotonic()
+
+    failed = []
+    for name, proc in workers.items():
+        proc.join()
+        if proc.exitcode != 0:
+            failed.append(name)
+            states[name].status = "failed"
+    _print_progress(states)
+    saved = {name: state.game_time_saved_sec for name, state in states.items() if state.game_time_saved_sec is not None}
+    if saved:
+        print(
+            "[SUMMARY] Game-time adjustments saved ~"
+            + ", ".join(f"{name}: {seconds:.0f}s" for name, seconds in saved.items())
+        )
+    _print_phase_summary(states)
+    if failed:
+        print(f"[SUMMARY] Failed devices: {failed}")
+        return 1
+    print(f"[SUMMARY] All devices finished: {list(workers)}")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(run_all_devices())
+    except KeyboardInterrupt:
+        print("[INTERRUPT] Ctrl+C received, exit.")
@@ -0,0 +1,87 @@
+"""Background completion of recordings.
+
+The route executor only signals scrcpy to stop; waiting for the process to
+write its file, and any ffmpeg cut afterwards, runs here on worker threads.
+Each job carries the (route, config_id, segment_indexes) it produces, so a
+failure or timeout is reported against those segments.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+FINALIZE_WORKERS = int(os.environ.get("AUTO_FINALIZE_WORKERS", "2"))
+FINALIZE_TIMEOUT_SEC = float(os.environ.get("AUTO_FINALIZE_TIMEOUT_SEC", "60"))
+
+
+@dataclass(frozen=True)
+class FinalizeFailure:
+    route: Optional[int]
+    config_id: str
+    segment_indexes: Tuple[int, ...]
+    error: str
+
+    def describe(self) -> str:
+        segments = ",".join(f"s{index:02d}" for index in self.segment_indexes)
+        return f"R{self.route} {self.config_id} {segments}: {self.error}"
+
+
+@dataclass
+class _Job:
+    route: Optional[int]
+    config_id: str
+    segment_indexes: Tuple[int, ...]
+    deadline: float
+    future: Future
+
+
+class Finalizer:
+    def __init__(self, workers: int = FINALIZE_WORKERS, timeout_sec: float = FINALIZE_TIMEOUT_SEC):
+        self.timeout_sec = timeout_sec
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="finalize")
+        self._lock = threading.Lock()
+        self._jobs: List[_Job] = []
+
+    def submit(
+        self,
+        route: Optional[int],
+        config_id: str,
+        segment_indexes: Sequence[int],
+        job: Callable[[], object],
+    ) -> None:
+        future = self._pool.submit(job)
+        with self._lock:
+            self._jobs.append(
+                _Job(route, config_id, tuple(segment_indexes), time.monotonic() + self.timeout_sec, future)
+            )
+
+    @property
+    def outstanding(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs if not job.future.done())
+
+    def drain(self, config_id: Optional[str] = None) -> List[FinalizeFailure]:
+        """Wait for outstanding jobs (of one config, or all) and return their failures.
+
+        A job past its deadline is reported as timed out; it keeps running, but
+        its result is no longer waited for.
+        """
+        with self._lock:
+            jobs = [job for job in self._jobs if config_id is None or job.config_id == config_id]
+            self._jobs = [job for job in self._jobs if job not in jobs]
+        failures: List[FinalizeFailure] = []
+        for job in jobs:
+            try:
+                job.future.result(timeout=max(0.0, job.deadline - time.monotonic()))
+            except FutureTimeoutError:
+                error = f"finalize timed out after {self.timeout_sec:.0f}s"
+                failures.append(FinalizeFailure(job.route, job.config_id, job.segment_indexes, error))
+            except Exception as exc:
+                failures.append(FinalizeFailure(job.route, job.config_id, job.segment_indexes, repr(exc)))
+        return failures
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
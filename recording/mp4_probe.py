@@ -0,0 +1,226 @@
+"""Reads duration, frame count, resolution and codec straight from mp4 box headers.
+
+Only the top-level box headers and the moov box are read (mdat is skipped with
+a seek), so checking a recording costs a few KB of I/O instead of a decode or
+an ffprobe process. An empty file, a missing moov (scrcpy killed before it
+finalized the file), a box running past the end of the file or a file without
+video samples is reported as an error.
+"""
+import json
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+VIDEO_VALIDATION = os.environ.get("AUTO_VIDEO_VALIDATION", "container").strip().lower()
+if VIDEO_VALIDATION not in ("container", "exists"):
+    raise ValueError(f"Unknown AUTO_VIDEO_VALIDATION={VIDEO_VALIDATION!r}. Use container or exists.")
+PROBE_WORKERS = int(os.environ.get("AUTO_VIDEO_PROBE_WORKERS", "8"))
+
+
+@dataclass(frozen=True)
+class VideoInfo:
+    path: str
+    size: int
+    duration: float = 0.0
+    frames: int = 0
+    width: int = 0
+    height: int = 0
+    codec: str = ""
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+class Mp4Error(Exception):
+    pass
+
+
+def _boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, payload_start, box_end) of the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise Mp4Error(f"truncated {box_type.decode(errors='replace')} header")
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise Mp4Error(f"{box_type.decode(errors='replace')} box runs past its parent")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find(data: bytes, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for found, payload, box_end in _boxes(data, start, end):
+        if found == box_type:
+            return payload, box_end
+    return None
+
+
+def _timescaled_duration(data: bytes, payload: int) -> Tuple[int, int]:
+    """(timescale, duration) of an mvhd/mdhd payload."""
+    if data[payload] == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, payload + 4 + 16)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, payload + 4 + 8)
+    return timescale, duration
+
+
+def _track_dimensions(data: bytes, payload: int) -> Tuple[int, int]:
+    # tkhd: version/flags, times, track id, reserved, duration, then 52 fixed bytes before width/height.
+    offset = payload + 4 + (32 if data[payload] == 1 else 20) + 52
+    width, height = struct.unpack_from(">II", data, offset)
+    return width >> 16, height >> 16
+
+
+def _sample_count(data: bytes, stbl: Tuple[int, int]) -> int:
+    stsz = _find(data, stbl[0], stbl[1], b"stsz")
+    if stsz is not None:
+        return struct.unpack_from(">I", data, stsz[0] + 8)[0]
+    stts = _find(data, stbl[0], stbl[1], b"stts")
+    if stts is None:
+        return 0
+    entries = struct.unpack_from(">I", data, stts[0] + 4)[0]
+    return sum(struct.unpack_from(">I", data, stts[0] + 8 + 8 * i)[0] for i in range(entries))
+
+
+def parse_moov(data: bytes) -> Dict[str, object]:
+    """Video track facts from the payload of a moov box."""
+    mvhd = _find(data, 0, len(data), b"mvhd")
+    movie_duration = 0.0
+    if mvhd is not None:
+        timescale, duration = _timescaled_duration(data, mvhd[0])
+        movie_duration = duration / timescale if timescale else 0.0
+    for box_type, payload, end in _boxes(data):
+        if box_type != b"trak":
+            continue
+        mdia = _find(data, payload, end, b"mdia")
+        if mdia is None:
+            continue
+        hdlr = _find(data, mdia[0], mdia[1], b"hdlr")
+        if hdlr is None or data[hdlr[0] + 8:hdlr[0] + 12] != b"vide":
+            continue
+        info: Dict[str, object] = {"duration": movie_duration}
+        tkhd = _find(data, payload, end, b"tkhd")
+        if tkhd is not None:
+            info["width"], info["height"] = _track_dimensions(data, tkhd[0])
+        mdhd = _find(data, mdia[0], mdia[1], b"mdhd")
+        if mdhd is not None:
+            timescale, duration = _timescaled_duration(data, mdhd[0])
+            if timescale and duration:
+                info["duration"] = duration / timescale
+        minf = _find(data, mdia[0], mdia[1], b"minf")
+        stbl = _find(data, minf[0], minf[1], b"stbl") if minf is not None else None
+        if stbl is not None:
+            stsd = _find(data, stbl[0], stbl[1], b"stsd")
+            if stsd is not None and stsd[1] - stsd[0] >= 16:
+                info["codec"] = data[stsd[0] + 12:stsd[0] + 16].decode("latin-1")
+            info["frames"] = _sample_count(data, stbl)
+        return info
+    raise Mp4Error("no video track")
+
+
+def probe_mp4(path: str) -> VideoInfo:
+    try:
+        size = os.path.getsize(path)
+    except OSError as exc:
+        return VideoInfo(path, -1, error=f"missing ({exc.strerror})")
+    if size == 0:
+        return VideoInfo(path, 0, error="empty file")
+    try:
+        moov = None
+        with open(path, "rb") as f:
+            pos = 0
+            while pos + 8 <= size:
+                f.seek(pos)
+                header = f.read(16)
+                box_size, box_type = struct.unpack_from(">I4s", header)
+                if box_size == 1:
+                    box_size = struct.unpack_from(">Q", header, 8)[0]
+                elif box_size == 0:
+                    box_size = size - pos
+                if box_size < 8 or pos + box_size > size:
+                    raise Mp4Error(f"truncated: {box_type.decode(errors='replace')} box ends past end of file")
+                if box_type == b"moov":
+                    f.seek(pos)
+                    moov = f.read(box_size)
+                elif box_type == b"moof":
+                    raise Mp4Error("fragmented mp4 is not supported by the box validator")
+                pos += box_size
+        if moov is None:
+            raise Mp4Error("no moov box (recording not finalized)")
+        header = 16 if struct.unpack_from(">I", moov)[0] == 1 else 8
+        info = parse_moov(moov[header:])
+    except (Mp4Error, struct.error) as exc:
+        return VideoInfo(path, size, error=str(exc) or "malformed box")
+    result = VideoInfo(path, size, **info)
+    if result.frames <= 0:
+        return VideoInfo(**{**asdict(result), "error": "no video samples"})
+    return result
+
+
+class ProbeCache:
+    """probe_mp4 results keyed by (path, size, mtime); optionally persisted as JSON."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[int, int, VideoInfo]] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for key, (size, mtime_ns, info) in json.load(f).items():
+                    self._entries[key] = (size, mtime_ns, VideoInfo(**info))
+
+    def probe(self, path: str) -> VideoInfo:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return probe_mp4(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None and cached[:2] == (st.st_size, st.st_mtime_ns):
+            return cached[2]
+        info = probe_mp4(path)
+        with self._lock:
+            self._entries[key] = (st.st_size, st.st_mtime_ns, info)
+        return info
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            data = {key: [size, mtime_ns, asdict(info)] for key, (size, mtime_ns, info) in self._entries.items()}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+PROBE_CACHE = ProbeCache()
+
+
+def probe_many(
+    paths: Sequence[str], cache: Optional[ProbeCache] = None, workers: int = PROBE_WORKERS
+) -> Dict[str, VideoInfo]:
+    cache = cache or PROBE_CACHE
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="mp4-probe") as pool:
+        return dict(zip(paths, pool.map(cache.probe, paths)))
+
+
+def videos_usable(paths: Sequence[str], cache: Optional[ProbeCache] = None) -> bool:
+    """Every path is a finalized mp4 with video samples (or just exists with AUTO_VIDEO_VALIDATION=exists)."""
+    paths = list(paths)
+    if VIDEO_VALIDATION == "exists":
+        return all(os.path.exists(path) for path in paths)
+    return all(info.ok for info in probe_many(paths, cache).values())
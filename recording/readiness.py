@@ -0,0 +1,171 @@
+"""Detect when a scrcpy recording is really live.
+
+scrcpy logs "Recording started" once the muxer has written the header, which it
+only does after the first video packet arrived; at the same moment the output
+file stops being empty. Instead of sleeping a fixed SCRCPY_STARTUP_WAIT after
+the spawn, recorders wait for one of these signals, up to a timeout.
+
+AUTO_SCRCPY_READY selects the signal: "file" (first bytes in the output file,
+default), "log" (the log line) or "sleep" (the old fixed wait).
+"""
+import os
+import subprocess
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional
+
+READY_MODE = os.environ.get("AUTO_SCRCPY_READY", "file").strip().lower()
+READY_POLL_SEC = float(os.environ.get("AUTO_SCRCPY_READY_POLL_SEC", "0.02"))
+LATENCY_BUCKET_MS = int(os.environ.get("AUTO_SCRCPY_LATENCY_BUCKET_MS", "100"))
+LOG_READY_MARKER = "Recording started"
+
+
+def device_label() -> str:
+    return os.environ.get("ANDROID_SERIAL", "").strip() or "default"
+
+
+class StartupLatency:
+    """Per-device histogram of spawn -> live latency; timeouts are counted apart."""
+
+    def __init__(self, bucket_ms: int = LATENCY_BUCKET_MS):
+        self.bucket_ms = max(1, bucket_ms)
+        self._samples: Dict[str, List[float]] = defaultdict(list)
+        self._timeouts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, device: str, latency_sec: Optional[float]) -> None:
+        with self._lock:
+            if latency_sec is None:
+                self._timeouts[device] += 1
+            else:
+                self._samples[device].append(latency_sec)
+
+    def devices(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._samples) | set(self._timeouts))
+
+    def describe(self, device: str) -> List[str]:
+        with self._lock:
+            samples = sorted(self._samples.get(device, []))
+            timeouts = self._timeouts.get(device, 0)
+        if not samples:
+            return [f"n=0 timeouts={timeouts}"]
+
+        def pct(q: float) -> float:
+            return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+        lines = [
+            f"n={len(samples)} p50={pct(0.5):.0f}ms p90={pct(0.9):.0f}ms "
+            f"max={samples[-1] * 1000:.0f}ms timeouts={timeouts}"
+        ]
+        buckets: Dict[int, int] = defaultdict(int)
+        for sample in samples:
+            buckets[int(sample * 1000) // self.bucket_ms] += 1
+        widest = max(buckets.values())
+        for bucket in range(min(buckets), max(buckets) + 1):
+            count = buckets.get(bucket, 0)
+            low = bucket * self.bucket_ms
+            bar = "#" * max(1 if count else 0, round(30 * count / widest))
+            label = f"{low}-{low + self.bucket_ms}ms"
+            lines.append(f"{label:>11} |{bar} {count}")
+        return lines
+
+
+STARTUP_LATENCY = StartupLatency()
+
+
+class ReadinessProbe:
+    """Watches one freshly spawned scrcpy process until its recording is live.
+
+    The process must have been started with stdout piped (stderr merged); the
+    probe drains it for the lifetime of the process and keeps the tail for
+    error messages.
+    """
+
+    def __init__(
+        self,
+        proc: subprocess.Popen,
+        video_path: str,
+        timeout_sec: float,
+        mode: str = READY_MODE,
+        clock: Callable[[], float] = time.monotonic,
+        spawned: Optional[float] = None,
+    ):
+        if mode not in ("file", "log", "sleep"):
+            raise ValueError(f"Unknown AUTO_SCRCPY_READY={mode!r}. Use file, log or sleep.")
+        self.proc = proc
+        self.video_path = video_path
+        self.mode = mode
+        self.clock = clock
+        self.spawned = clock() if spawned is None else spawned
+        self.deadline = self.spawned + timeout_sec
+        self.log_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.signal: Optional[str] = None
+        self.log: deque = deque(maxlen=50)
+        self._done = threading.Event()
+        self._recorded = False
+        if proc.stdout is not None:
+            threading.Thread(target=self._drain, daemon=True).start()
+        if mode != "sleep":
+            threading.Thread(target=self._watch, daemon=True).start()
+
+    def _mark(self, signal: str) -> None:
+        if not self._done.is_set():
+            self.signal = signal
+            if signal != "exited":
+                self.ready_at = self.clock()
+            self._done.set()
+
+    def _drain(self) -> None:
+        for line in self.proc.stdout:
+            self.log.append(line.rstrip())
+            if self.log_at is None and LOG_READY_MARKER in line:
+                self.log_at = self.clock()
+                if self.mode == "log":
+                    self._mark("log")
+
+    def _file_started(self) -> bool:
+        try:
+            return os.path.getsize(self.video_path) > 0
+        except OSError:
+            return False
+
+    def _watch(self) -> None:
+        while not self._done.is_set() and self.clock() < self.deadline:
+            if self.mode == "file" and self._file_started():
+                self._mark("file")
+                return
+            if self.proc.poll() is not None:
+                self._mark("exited")
+                return
+            self._done.wait(READY_POLL_SEC)
+
+    @property
+    def latency(self) -> Optional[float]:
+        return None if self.ready_at is None else self.ready_at - self.spawned
+
+    def wait(self) -> bool:
+        """Block until the recording is live or the timeout passed; True if live.
+
+        The first call adds the startup latency (or a timeout) to STARTUP_LATENCY.
+        """
+        remaining = max(0.0, self.deadline - self.clock())
+        if self.mode == "sleep":
+            time.sleep(remaining)
+        else:
+            self._done.wait(remaining)
+        if not self._recorded and self.mode != "sleep":
+            self._recorded = True
+            STARTUP_LATENCY.add(device_label(), self.latency)
+        return self.ready_at is not None
+
+    def describe(self) -> str:
+        if self.mode == "sleep":
+            return "fixed wait"
+        if self.ready_at is not None:
+            return f"live after {self.latency * 1000:.0f}ms ({self.signal})"
+        if self.signal == "exited":
+            return f"scrcpy exited early: {list(self.log)[-3:]}"
+        return f"not live after {(self.deadline - self.spawned):.1f}s, continuing"
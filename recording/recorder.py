@@ -1,4 +1,15 @@
-from recording.scrcpy_recorder import start_record, stop_record
+import os
+
+from recording import scrcpy_recorder
+from recording.remux import capture_path, remux
+from recording.staging import staged_path
+from recording.scrcpy_recorder import signal_stop, start_record, stop_record, wait_stopped
+
+# "scrcpy" streams to the host; "screenrecord" records on the phone, see recording/screenrecord_recorder.py.
+RECORDER_BACKEND = os.environ.get("AUTO_RECORDER_BACKEND", "scrcpy").strip().lower()
+# Device-side recordings reach segment_video_path only when DEVICE_PULLS runs at route end.
+RECORDINGS_DEFERRED = RECORDER_BACKEND == "screenrecord"
+
 
 class Recorder:
     def __init__(self, video_path):
@@ -8,10 +19,46 @@ class Recorder:
     def start(self):
         if self.proc is None:
             print(f"[RECORD] 开始录制 {self.video_path}")
-            self.proc = start_record(self.video_path)
+            self.proc = start_record(capture_path(staged_path(self.video_path)))
 
     def stop(self):
         if self.proc is not None:
             print("[RECORD] 停止录制")
             stop_record(self.proc)
             self.proc = None
+
+    def request_stop(self):
+        """Signal scrcpy to stop and hand back the process; the caller waits for it."""
+        proc, self.proc = self.proc, None
+        if proc is not None:
+            print("[RECORD] 停止录制")
+            signal_stop(proc)
+        return proc
+
+    def wait_stopped(self, proc, on_ready=None):
+        """Wait for a request_stop() result; on_ready runs once the file is at staged_path(video_path)."""
+        if proc is not None:
+            wait_stopped(proc)
+            produced = staged_path(self.video_path)
+            remux(capture_path(produced), produced)
+        if on_ready is not None:
+            on_ready()
+
+
+def make_recorder(video_path):
+    if RECORDER_BACKEND == "scrcpy":
+        return Recorder(video_path)
+    if RECORDER_BACKEND == "screenrecord":
+        from recording.screenrecord_recorder import ScreenrecordRecorder
+
+        return ScreenrecordRecorder(video_path)
+    raise ValueError(f"Unknown AUTO_RECORDER_BACKEND={RECORDER_BACKEND!r}. Use scrcpy or screenrecord.")
+
+
+def recorder_settings():
+    """Settings of the active backend that change what ends up in a recording."""
+    if RECORDER_BACKEND == "screenrecord":
+        from recording.screenrecord_recorder import recorder_settings as screenrecord_settings
+
+        return screenrecord_settings()
+    return scrcpy_recorder.recorder_settings()
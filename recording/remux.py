@@ -0,0 +1,69 @@
+"""Crash-resilient recording container.
+
+With AUTO_RECORD_CONTAINER=mkv scrcpy records into Matroska, which stays
+readable up to the last written cluster when scrcpy is killed; an mp4 whose
+moov atom was never written does not. The finished capture is remuxed (stream
+copy, no re-encode) into the final .mp4 path on the finalizer's worker
+threads, as low-priority ffmpeg processes so remuxing never competes with a
+running capture.
+"""
+import os
+import subprocess
+from typing import List
+
+from recording.stream_cut import FFMPEG_BIN
+
+RECORD_CONTAINER = os.environ.get("AUTO_RECORD_CONTAINER", "mp4").strip().lower()
+if RECORD_CONTAINER not in ("mp4", "mkv"):
+    raise ValueError(f"Unknown AUTO_RECORD_CONTAINER={RECORD_CONTAINER!r}. Use mp4 or mkv.")
+REMUX_NICE = int(os.environ.get("AUTO_REMUX_NICE", "10"))
+
+
+def capture_path(video_path: str) -> str:
+    """Where scrcpy writes the recording that ends up at video_path."""
+    if RECORD_CONTAINER == "mp4":
+        return video_path
+    root, _ = os.path.splitext(video_path)
+    return f"{root}.rec.mkv"
+
+
+def low_priority_kwargs() -> dict:
+    if os.name == "nt":
+        return {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS}
+    return {"preexec_fn": lambda: os.nice(REMUX_NICE)}
+
+
+def remux_command(source_path: str, output_path: str) -> List[str]:
+    return [
+        FFMPEG_BIN,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        source_path,
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        "-movflags",
+        "+faststart",
+        output_path,
+    ]
+
+
+def remux(source_path: str, video_path: str) -> None:
+    """Stream-copy source_path into video_path (atomically) and delete the source."""
+    if source_path == video_path:
+        return
+    root, ext = os.path.splitext(video_path)
+    part_path = f"{root}.part{ext}"
+    result = subprocess.run(
+        remux_command(source_path, part_path), capture_output=True, text=True, **low_priority_kwargs()
+    )
+    if result.returncode != 0:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise RuntimeError(f"ffmpeg remux of {source_path} failed: {result.stderr.strip()[-500:]}")
+    os.replace(part_path, video_path)
+    os.remove(source_path)
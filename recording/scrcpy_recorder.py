@@ -3,13 +3,30 @@ import signal
 import subprocess
 import time
 
+from recording.readiness import READY_MODE, ReadinessProbe
+from recording.remux import RECORD_CONTAINER
+
 SCRCPY_BIN = os.environ.get("SCRCPY_BIN", r"D:/Softwares/scrcpy-win64-v3.3.3/scrcpy.exe")
 SCRCPY_MAX_FPS = os.environ.get("SCRCPY_MAX_FPS", "60")
 SCRCPY_STARTUP_WAIT = float(os.environ.get("SCRCPY_STARTUP_WAIT", "1.0"))
+# Upper bound for the readiness probe; SCRCPY_STARTUP_WAIT stays the fixed wait of AUTO_SCRCPY_READY=sleep.
+SCRCPY_READY_TIMEOUT = float(os.environ.get("SCRCPY_READY_TIMEOUT", "5.0"))
+STOP_TIMEOUT_SEC = 8
 
 
-def start_record(video_path):
-    os.makedirs(os.path.dirname(video_path) or ".", exist_ok=True)
+def recorder_settings():
+    """Settings that change what ends up in a recording, for the incremental manifest."""
+    return {
+        "backend": "scrcpy",
+        "max_fps": str(SCRCPY_MAX_FPS),
+        "startup_wait": SCRCPY_STARTUP_WAIT,
+        "ready": READY_MODE,
+        "container": RECORD_CONTAINER,
+        "audio": False,
+    }
+
+
+def record_command(video_path, extra_args=()):
     cmd = [
         SCRCPY_BIN,
         "--record",
@@ -19,21 +36,53 @@ def start_record(video_path):
         str(SCRCPY_MAX_FPS),
         "--no-audio",
         "--no-window",
+        *extra_args,
     ]
-    kwargs = {}
+    serial = os.environ.get("ANDROID_SERIAL", "").strip()
+    if serial:
+        cmd += ["--serial", serial]
+    return cmd
+
+
+def process_group_kwargs():
+    """Own process group, so stop_record can deliver Ctrl+C / SIGINT to scrcpy alone."""
     if os.name == "nt":
-        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
-    else:
-        kwargs["preexec_fn"] = os.setsid
-    proc = subprocess.Popen(cmd, **kwargs)
-    time.sleep(SCRCPY_STARTUP_WAIT)
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"preexec_fn": os.setsid}
+
+
+def spawn_record(video_path, extra_args=(), clock=time.monotonic):
+    """Start scrcpy with its log piped into a ReadinessProbe; does not wait."""
+    os.makedirs(os.path.dirname(video_path) or ".", exist_ok=True)
+    # scrcpy overwrites the file anyway; a stale one would look like a live recording to the probe.
+    if os.path.exists(video_path):
+        os.remove(video_path)
+    spawned = clock()
+    proc = subprocess.Popen(
+        record_command(video_path, extra_args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        **process_group_kwargs(),
+    )
+    timeout = SCRCPY_STARTUP_WAIT if READY_MODE == "sleep" else SCRCPY_READY_TIMEOUT
+    return proc, ReadinessProbe(proc, video_path, timeout, clock=clock, spawned=spawned)
+
+
+def start_record(video_path):
+    proc, probe = spawn_record(video_path)
+    if not probe.wait() and READY_MODE != "sleep":
+        print(f"[WARN] {video_path}: {probe.describe()}")
+    elif READY_MODE != "sleep":
+        print(f"[RECORD] scrcpy {probe.describe()}")
     return proc
 
 
-def stop_record(proc):
+def signal_stop(proc):
+    """Ask scrcpy to finish the file (Ctrl+C / SIGINT); does not wait."""
     if proc.poll() is not None:
         return
-
     try:
         if os.name == "nt":
             proc.send_signal(signal.CTRL_BREAK_EVENT)
@@ -42,8 +91,17 @@ def stop_record(proc):
     except OSError:
         proc.terminate()
 
+
+def wait_stopped(proc, timeout=STOP_TIMEOUT_SEC):
     try:
-        proc.wait(timeout=8)
+        proc.wait(timeout=timeout)
     except subprocess.TimeoutExpired:
         proc.kill()
         proc.wait()
+
+
+def stop_record(proc):
+    if proc.poll() is not None:
+        return
+    signal_stop(proc)
+    wait_stopped(proc)
@@ -0,0 +1,281 @@
+"""On-device recording with Android's `screenrecord`.
+
+The phone encodes and stores the video under /data/local/tmp, so neither the
+host CPU nor the USB link limit the recording. screenrecord stops by itself
+after --time-limit seconds (180 on most builds); a segment that runs longer is
+continued in a new part file and the parts are joined by stream copy when the
+segment is pulled.
+
+Finished recordings wait in DEVICE_PULLS until the route ends, then get pulled
+in parallel `adb pull` batches, size-checked against the device copy, moved to
+their segment_video_path (its staging path with AUTO_STAGING_DIR) and deleted
+on the phone.
+"""
+import os
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from actions.transport import adb_command
+from recording.scrcpy_recorder import STOP_TIMEOUT_SEC
+from recording.staging import staged_path
+from recording.stream_cut import FFMPEG_BIN
+
+REMOTE_DIR = os.environ.get("AUTO_SCREENRECORD_REMOTE_DIR", "/data/local/tmp/auto_rec").rstrip("/")
+TIME_LIMIT_SEC = int(os.environ.get("AUTO_SCREENRECORD_TIME_LIMIT", "180"))
+BIT_RATE = os.environ.get("AUTO_SCREENRECORD_BITRATE", "20000000")
+SIZE = os.environ.get("AUTO_SCREENRECORD_SIZE", "").strip()  # e.g. 2400x1080; empty = native
+STARTUP_WAIT_SEC = float(os.environ.get("AUTO_SCREENRECORD_STARTUP_WAIT", "0.5"))
+PULL_WORKERS = int(os.environ.get("AUTO_SCREENRECORD_PULL_WORKERS", "3"))
+PULL_BATCH = int(os.environ.get("AUTO_SCREENRECORD_PULL_BATCH", "8"))
+PULL_TIMEOUT_SEC = float(os.environ.get("AUTO_SCREENRECORD_PULL_TIMEOUT_SEC", "300"))
+
+
+def recorder_settings():
+    """Settings that change what ends up in a recording, for the incremental manifest."""
+    return {
+        "backend": "screenrecord",
+        "time_limit": TIME_LIMIT_SEC,
+        "bit_rate": BIT_RATE,
+        "size": SIZE,
+        "startup_wait": STARTUP_WAIT_SEC,
+        "audio": False,
+    }
+
+
+def _serial() -> Optional[str]:
+    return os.environ.get("ANDROID_SERIAL", "").strip() or None
+
+
+def _adb_shell(command: str, timeout: float = 30) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        adb_command(_serial()) + ["shell", command], capture_output=True, text=True, timeout=timeout
+    )
+
+
+def screenrecord_command(remote_path: str) -> List[str]:
+    args = ["screenrecord", "--time-limit", str(TIME_LIMIT_SEC), "--bit-rate", BIT_RATE]
+    if SIZE:
+        args += ["--size", SIZE]
+    args.append(remote_path)
+    # Print the shell pid first: exec makes it screenrecord's pid, so stop can SIGINT it on the device.
+    script = f"mkdir -p {shlex.quote(REMOTE_DIR)} && echo $$ && exec {' '.join(shlex.quote(a) for a in args)}"
+    return adb_command(_serial()) + ["shell", script]
+
+
+class ScreenrecordRecorder:
+    """Recorder interface (start/stop/request_stop/wait_stopped) backed by screenrecord.
+
+    The file at video_path only exists after DEVICE_PULLS ran.
+    """
+
+    def __init__(self, video_path: str):
+        self.video_path = video_path
+        self.remote_parts: List[str] = []
+        self._stem = f"{os.getpid()}_{int(time.time() * 1000)}_{os.path.splitext(os.path.basename(video_path))[0]}"
+        self._proc: Optional[subprocess.Popen] = None
+        self._pid: Optional[str] = None
+        self._stopping = threading.Event()
+        # Serializes the stop check + next-part spawn against request_stop at a --time-limit rollover.
+        self._lock = threading.Lock()
+        self._chain: Optional[threading.Thread] = None
+
+    def _spawn_part(self) -> None:
+        remote = f"{REMOTE_DIR}/{self._stem}_p{len(self.remote_parts) + 1:02d}.mp4"
+        self._proc = subprocess.Popen(
+            screenrecord_command(remote), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        self._pid = self._proc.stdout.readline().strip()
+        self.remote_parts.append(remote)
+
+    def _follow_parts(self) -> None:
+        # screenrecord exits on its own at --time-limit; keep the segment going in a new part.
+        while True:
+            self._proc.wait()
+            with self._lock:
+                if self._stopping.is_set():
+                    return
+                print(f"[RECORD] screenrecord hit --time-limit {TIME_LIMIT_SEC}s, continue in part {len(self.remote_parts) + 1}")
+                self._spawn_part()
+
+    def start(self):
+        if self._proc is not None:
+            return
+        print(f"[RECORD] 开始录制 (screenrecord) {self.video_path}")
+        self._spawn_part()
+        self._chain = threading.Thread(target=self._follow_parts, daemon=True)
+        self._chain.start()
+        time.sleep(STARTUP_WAIT_SEC)
+
+    def request_stop(self):
+        with self._lock:
+            if self._proc is None or self._stopping.is_set():
+                return None
+            print("[RECORD] 停止录制")
+            self._stopping.set()
+            # No part is spawned after _stopping is set, so this is the last one.
+            proc, pid = self._proc, self._pid
+        if proc.poll() is None and pid:
+            # SIGINT lets screenrecord write the moov atom before it exits.
+            _adb_shell(f"kill -2 {pid}")
+        return proc
+
+    def _wait_device(self, proc) -> None:
+        try:
+            proc.wait(timeout=STOP_TIMEOUT_SEC)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        if self._chain is not None:
+            self._chain.join(timeout=STOP_TIMEOUT_SEC)
+
+    def wait_stopped(self, proc, on_ready: Optional[Callable[[], None]] = None) -> None:
+        """Queue the finished recording for DEVICE_PULLS; on_ready runs after the pull."""
+        if proc is None:
+            return
+        self._wait_device(proc)
+        DEVICE_PULLS.add(self.remote_parts, self.video_path, on_ready)
+
+    def stop(self):
+        """Stop and drop the device copy; used when a segment is abandoned."""
+        proc = self.request_stop()
+        if proc is not None:
+            self._wait_device(proc)
+            _adb_shell("rm -f " + " ".join(shlex.quote(p) for p in self.remote_parts))
+
+
+@dataclass
+class PullItem:
+    remote_parts: Tuple[str, ...]
+    video_path: str
+    on_pulled: Optional[Callable[[], None]] = None
+
+
+@dataclass(frozen=True)
+class PullFailure:
+    video_path: str
+    error: str
+
+
+def _remote_sizes(remote_paths: Sequence[str]) -> dict:
+    """Device file sizes keyed by basename (names are unique within REMOTE_DIR)."""
+    result = _adb_shell("stat -c '%s %n' " + " ".join(shlex.quote(p) for p in remote_paths))
+    sizes = {}
+    for line in result.stdout.splitlines():
+        size, _, name = line.strip().partition(" ")
+        if size.isdigit():
+            sizes[os.path.basename(name)] = int(size)
+    return sizes
+
+
+def _concat_parts(part_paths: Sequence[str], output_path: str) -> None:
+    root, ext = os.path.splitext(output_path)
+    part_path = f"{root}.part{ext}"
+    list_path = output_path + ".txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in part_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    cmd = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y", "-f", "concat", "-safe", "0",
+           "-i", list_path, "-c", "copy", "-movflags", "+faststart", part_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise RuntimeError(f"ffmpeg concat for {output_path} failed: {result.stderr.strip()[-500:]}")
+    os.replace(part_path, output_path)
+
+
+class DevicePullQueue:
+    """Device recordings waiting to be pulled, grouped into parallel batches."""
+
+    def __init__(self, workers: int = PULL_WORKERS, batch: int = PULL_BATCH):
+        self.workers = max(1, workers)
+        self.batch = max(1, batch)
+        self._items: List[PullItem] = []
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def add(
+        self, remote_parts: Sequence[str], video_path: str, on_pulled: Optional[Callable[[], None]] = None
+    ) -> None:
+        with self._lock:
+            self._items.append(PullItem(tuple(remote_parts), video_path, on_pulled))
+
+    def _pull_batch(self, items: List[PullItem]) -> List[PullFailure]:
+        remote_paths = [remote for item in items for remote in item.remote_parts]
+        staging = os.path.join(os.path.dirname(staged_path(items[0].video_path)) or ".", ".pull")
+        os.makedirs(staging, exist_ok=True)
+        try:
+            expected = _remote_sizes(remote_paths)
+            result = subprocess.run(
+                adb_command(_serial()) + ["pull", *remote_paths, staging],
+                capture_output=True,
+                text=True,
+                timeout=PULL_TIMEOUT_SEC,
+            )
+            pull_error = result.stderr.strip()[-300:] if result.returncode != 0 else ""
+        except subprocess.TimeoutExpired:
+            expected, pull_error = {}, f"adb pull timed out after {PULL_TIMEOUT_SEC:.0f}s"
+
+        failures: List[PullFailure] = []
+        cleared: List[str] = []
+        for item in items:
+            local_parts = [os.path.join(staging, os.path.basename(remote)) for remote in item.remote_parts]
+            try:
+                for remote, local in zip(item.remote_parts, local_parts):
+                    size = os.path.getsize(local) if os.path.exists(local) else -1
+                    device_size = expected.get(os.path.basename(remote))
+                    if device_size is None or size != device_size or size == 0:
+                        raise RuntimeError(
+                            f"{remote}: device {device_size} bytes, host {size} bytes {pull_error}".strip()
+                        )
+                produced = staged_path(item.video_path)
+                os.makedirs(os.path.dirname(produced) or ".", exist_ok=True)
+                if len(local_parts) == 1:
+                    os.replace(local_parts[0], produced)
+                else:
+                    _concat_parts(local_parts, produced)
+                cleared.extend(item.remote_parts)
+                if item.on_pulled is not None:
+                    item.on_pulled()
+            except Exception as exc:
+                failures.append(PullFailure(item.video_path, str(exc)))
+            finally:
+                for local in local_parts:
+                    if os.path.exists(local):
+                        os.remove(local)
+        if cleared:
+            _adb_shell("rm -f " + " ".join(shlex.quote(p) for p in cleared))
+        try:
+            os.rmdir(staging)
+        except OSError:
+            pass  # another batch still uses it
+        return failures
+
+    def pull_all(self) -> List[PullFailure]:
+        """Pull every queued recording; a failed item stays on the device for a manual pull."""
+        with self._lock:
+            items, self._items = self._items, []
+        if not items:
+            return []
+        batches = [items[i:i + self.batch] for i in range(0, len(items), self.batch)]
+        print(f"[PULL] {len(items)} recordings in {len(batches)} batches, {self.workers} parallel")
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pull") as pool:
+            failures = [failure for batch_failures in pool.map(self._pull_batch, batches) for failure in batch_failures]
+        print(f"[PULL] done in {time.monotonic() - started:.1f}s, {len(items) - len(failures)} ok, {len(failures)} failed")
+        return failures
+
+
+DEVICE_PULLS = DevicePullQueue()
@@ -0,0 +1,375 @@
+"""How route segments get recorded.
+
+`PerSegmentRecorder` is the original behaviour: one scrcpy process per
+record_start/record_stop pair. `ContinuousRecorder` keeps one scrcpy stream
+open for a whole route pass, stamps segment boundaries on the monotonic clock
+and cuts the segments out with ffmpeg when the pass ends.
+`PrewarmedRecorder` starts each segment's scrcpy during the preceding
+unrecorded actions and cuts the warm-up head off. Both cut frame-accurately
+at the marks (recording/stream_cut.py).
+
+All of them hand finished segments to a SegmentSink once the file exists at
+its stable path, inline or through recording/finalizer.py, so the route can
+continue as soon as scrcpy has been told to stop. abort() stops recording
+after a failure without reporting anything.
+"""
+import itertools
+import os
+import subprocess
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from recording.finalizer import Finalizer
+from recording.readiness import ReadinessProbe
+from recording.recorder import RECORDER_BACKEND, make_recorder
+from recording.remux import capture_path
+from recording.staging import STAGING_MOVER, staged_path
+from recording.scrcpy_recorder import (
+    SCRCPY_STARTUP_WAIT,
+    signal_stop,
+    spawn_record,
+    stop_record,
+    wait_stopped,
+)
+from recording.stream_cut import StreamCut, cut_stream
+
+# Record mode for multiroute: "segment" (one scrcpy per segment), "continuous" or "prewarm".
+RECORD_MODE = os.environ.get("AUTO_RECORD_MODE", "segment").strip().lower()
+# Encoder keyframe interval in continuous mode; bounds the head GOP that an accurate cut re-encodes.
+STREAM_KEYFRAME_SEC = int(os.environ.get("AUTO_STREAM_KEYFRAME_SEC", "1"))
+# Video t=0 relative to the moment the readiness probe saw the recording live (or spawn + fallback).
+STREAM_OFFSET_SEC = float(os.environ.get("AUTO_STREAM_OFFSET_SEC", "0"))
+STREAM_ANCHOR_FALLBACK_SEC = float(os.environ.get("AUTO_STREAM_ANCHOR_FALLBACK_SEC", "0.5"))
+STREAM_KEEP_RAW = os.environ.get("AUTO_STREAM_KEEP_RAW", "0") == "1"
+
+Finished = List[Tuple[int, str]]
+
+
+class SegmentSink:
+    def __init__(
+        self,
+        on_finished: Optional[Callable[[int, str], None]] = None,
+        finalizer: Optional[Finalizer] = None,
+        route: Optional[int] = None,
+        config_id: str = "",
+    ):
+        self.on_finished = on_finished
+        self.finalizer = finalizer
+        self.route = route
+        self.config_id = config_id
+
+    def finished(self, segment_index: int, video_path: str) -> None:
+        """The segment's file is complete at staged_path(video_path)."""
+        if STAGING_MOVER is not None:
+            STAGING_MOVER.submit(staged_path(video_path), video_path, lambda: self._report(segment_index, video_path))
+        else:
+            self._report(segment_index, video_path)
+
+    def _report(self, segment_index: int, video_path: str) -> None:
+        if self.on_finished is not None:
+            self.on_finished(segment_index, video_path)
+
+    def deliver(self, segment_indexes: List[int], job: Callable[[], Finished]) -> None:
+        def run() -> None:
+            for segment_index, video_path in job():
+                self.finished(segment_index, video_path)
+
+        if self.finalizer is None:
+            run()
+        else:
+            self.finalizer.submit(self.route, self.config_id, segment_indexes, run)
+
+
+class PerSegmentRecorder:
+    def __init__(self, sink: SegmentSink, settle_sec: float = 0.0):
+        self.sink = sink
+        self.settle_sec = settle_sec
+        self._recorder = None
+        self._segment_index = 0
+
+    def begin(self) -> None:
+        pass
+
+    def prepare(self) -> None:
+        pass
+
+    def start_segment(self, segment_index: int, video_path: str) -> None:
+        self.stop_segment()
+        self._recorder = make_recorder(video_path)
+        self._segment_index = segment_index
+        self._recorder.start()
+        time.sleep(self.settle_sec)
+
+    def stop_segment(self) -> None:
+        if self._recorder is None:
+            return
+        recorder, self._recorder = self._recorder, None
+        segment_index = self._segment_index
+        proc = recorder.request_stop()
+
+        def job() -> Finished:
+            # Reported through the callback: a deferred backend has the file only after its pull.
+            recorder.wait_stopped(proc, lambda: self.sink.finished(segment_index, recorder.video_path))
+            return []
+
+        self.sink.deliver([segment_index], job)
+
+    def finish(self) -> None:
+        self.stop_segment()
+
+    def abort(self) -> None:
+        if self._recorder is not None:
+            self._recorder.stop()
+            self._recorder = None
+
+
+class ScrcpyStream:
+    """One scrcpy recording process whose timeline is anchored on the monotonic clock."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.monotonic):
+        self.path = path
+        self.clock = clock
+        self.spawned: Optional[float] = None
+        self.anchor: Optional[float] = None
+        self._proc: Optional[subprocess.Popen] = None
+        self._probe: Optional[ReadinessProbe] = None
+
+    def spawn(self) -> None:
+        self._proc, self._probe = spawn_record(
+            self.path, [f"--video-codec-options=i-frame-interval={STREAM_KEYFRAME_SEC}"], self.clock
+        )
+        self.spawned = self._probe.spawned
+
+    @property
+    def live(self) -> bool:
+        return self._probe is not None and self._probe.ready_at is not None
+
+    def wait_ready(self) -> bool:
+        """Block until the readiness probe sees the recording live (or times out) and fix the anchor."""
+        live = self._probe.wait()
+        if self.anchor is None:
+            # The first muxed bytes and the log line both mark the first video packet.
+            self.anchor = self._probe.ready_at if self._probe.ready_at is not None else self._probe.log_at
+        if self.anchor is None:
+            self.anchor = self.spawned + STREAM_ANCHOR_FALLBACK_SEC
+            print(f"[WARN] {self.path}: {self._probe.describe()}; using spawn time as anchor.")
+        return live
+
+    def stream_time(self) -> float:
+        return self.clock() - self.anchor + STREAM_OFFSET_SEC
+
+    def terminate(self) -> None:
+        if self._proc is not None:
+            proc, self._proc = self._proc, None
+            stop_record(proc)
+
+    def request_stop(self) -> None:
+        if self._proc is not None:
+            signal_stop(self._proc)
+
+    def wait_stopped(self) -> None:
+        """Wait for the file to be finalized after request_stop()."""
+        if self._proc is not None:
+            proc, self._proc = self._proc, None
+            wait_stopped(proc)
+        if not os.path.exists(self.path):
+            log = list(self._probe.log)[-5:] if self._probe is not None else []
+            raise RuntimeError(f"Recording {self.path} missing. scrcpy log: {log}")
+
+    def discard(self) -> None:
+        self.terminate()
+        if os.path.exists(self.path) and not STREAM_KEEP_RAW:
+            os.remove(self.path)
+
+
+class ContinuousRecorder:
+    def __init__(self, sink: SegmentSink, raw_path: str, clock: Callable[[], float] = time.monotonic):
+        self.sink = sink
+        self.raw_path = raw_path
+        self.clock = clock
+        self.cuts: List[StreamCut] = []  # cut into the staged paths
+        self._video_paths: Dict[int, str] = {}
+        self._stream: Optional[ScrcpyStream] = None
+        self._open: Optional[Tuple[int, float, str]] = None
+
+    def begin(self) -> None:
+        self._stream = ScrcpyStream(self.raw_path, self.clock)
+        self._stream.spawn()
+        print(f"[RECORD] 连续录制 {self.raw_path}")
+        self._stream.wait_ready()
+
+    def prepare(self) -> None:
+        pass
+
+    def start_segment(self, segment_index: int, video_path: str) -> None:
+        self.stop_segment()
+        self._open = (segment_index, self._stream.stream_time(), video_path)
+
+    def stop_segment(self) -> None:
+        if self._open is not None:
+            segment_index, start, video_path = self._open
+            self.cuts.append(StreamCut(segment_index, start, self._stream.stream_time(), staged_path(video_path)))
+            self._video_paths[segment_index] = video_path
+            self._open = None
+
+    def finish(self) -> None:
+        self.stop_segment()
+        if self._stream is None:
+            return
+        stream, self._stream = self._stream, None
+        cuts = list(self.cuts)
+        video_paths = dict(self._video_paths)
+        stream.request_stop()
+
+        def job() -> Finished:
+            stream.wait_stopped()
+            cut_stream(stream.path, cuts)
+            if not STREAM_KEEP_RAW:
+                os.remove(stream.path)
+            return [(cut.segment_index, video_paths[cut.segment_index]) for cut in cuts]
+
+        self.sink.deliver([cut.segment_index for cut in cuts], job)
+
+    def abort(self) -> None:
+        """Stop the stream without cutting; the raw file stays for inspection."""
+        if self._stream is not None:
+            stream, self._stream = self._stream, None
+            stream.terminate()
+
+
+_SCRATCH_IDS = itertools.count(1)
+
+
+@dataclass
+class RecorderPoolStats:
+    hits: int = 0
+    partial_hits: int = 0
+    misses: int = 0
+    blocked_sec: float = 0.0
+    saved_sec: float = 0.0
+
+    def add(self, other: "RecorderPoolStats") -> None:
+        self.hits += other.hits
+        self.partial_hits += other.partial_hits
+        self.misses += other.misses
+        self.blocked_sec += other.blocked_sec
+        self.saved_sec += other.saved_sec
+
+    def describe(self) -> str:
+        return (
+            f"warm={self.hits} partial={self.partial_hits} cold={self.misses} "
+            f"blocked={self.blocked_sec:.2f}s saved={self.saved_sec:.2f}s"
+        )
+
+
+class PrewarmedRecorder:
+    """Starts the next segment's scrcpy ahead of its record_start.
+
+    The runner calls prepare() while no segment is recording and another one is
+    still ahead. The warm instance already records into a scratch file; at
+    record_start only the stream time is noted, and on record_stop the head
+    before that mark is dropped with a frame-accurate cut.
+    """
+
+    def __init__(
+        self,
+        sink: SegmentSink,
+        scratch_dir: str,
+        settle_sec: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.sink = sink
+        self.scratch_dir = scratch_dir
+        self.cold_cost = SCRCPY_STARTUP_WAIT + settle_sec
+        self.clock = clock
+        self.stats = RecorderPoolStats()
+        self._warm: Optional[ScrcpyStream] = None
+        self._active: Optional[Tuple[int, float, str, ScrcpyStream]] = None
+
+    def _new_stream(self) -> ScrcpyStream:
+        # Process-wide numbering: a scratch file may still be awaiting its cut on
+        # the finalizer when the next config's recorder starts warming up.
+        name = f"warm_{os.getpid()}_{next(_SCRATCH_IDS)}.mp4"
+        stream = ScrcpyStream(capture_path(os.path.join(self.scratch_dir, name)), self.clock)
+        stream.spawn()
+        return stream
+
+    def begin(self) -> None:
+        pass
+
+    def prepare(self) -> None:
+        if self._warm is None and self._active is None:
+            self._warm = self._new_stream()
+
+    def start_segment(self, segment_index: int, video_path: str) -> None:
+        self.stop_segment()
+        started = self.clock()
+        stream, self._warm = self._warm, None
+        if stream is None:
+            stream = self._new_stream()
+            self.stats.misses += 1
+        elif stream.live:
+            self.stats.hits += 1
+        else:
+            self.stats.partial_hits += 1
+        stream.wait_ready()
+        blocked = self.clock() - started
+        self.stats.blocked_sec += blocked
+        self.stats.saved_sec += max(0.0, self.cold_cost - blocked)
+        print(f"[RECORD] 开始录制 {video_path} (waited {blocked * 1000:.0f}ms)")
+        self._active = (segment_index, stream.stream_time(), video_path, stream)
+
+    def stop_segment(self) -> None:
+        if self._active is None:
+            return
+        segment_index, start, video_path, stream = self._active
+        self._active = None
+        cut = StreamCut(segment_index, start, stream.stream_time(), staged_path(video_path))
+        print("[RECORD] 停止录制")
+        stream.request_stop()
+
+        def job() -> Finished:
+            stream.wait_stopped()
+            cut_stream(stream.path, [cut])
+            if not STREAM_KEEP_RAW:
+                os.remove(stream.path)
+            return [(segment_index, video_path)]
+
+        self.sink.deliver([segment_index], job)
+
+    def finish(self) -> None:
+        self.stop_segment()
+        if self._warm is not None:
+            self._warm.discard()
+            self._warm = None
+
+    def abort(self) -> None:
+        for stream in [self._warm, self._active[3] if self._active else None]:
+            if stream is not None:
+                stream.discard()
+        self._warm = None
+        self._active = None
+
+
+def make_segment_recorder(sink: SegmentSink, raw_path: str, settle_sec: float):
+    if RECORDER_BACKEND != "scrcpy" and RECORD_MODE != "segment":
+        raise ValueError(f"AUTO_RECORD_MODE={RECORD_MODE} needs the scrcpy backend, not {RECORDER_BACKEND!r}.")
+    if RECORD_MODE == "continuous":
+        return ContinuousRecorder(sink, raw_path)
+    if RECORD_MODE == "prewarm":
+        return PrewarmedRecorder(sink, os.path.dirname(raw_path), settle_sec)
+    if RECORD_MODE == "segment":
+        return PerSegmentRecorder(sink, settle_sec)
+    raise ValueError(f"Unknown AUTO_RECORD_MODE={RECORD_MODE!r}. Use segment, continuous or prewarm.")
+
+
+def record_start_cost(settle_sec: float) -> float:
+    """Blocking time of one record_start marker, for scheduling and route compilation."""
+    if RECORD_MODE != "segment":
+        return 0.0
+    if RECORDER_BACKEND == "screenrecord":
+        from recording.screenrecord_recorder import STARTUP_WAIT_SEC
+
+        return STARTUP_WAIT_SEC + settle_sec
+    return SCRCPY_STARTUP_WAIT + settle_sec
@@ -0,0 +1,117 @@
+"""Fast local staging for recordings whose VIDEO_BASE is on a slow drive.
+
+With AUTO_STAGING_DIR set, every recorder writes its finished file (and its
+raw/scratch captures) below that directory instead of VIDEO_BASE. STAGING_MOVER
+copies each finished file to its segment_video_path on a few background
+threads, compares SHA-256 of both copies, renames it into place and deletes the
+staged copy. multiroute waits for free staging space before each config and
+flushes the mover before validate_expected_videos.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+STAGING_DIR = os.environ.get("AUTO_STAGING_DIR", "").strip()
+STAGING_MOVERS = int(os.environ.get("AUTO_STAGING_MOVERS", "2"))
+STAGING_MIN_FREE_MB = float(os.environ.get("AUTO_STAGING_MIN_FREE_MB", "4096"))
+STAGING_MOVE_ATTEMPTS = int(os.environ.get("AUTO_STAGING_MOVE_ATTEMPTS", "2"))
+_HASH_CHUNK = 4 * 1024 * 1024
+
+
+def staged_path(video_path: str) -> str:
+    """Where a file destined for video_path is produced; video_path itself without staging."""
+    if not STAGING_DIR:
+        return video_path
+    key = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(STAGING_DIR, f"{key}_{os.path.basename(video_path)}")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class MoveFailure:
+    video_path: str
+    error: str
+
+
+class StagingMover:
+    def __init__(self, staging_dir: str, workers: int = STAGING_MOVERS, min_free_mb: float = STAGING_MIN_FREE_MB):
+        self.staging_dir = staging_dir
+        self.min_free_bytes = min_free_mb * 1024 * 1024
+        os.makedirs(staging_dir, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="stage-move")
+        self._lock = threading.Lock()
+        self._moves: List[Tuple[str, Future]] = []
+
+    def _move(self, staged: str, video_path: str, on_done: Optional[Callable[[], None]]) -> None:
+        os.makedirs(os.path.dirname(video_path) or ".", exist_ok=True)
+        root, ext = os.path.splitext(video_path)
+        part_path = f"{root}.part{ext}"
+        expected = file_sha256(staged)
+        for attempt in range(1, STAGING_MOVE_ATTEMPTS + 1):
+            shutil.copyfile(staged, part_path)
+            actual = file_sha256(part_path)
+            if actual == expected:
+                os.replace(part_path, video_path)
+                os.remove(staged)
+                if on_done is not None:
+                    on_done()
+                return
+            os.remove(part_path)
+            print(f"[STAGING][WARN] checksum mismatch for {video_path} (attempt {attempt})")
+        raise RuntimeError(f"checksum mismatch after {STAGING_MOVE_ATTEMPTS} copies; staged copy kept at {staged}")
+
+    def submit(self, staged: str, video_path: str, on_done: Optional[Callable[[], None]] = None) -> None:
+        future = self._pool.submit(self._move, staged, video_path, on_done)
+        with self._lock:
+            self._moves.append((video_path, future))
+
+    @property
+    def outstanding(self) -> int:
+        with self._lock:
+            return sum(1 for _, future in self._moves if not future.done())
+
+    def free_bytes(self) -> int:
+        return shutil.disk_usage(self.staging_dir).free
+
+    def wait_for_space(self, poll_sec: float = 0.5) -> float:
+        """Back-pressure: block while staging is short on space and moves can still free some.
+
+        Returns the seconds spent waiting.
+        """
+        started = time.monotonic()
+        while self.free_bytes() < self.min_free_bytes:
+            if self.outstanding == 0:
+                print(
+                    f"[STAGING][WARN] {self.staging_dir} has {self.free_bytes() / 2**20:.0f} MB free "
+                    f"(< AUTO_STAGING_MIN_FREE_MB) with nothing left to move; continuing."
+                )
+                break
+            time.sleep(poll_sec)
+        return time.monotonic() - started
+
+    def flush(self) -> List[MoveFailure]:
+        """Barrier: wait for every submitted move and return the failed ones."""
+        with self._lock:
+            moves, self._moves = self._moves, []
+        failures: List[MoveFailure] = []
+        for video_path, future in moves:
+            try:
+                future.result()
+            except Exception as exc:
+                failures.append(MoveFailure(video_path, str(exc)))
+        return failures
+
+
+STAGING_MOVER = StagingMover(STAGING_DIR) if STAGING_DIR else None
@@ -0,0 +1,233 @@
+"""Cut segments out of one continuous recording at monotonic-clock marks.
+
+Stream copy can only start on a keyframe. With AUTO_STREAM_CUT=accurate
+(default) a cut whose start falls between keyframes re-encodes just the head,
+from the mark to the next keyframe, and stream-copies the rest; both parts go
+through MPEG-TS (parameter sets in-band) and are joined without re-encoding.
+The segment starts on the exact frame of the mark. AUTO_STREAM_CUT=copy keeps
+the plain stream copy, which starts up to one keyframe interval early.
+"""
+import os
+import subprocess
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+FFMPEG_BIN = os.environ.get("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.environ.get("FFPROBE_BIN", "ffprobe")
+STREAM_CUT_MODE = os.environ.get("AUTO_STREAM_CUT", "accurate").strip().lower()
+if STREAM_CUT_MODE not in ("accurate", "copy"):
+    raise ValueError(f"Unknown AUTO_STREAM_CUT={STREAM_CUT_MODE!r}. Use accurate or copy.")
+# Quality of the re-encoded head GOP.
+STREAM_CUT_CRF = os.environ.get("AUTO_STREAM_CUT_CRF", "18")
+STREAM_CUT_PRESET = os.environ.get("AUTO_STREAM_CUT_PRESET", "veryfast")
+# A mark this close to a keyframe counts as on it.
+_KEYFRAME_TOLERANCE_SEC = 0.001
+# codec_name -> (encoder for the head, bitstream filter to Annex B for MPEG-TS)
+_HEAD_ENCODERS = {
+    "h264": ("libx264", "h264_mp4toannexb"),
+    "hevc": ("libx265", "hevc_mp4toannexb"),
+}
+
+
+@dataclass(frozen=True)
+class StreamCut:
+    segment_index: int
+    start: float  # seconds on the stream timeline
+    stop: float
+    video_path: str
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.stop - self.start)
+
+
+def _probe(args: Sequence[str]) -> str:
+    result = subprocess.run([FFPROBE_BIN, "-v", "error", *args], capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {result.stderr.decode(errors='replace').strip()[-300:]}")
+    return result.stdout.decode()
+
+
+def keyframe_times(path: str) -> List[float]:
+    output = _probe(
+        ["-select_streams", "v:0", "-skip_frame", "nokey", "-show_entries", "frame=pts_time", "-of", "csv=p=0", path]
+    )
+    times = []
+    for line in output.splitlines():
+        value = line.strip().rstrip(",")
+        if value and value != "N/A":
+            times.append(float(value))
+    return sorted(times)
+
+
+def probe_video_codec(path: str) -> str:
+    return _probe(["-select_streams", "v:0", "-show_entries", "stream=codec_name", "-of", "csv=p=0", path]).strip()
+
+
+def head_end(cut: StreamCut, keyframes: Sequence[float]) -> Optional[float]:
+    """First keyframe after the cut start, or None when the cut already starts on one.
+
+    Returns cut.stop when no keyframe falls inside the cut (the whole cut is re-encoded).
+    """
+    start = max(0.0, cut.start)
+    if start <= _KEYFRAME_TOLERANCE_SEC or any(abs(k - start) <= _KEYFRAME_TOLERANCE_SEC for k in keyframes):
+        return None
+    later = [k for k in keyframes if start < k < cut.stop]
+    return later[0] if later else cut.stop
+
+
+def cut_command(source_path: str, cut: StreamCut, output_path: str) -> List[str]:
+    # -ss before -i with stream copy starts at the keyframe at or before `start`.
+    return [
+        FFMPEG_BIN,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-ss",
+        f"{max(0.0, cut.start):.3f}",
+        "-i",
+        source_path,
+        "-t",
+        f"{cut.duration:.3f}",
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        "-avoid_negative_ts",
+        "make_zero",
+        "-movflags",
+        "+faststart",
+        output_path,
+    ]
+
+
+def encode_command(source_path: str, start: float, duration: float, output_path: str, codec: str) -> List[str]:
+    """Re-encode [start, start + duration); -ss before -i with decoding is frame-accurate."""
+    encoder, bsf = _HEAD_ENCODERS.get(codec, ("libx264", None))
+    cmd = [
+        FFMPEG_BIN,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-ss",
+        f"{max(0.0, start):.3f}",
+        "-i",
+        source_path,
+        "-t",
+        f"{duration:.3f}",
+        "-map",
+        "0:v:0",
+        "-fps_mode",
+        "passthrough",
+        "-c:v",
+        encoder,
+        "-preset",
+        STREAM_CUT_PRESET,
+        "-crf",
+        STREAM_CUT_CRF,
+    ]
+    if output_path.endswith(".ts"):
+        cmd += ["-bsf:v", bsf, "-f", "mpegts"]
+    else:
+        cmd += ["-movflags", "+faststart"]
+    return cmd + [output_path]
+
+
+def tail_command(source_path: str, start: float, duration: float, output_path: str, codec: str) -> List[str]:
+    """Stream-copy from the keyframe at `start` into MPEG-TS."""
+    _, bsf = _HEAD_ENCODERS[codec]
+    return [
+        FFMPEG_BIN,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        # Just past the keyframe so rounding never seeks back to the previous one.
+        "-ss",
+        f"{start + _KEYFRAME_TOLERANCE_SEC:.3f}",
+        "-i",
+        source_path,
+        "-t",
+        f"{duration:.3f}",
+        "-map",
+        "0:v:0",
+        "-c",
+        "copy",
+        "-bsf:v",
+        bsf,
+        "-f",
+        "mpegts",
+        output_path,
+    ]
+
+
+def concat_command(part_paths: Sequence[str], output_path: str) -> List[str]:
+    return [
+        FFMPEG_BIN,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        "concat:" + "|".join(part_paths),
+        "-c",
+        "copy",
+        "-movflags",
+        "+faststart",
+        output_path,
+    ]
+
+
+def accurate_cut_commands(
+    source_path: str, cut: StreamCut, output_path: str, keyframes: Sequence[float], codec: str
+) -> List[List[str]]:
+    """ffmpeg commands that write `cut` starting on the exact frame at cut.start."""
+    split = head_end(cut, keyframes)
+    if split is None:
+        return [cut_command(source_path, cut, output_path)]
+    if split >= cut.stop or codec not in _HEAD_ENCODERS:
+        return [encode_command(source_path, cut.start, cut.duration, output_path, codec)]
+    root, _ = os.path.splitext(output_path)
+    head_path, tail_path = f"{root}.head.ts", f"{root}.tail.ts"
+    return [
+        encode_command(source_path, cut.start, split - max(0.0, cut.start), head_path, codec),
+        tail_command(source_path, split, cut.stop - split, tail_path, codec),
+        concat_command([head_path, tail_path], output_path),
+    ]
+
+
+def cut_stream(source_path: str, cuts: Sequence[StreamCut], mode: str = STREAM_CUT_MODE) -> List[str]:
+    """Cut every cut out of source_path (see module doc for `mode`). Outputs appear atomically at video_path."""
+    keyframes: Sequence[float] = ()
+    codec = ""
+    if mode == "accurate" and cuts:
+        keyframes = keyframe_times(source_path)
+        codec = probe_video_codec(source_path)
+    written: List[str] = []
+    for cut in cuts:
+        os.makedirs(os.path.dirname(cut.video_path) or ".", exist_ok=True)
+        root, ext = os.path.splitext(cut.video_path)
+        part_path = f"{root}.part{ext}"
+        if mode == "accurate":
+            commands = accurate_cut_commands(source_path, cut, part_path, keyframes, codec)
+        else:
+            commands = [cut_command(source_path, cut, part_path)]
+        scratch = [f"{root}.part.head.ts", f"{root}.part.tail.ts"]
+        try:
+            for cmd in commands:
+                result = subprocess.run(cmd, capture_output=True, text=True)
+                if result.returncode != 0:
+                    if os.path.exists(part_path):
+                        os.remove(part_path)
+                    raise RuntimeError(
+                        f"ffmpeg cut s{cut.segment_index:02d} of {source_path} failed: {result.stderr.strip()[-500:]}"
+                    )
+        finally:
+            for path in scratch:
+                if os.path.exists(path):
+                    os.remove(path)
+        os.replace(part_path, cut.video_path)
+        written.append(cut.video_path)
+    return written
@@ -0,0 +1,114 @@
+"""Idle lead-in / tail detection and keyframe-aware trimming of finished segments.
+
+ffmpeg decodes each segment at a low rate into small 8-bit gray frames
+(ANALYSIS_FPS, ANALYSIS_SIZE); the motion of a frame is its mean absolute
+difference to the previous one. The active span runs from the first to the
+last frame whose motion reaches the threshold, widened by a pad. Stream copy
+can only start on a keyframe, so the start snaps back to the keyframe at or
+before it; the end is cut at a packet boundary.
+"""
+import os
+import subprocess
+from dataclasses import dataclass, replace
+from typing import List, Optional, Sequence, Tuple
+
+from recording.stream_cut import FFMPEG_BIN, FFPROBE_BIN, StreamCut, cut_stream, keyframe_times
+
+ANALYSIS_FPS = float(os.environ.get("AUTO_TRIM_ANALYSIS_FPS", "10"))
+ANALYSIS_SIZE = (64, 36)
+MOTION_THRESHOLD = float(os.environ.get("AUTO_TRIM_MOTION_THRESHOLD", "2.0"))
+PAD_SEC = float(os.environ.get("AUTO_TRIM_PAD_SEC", "0.2"))
+
+
+@dataclass(frozen=True)
+class TrimDecision:
+    path: str
+    duration: float
+    active_start: float  # first/last motion, padded
+    active_end: float
+    start: float  # keyframe-snapped cut points
+    end: float
+
+    @property
+    def length(self) -> float:
+        return max(0.0, self.end - self.start)
+
+    def with_length(self, length: float) -> "TrimDecision":
+        """Same start, end moved so the cut lasts `length` seconds (never past the source)."""
+        return replace(self, end=min(self.duration, self.start + length))
+
+
+def _run(cmd: Sequence[str]) -> subprocess.CompletedProcess:
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(cmd[0])} failed: {result.stderr.decode(errors='replace').strip()[-300:]}")
+    return result
+
+
+def probe_duration(path: str) -> float:
+    result = _run([FFPROBE_BIN, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path])
+    return float(result.stdout.decode().strip())
+
+
+def decode_gray_frames(path: str, fps: float = ANALYSIS_FPS, size: Tuple[int, int] = ANALYSIS_SIZE) -> List[bytes]:
+    width, height = size
+    result = _run(
+        [
+            FFMPEG_BIN,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            path,
+            "-an",
+            "-vf",
+            f"fps={fps},scale={width}:{height},format=gray",
+            "-f",
+            "rawvideo",
+            "-",
+        ]
+    )
+    frame_bytes = width * height
+    data = result.stdout
+    return [data[i:i + frame_bytes] for i in range(0, len(data) - frame_bytes + 1, frame_bytes)]
+
+
+def motion_profile(frames: Sequence[bytes]) -> List[float]:
+    """motion[i] = mean |frame[i] - frame[i-1]|; motion[0] = 0."""
+    motion = [0.0]
+    for previous, current in zip(frames, frames[1:]):
+        motion.append(sum(abs(a - b) for a, b in zip(current, previous)) / len(current))
+    return motion
+
+
+def active_span(
+    motion: Sequence[float], fps: float, duration: float, threshold: float = MOTION_THRESHOLD, pad: float = PAD_SEC
+) -> Tuple[float, float]:
+    """(start, end) in seconds around the frames with motion >= threshold; the whole clip if none."""
+    active = [i for i, value in enumerate(motion) if value >= threshold]
+    if not active:
+        return 0.0, duration
+    # Motion of frame i happened between sample i-1 and sample i.
+    start = (active[0] - 1) / fps - pad
+    end = active[-1] / fps + pad
+    return max(0.0, start), min(duration, end)
+
+
+def snap_to_keyframe(t: float, keyframes: Sequence[float]) -> float:
+    earlier = [k for k in keyframes if k <= t + 1e-6]
+    return earlier[-1] if earlier else 0.0
+
+
+def analyze(path: str, threshold: float = MOTION_THRESHOLD, pad: float = PAD_SEC) -> TrimDecision:
+    duration = probe_duration(path)
+    motion = motion_profile(decode_gray_frames(path))
+    active_start, active_end = active_span(motion, ANALYSIS_FPS, duration, threshold, pad)
+    start = snap_to_keyframe(active_start, keyframe_times(path))
+    return TrimDecision(path, duration, active_start, active_end, start, max(start, active_end))
+
+
+def trim(decision: TrimDecision, output_path: Optional[str] = None) -> str:
+    """Stream-copy the decided span to output_path (default: replace the source atomically)."""
+    output_path = output_path or decision.path
+    cut_stream(decision.path, [StreamCut(0, decision.start, decision.end, output_path)], mode="copy")
+    return output_path
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from actions.sendevent_transport import SendeventTransport, TouchPanel
+from actions.transport import FakeTransport, InputTransport, OneShotTransport, PersistentShellTransport, get_transport
+from tools.fake_adb import fake_adb_command
+
+
+def build_transport(kind: str, serial: Optional[str], adb_cmd: Optional[Sequence[str]]) -> InputTransport:
+    if kind == "oneshot":
+        return OneShotTransport(serial=serial, adb_cmd=adb_cmd)
+    if kind == "persistent":
+        return PersistentShellTransport(serial=serial, adb_cmd=adb_cmd, fallback=False)
+    if kind == "sendevent":
+        shell = PersistentShellTransport(serial=serial, adb_cmd=adb_cmd, fallback=False)
+        # Offline runs need a fixed panel; on a device leave it to probe_touch_panel via prepare().
+        panel = TouchPanel("/dev/input/event0", 1279, 2799, 2800, 1280) if adb_cmd else None
+        transport = SendeventTransport(serial=serial, shell=shell, panel=panel, adb_cmd=adb_cmd)
+        if panel is None:
+            transport.prepare({}, (int(os.environ.get("AUTO_SCREEN_W", "2848")), int(os.environ.get("AUTO_SCREEN_H", "1276"))))
+        return transport
+    if kind == "scrcpy":
+        from actions.scrcpy_transport import FakeScrcpyServer, ScrcpyControlTransport
+
+        # Offline runs talk to an in-process control socket instead of the device's scrcpy server.
+        address = FakeScrcpyServer().address if adb_cmd else None
+        screen_wh = (int(os.environ.get("AUTO_SCREEN_W", "2848")), int(os.environ.get("AUTO_SCREEN_H", "1276")))
+        return ScrcpyControlTransport(serial=serial, adb_cmd=adb_cmd, connect_address=address, screen_wh=screen_wh)
+    if kind == FakeTransport.kind:
+        return FakeTransport(serial=serial)
+    if adb_cmd:
+        raise ValueError(f"Transport kind {kind!r} has no offline setup")
+    return get_transport(kind, serial)
+
+
+def _measure(transport: InputTransport, count: int, x: int, y: int) -> List[float]:
+    samples: List[float] = []
+    for _ in range(count):
+        start = time.perf_counter()
+        transport.tap(x, y)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return samples
+
+
+def _print_stats(kind: str, samples: Sequence[float]) -> None:
+    ordered = sorted(samples)
+    p90 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+    print(
+        f"[BENCH] {kind:<10} n={len(ordered)} "
+        f"p50={statistics.median(ordered):.1f}ms p90={p90:.1f}ms max={ordered[-1]:.1f}ms"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure per-tap dispatch latency of the adb input transports.")
+    parser.add_argument("--kinds", default="oneshot,persistent,sendevent", help="Comma-separated transport kinds.")
+    parser.add_argument("--count", type=int, default=20, help="Taps per transport. Default: 20")
+    parser.add_argument("--serial", default=None, help="adb device serial.")
+    parser.add_argument("--x", type=int, default=1, help="Tap x. Default: 1")
+    parser.add_argument("--y", type=int, default=1, help="Tap y. Default: 1")
+    parser.add_argument("--fake", action="store_true", help="Use tools/fake_adb.py instead of a real device.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    adb_cmd = fake_adb_command() if args.fake else None
+    for kind in [item.strip() for item in args.kinds.split(",") if item.strip()]:
+        transport = build_transport(kind, args.serial, adb_cmd)
+        try:
+            transport.tap(args.x, args.y)
+            _print_stats(kind, _measure(transport, args.count, args.x, args.y))
+        finally:
+            transport.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from actions.dispatch_latency import (
+    DISPATCH_MIN_GAP_SEC,
+    DispatchLatency,
+    LatencyStats,
+    load_profile,
+    measure,
+    profile_path,
+    save_latency,
+)
+from actions.global_actions import build_actions
+from actions.transport import DEFAULT_TRANSPORT, InputTransport, get_transport
+from engine.scheduler import STEP_DELAY
+from tools.bench_transport import build_transport
+from tools.fake_adb import fake_adb_command
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Measure tap/swipe dispatch overhead of the active input transport and store it in "
+            "mapping/<device>.dispatch.json for AUTO_DISPATCH_COMPENSATION=1."
+        )
+    )
+    parser.add_argument("--mapping", required=True, help="Mapping module of the device, e.g. mapping.oppo_findx9pro.")
+    parser.add_argument(
+        "--transport",
+        default=DEFAULT_TRANSPORT,
+        help=f"Input transport kind. Default: AUTO_INPUT_TRANSPORT ({DEFAULT_TRANSPORT})",
+    )
+    parser.add_argument("--serial", default=os.environ.get("ANDROID_SERIAL"), help="adb serial.")
+    parser.add_argument("--count", type=int, default=30, help="Taps and swipes to measure. Default: 30")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured taps first (session start-up). Default: 3")
+    parser.add_argument("--swipe-ms", type=int, default=100, help="Duration of the measured swipes. Default: 100")
+    parser.add_argument("--x", type=int, default=1, help="Tap/swipe x; pick a spot without UI. Default: 1")
+    parser.add_argument("--y", type=int, default=1, help="Tap/swipe y. Default: 1")
+    parser.add_argument("--fake", action="store_true", help="Use tools/fake_adb.py instead of a real device.")
+    parser.add_argument("--apply", action="store_true", help="Write the profile. Without it only prints the result.")
+    return parser.parse_args()
+
+
+def prepare_transport(transport: InputTransport, mapping_module: str) -> None:
+    """Set the transport up for the device like its actions module does: mapped points, target resolution."""
+    actions = build_actions(
+        mapping_module=mapping_module,
+        transport=transport,
+        screen_waiter=lambda state, fallback_sec: False,
+        prepare_transport=False,
+    )
+    transport.prepare(actions["POINTS"], actions["TARGET_RESOLUTION"])
+    width, height = actions["TARGET_RESOLUTION"]
+    print(f"[CALIBRATE] prepared {transport.kind} for {width}x{height}")
+
+
+def main() -> int:
+    args = parse_args()
+    path = profile_path(args.mapping)
+    if args.fake:
+        transport = build_transport(args.transport, args.serial, fake_adb_command())
+    else:
+        transport = get_transport(args.transport, args.serial)
+    print(f"[CALIBRATE] {args.mapping} transport={transport.kind} serial={args.serial or '<adb default>'}")
+    try:
+        prepare_transport(transport, args.mapping)
+        for _ in range(args.warmup):
+            transport.tap(args.x, args.y)
+        samples = measure(transport, args.count, args.x, args.y, args.swipe_ms)
+    finally:
+        transport.close()
+
+    latency = DispatchLatency(
+        transport=transport.kind,
+        tap=LatencyStats.from_samples(samples["tap"]),
+        swipe=LatencyStats.from_samples(samples["swipe"]),
+        swipe_ms=args.swipe_ms,
+        measured=time.strftime("%Y-%m-%dT%H:%M:%S"),
+    )
+    print(f"[CALIBRATE] tap   {latency.tap.describe()}")
+    print(f"[CALIBRATE] swipe {latency.swipe.describe()} (beyond {args.swipe_ms}ms gesture)")
+    for label, kinds in (("tap step", ["tap"]), ("move step", ["swipe"]), ("run step", ["tap", "swipe"])):
+        overhead = sum(latency.overhead_sec(kind) for kind in kinds)
+        gap = max(min(DISPATCH_MIN_GAP_SEC, STEP_DELAY), STEP_DELAY - overhead)
+        print(f"[CALIBRATE] {label}: STEP_DELAY {STEP_DELAY:.2f}s -> {gap:.2f}s")
+
+    previous = load_profile(path).get(transport.kind)
+    if previous is not None:
+        print(f"[INFO] Replacing {transport.kind} calibration of {previous.measured}: tap p50={previous.tap.p50_ms:.1f}ms")
+    if not args.apply:
+        print(f"[DRY-RUN] Would write {path}. Add --apply to save it.")
+        return 0
+    save_latency(path, latency)
+    print(f"[DONE] {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Offline checks of actions/screen_state.py against small raw screencap fixtures.
+
+Runs without a device: frames come from tools/fixtures/screen_state/*.raw
+(`adb exec-out screencap` layout), and ScreenStateWaiter gets a fake capture
+and a fake clock, so the timeout / fallback paths take no real time.
+`--write-fixtures` regenerates the fixture frames.
+"""
+from __future__ import annotations
+
+import argparse
+import struct
+import sys
+from pathlib import Path
+from typing import Callable, List, Sequence
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from actions.screen_state import (
+    Frame,
+    ScreenStateWaiter,
+    downsample,
+    load_frame,
+    match_score,
+    parse_screencap,
+    template_from_frame,
+)
+from engine.action_table import TELEPORT_SETTLE_SEC, build_action_table
+
+FIXTURE_DIR = PROJECT_ROOT / "tools" / "fixtures" / "screen_state"
+FIXTURE_W, FIXTURE_H = 32, 18
+
+
+def _raw(width: int, height: int, pixel_format: int, rgb: Callable[[int, int], Sequence[int]], color_space: bool) -> bytes:
+    header = struct.pack("<III", width, height, pixel_format) + (struct.pack("<I", 0) if color_space else b"")
+    pixels = bytearray()
+    for y in range(height):
+        for x in range(width):
+            r, g, b = rgb(x, y)
+            # Format 5 is BGRA, 1 and 2 are RGBA/RGBX.
+            pixels += bytes((b, g, r, 255) if pixel_format == 5 else (r, g, b, 255))
+    return header + bytes(pixels)
+
+
+def fixture_frames() -> dict:
+    """name -> raw bytes; one per header layout / pixel format the parser accepts."""
+    return {
+        # Dark map with a bright close button in the top-right corner.
+        "map_open.raw": _raw(
+            FIXTURE_W, FIXTURE_H, 1, lambda x, y: (240, 240, 240) if x >= 24 and y < 6 else (30, 40, 50), False
+        ),
+        # Horizontal gradient, 16-byte header (with colour space).
+        "loaded.raw": _raw(FIXTURE_W, FIXTURE_H, 1, lambda x, y: (x * 8, x * 8, x * 8), True),
+        # Uniform loading screen, BGRA.
+        "loading.raw": _raw(FIXTURE_W, FIXTURE_H, 5, lambda x, y: (200, 180, 40), False),
+    }
+
+
+def write_fixtures() -> None:
+    FIXTURE_DIR.mkdir(parents=True, exist_ok=True)
+    for name, data in fixture_frames().items():
+        (FIXTURE_DIR / name).write_bytes(data)
+        print(f"[DONE] {FIXTURE_DIR / name} ({len(data)} bytes)")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: List[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class Checks:
+    def __init__(self):
+        self.failures = 0
+
+    def expect(self, name: str, ok: bool, detail: str = "") -> None:
+        print(f"[{'OK' if ok else 'FAIL'}] {name}" + (f": {detail}" if detail else ""))
+        if not ok:
+            self.failures += 1
+
+    def raises(self, name: str, fn: Callable[[], object], error: type) -> None:
+        try:
+            fn()
+        except error as exc:
+            self.expect(name, True, str(exc))
+        else:
+            self.expect(name, False, f"no {error.__name__}")
+
+
+def check_parse(checks: Checks, frames: dict) -> None:
+    map_open, loaded, loading = frames["map_open.raw"], frames["loaded.raw"], frames["loading.raw"]
+    checks.expect(
+        "parse_screencap 12-byte header",
+        (map_open.width, map_open.height, map_open.pixel_format) == (FIXTURE_W, FIXTURE_H, 1),
+    )
+    checks.expect("parse_screencap 16-byte header", len(loaded.pixels) == FIXTURE_W * FIXTURE_H * 4)
+    checks.expect("parse_screencap BGRA", loading.pixel_format == 5)
+    raw = (FIXTURE_DIR / "map_open.raw").read_bytes()
+    checks.raises("parse_screencap short", lambda: parse_screencap(raw[:8]), ValueError)
+    checks.raises("parse_screencap truncated", lambda: parse_screencap(raw[:-4]), ValueError)
+    checks.raises(
+        "parse_screencap unknown format", lambda: parse_screencap(struct.pack("<III", 1, 1, 4) + b"\0" * 4), ValueError
+    )
+
+
+def check_downsample(checks: Checks, frames: dict) -> None:
+    map_open, loaded, loading = frames["map_open.raw"], frames["loaded.raw"], frames["loading.raw"]
+    corner = downsample(map_open, (0.75, 0.0, 1.0, 1 / 3), (4, 3))
+    checks.expect("downsample region", set(corner) == {240}, f"{sorted(set(corner))}")
+    background = downsample(map_open, (0.0, 0.5, 0.5, 1.0), (4, 3))
+    checks.expect("downsample gray weights", set(background) == {(30 * 77 + 40 * 150 + 50 * 29) >> 8})
+    # BGRA is read back as the same RGB it was written from.
+    checks.expect("downsample BGRA", set(downsample(loading, size=(2, 2))) == {(200 * 77 + 180 * 150 + 40 * 29) >> 8})
+    row = downsample(loaded, size=(4, 1))
+    checks.expect("downsample cell centres", list(row) == [32, 96, 160, 224], f"{list(row)}")
+
+
+def check_match(checks: Checks, frames: dict) -> None:
+    map_open, loading = frames["map_open.raw"], frames["loading.raw"]
+    template = template_from_frame(map_open, "map_open", (0.5, 0.0, 1.0, 0.5))
+    checks.expect("match_score identical", match_score(map_open, template) == 0.0)
+    score = match_score(loading, template)
+    checks.expect("match_score different", score > template.threshold, f"{score:.1f}")
+
+
+def _waiter(frames: dict, captures: list, timeout_sec: float = 2.0) -> tuple:
+    clock = FakeClock()
+    templates = {"loaded": [template_from_frame(frames["loaded.raw"], "loaded")]}
+
+    def capture() -> Frame:
+        item = captures.pop(0) if len(captures) > 1 else captures[0]
+        if isinstance(item, Exception):
+            raise item
+        clock.now += 0.05  # screencap round trip
+        return frames[item]
+
+    return ScreenStateWaiter(templates, capture, timeout_sec, 0.2, clock.sleep, clock), clock
+
+
+def check_waiter(checks: Checks, frames: dict) -> None:
+    waiter, clock = _waiter(frames, ["loading.raw", "loading.raw", "loaded.raw"])
+    checks.expect("waiter match", waiter("loaded", 5.0) is True and abs(clock.now - 0.45) < 1e-9, f"t={clock.now:.2f}s")
+
+    waiter, clock = _waiter(frames, ["loading.raw"])
+    reached = waiter("loaded", 1.0)
+    checks.expect(
+        "waiter timeout",
+        reached is False and waiter.stats["loaded"].timeouts == 1 and 2.0 <= clock.now < 2.3,
+        f"t={clock.now:.2f}s",
+    )
+
+    waiter, clock = _waiter(frames, ["loading.raw"])
+    reached = waiter("loaded", 4.0)
+    checks.expect(
+        "waiter timeout covers fallback",
+        reached is False and 4.0 <= clock.now < 4.3,
+        f"t={clock.now:.2f}s",
+    )
+
+    waiter, clock = _waiter(frames, ["loaded.raw"])
+    reached = waiter("map_open", 1.0)
+    checks.expect(
+        "waiter fallback without template",
+        reached is False and clock.sleeps == [1.0] and waiter.stats["map_open"].fallbacks == 1,
+    )
+
+    waiter, clock = _waiter(frames, ["loading.raw", RuntimeError("screencap failed: device offline")])
+    reached = waiter("loaded", 3.0)
+    checks.expect(
+        "waiter capture failure",
+        reached is False and abs(clock.now - 3.0) < 1e-9 and waiter.stats["loaded"].fallbacks == 1,
+        f"t={clock.now:.2f}s",
+    )
+
+
+def check_teleport_settle(checks: Checks) -> None:
+    for matched in (True, False):
+        clock = FakeClock()
+        waits: List[str] = []
+
+        def wait_for_screen(state: str, fallback_sec: float) -> bool:
+            waits.append(state)
+            if not matched:
+                clock.sleep(fallback_sec)
+            return matched
+
+        actions = {name: (lambda *args: None) for name in ("open_map", "tap", "confirm_teleport")}
+        actions["wait_for_screen"] = wait_for_screen
+        table = build_action_table(
+            {**actions, **{name: None for name in ("move", "walk", "climb", "swim", "run", "dash", "glide", "sleep")}},
+            sleep=clock.sleep,
+        )
+        table["teleport"]((100, 200))
+        expected = 1.0 + (TELEPORT_SETTLE_SEC if matched else 1.0 + 3.0)
+        checks.expect(
+            f"teleport settle ({'state matched' if matched else 'fallback sleeps'})",
+            abs(clock.now - expected) < 1e-9,
+            f"t={clock.now:.2f}s waits={waits}",
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline checks of the screen-state waiter on fixture frames.")
+    parser.add_argument("--write-fixtures", action="store_true", help=f"Regenerate the frames in {FIXTURE_DIR}.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.write_fixtures:
+        write_fixtures()
+        return 0
+    frames = {name: load_frame(str(FIXTURE_DIR / name)) for name in fixture_frames()}
+    checks = Checks()
+    check_parse(checks, frames)
+    check_downsample(checks, frames)
+    check_match(checks, frames)
+    check_waiter(checks, frames)
+    check_teleport_settle(checks)
+    print(f"[SUMMARY] {checks.failures} failure(s)")
+    return 1 if checks.failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Offline stand-in for `adb [-s SERIAL] shell [COMMAND]` and `adb exec-in COMMAND`.
+
+One-shot calls pay FAKE_ADB_SPAWN_MS (host process + adb server round trip);
+commands written into an interactive shell skip it. `input` always pays
+FAKE_ADB_INPUT_MS for the device-side app_process start.
+Swipes additionally take duration * FAKE_ADB_TIME_SCALE, `sendevent` costs
+FAKE_ADB_SENDEVENT_MS. Heredoc uploads (`cat > f <<'EOF'`) and `sh f` are kept
+in memory for the sendevent backend. `exec-in "cat > /dev/input/eventN"` reads
+binary input_event structs from stdin (FAKE_ADB_EVENT_SIZE bytes each) and logs
+one "event <type> <code> <value>" line per event. Every executed command is
+appended to FAKE_ADB_LOG as "<monotonic> <serial> <command>" when set.
+"""
+import os
+import re
+import struct
+import sys
+import time
+from typing import Dict, List, Optional
+
+SPAWN_MS = float(os.environ.get("FAKE_ADB_SPAWN_MS", "60"))
+INPUT_MS = float(os.environ.get("FAKE_ADB_INPUT_MS", "150"))
+TIME_SCALE = float(os.environ.get("FAKE_ADB_TIME_SCALE", "0"))
+SENDEVENT_MS = float(os.environ.get("FAKE_ADB_SENDEVENT_MS", "0.5"))
+EVENT_SIZE = int(os.environ.get("FAKE_ADB_EVENT_SIZE", "24"))
+LOG_PATH = os.environ.get("FAKE_ADB_LOG", "")
+
+_HEREDOC = re.compile(r"^cat > (\S+) <<'(\w+)'$")
+_FILES: Dict[str, List[str]] = {}
+
+
+def fake_adb_command() -> List[str]:
+    return [sys.executable, os.path.abspath(__file__)]
+
+
+def _log(serial: Optional[str], command: str) -> None:
+    if not LOG_PATH:
+        return
+    with open(LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(f"{time.monotonic():.6f} {serial or '-'} {command}\n")
+
+
+def _run_one(serial: Optional[str], command: str) -> Optional[str]:
+    parts = command.split()
+    if not parts:
+        return None
+    _log(serial, command)
+    if parts[:2] == ["getprop", "ro.product.cpu.abi"]:
+        return "arm64-v8a" if EVENT_SIZE == 24 else "armeabi-v7a"
+    if parts[0] == "echo":
+        return " ".join(parts[1:])
+    if parts[0] == "sleep" and len(parts) == 2:
+        time.sleep(float(parts[1]))
+        return None
+    if parts[0] == "sendevent":
+        time.sleep(SENDEVENT_MS / 1000.0)
+        return None
+    if parts[0] == "sh" and len(parts) == 2:
+        for line in _FILES.get(parts[1], []):
+            _run_line(serial, line)
+        return None
+    if parts[0] == "input":
+        delay = INPUT_MS
+        if parts[1:2] == ["swipe"] and len(parts) >= 7:
+            delay += int(parts[6]) * TIME_SCALE
+        time.sleep(delay / 1000.0)
+    return None
+
+
+def _run_line(serial: Optional[str], line: str) -> None:
+    for command in line.split(";"):
+        output = _run_one(serial, command.strip())
+        if output is not None:
+            sys.stdout.write(output + "\n")
+            sys.stdout.flush()
+
+
+def _exec_in(serial: Optional[str], command: str) -> int:
+    time.sleep(SPAWN_MS / 1000.0)
+    _log(serial, command)
+    fmt = "<qqHHi" if EVENT_SIZE == 24 else "<iiHHi"
+    stdin = sys.stdin.buffer
+    while True:
+        raw = stdin.read(EVENT_SIZE)
+        if len(raw) < EVENT_SIZE:
+            return 0
+        _, _, ev_type, code, value = struct.unpack(fmt, raw)
+        _log(serial, f"event {ev_type} {code} {value}")
+
+
+def main(argv: List[str]) -> int:
+    serial = None
+    if argv[:1] == ["-s"] and len(argv) >= 2:
+        serial, argv = argv[1], argv[2:]
+    if argv[:1] == ["exec-in"] and len(argv) == 2:
+        return _exec_in(serial, argv[1])
+    if argv[:1] != ["shell"]:
+        sys.stderr.write(f"fake_adb: unsupported command {argv}\n")
+        return 1
+
+    if len(argv) > 1:
+        time.sleep(SPAWN_MS / 1000.0)
+        _run_line(serial, " ".join(argv[1:]))
+        return 0
+
+    lines = iter(sys.stdin)
+    for line in lines:
+        if line.strip() == "exit":
+            break
+        heredoc = _HEREDOC.match(line.strip())
+        if heredoc is not None:
+            path, terminator = heredoc.groups()
+            _FILES[path] = []
+            for body_line in lines:
+                if body_line.rstrip("\r\n") == terminator:
+                    break
+                _FILES[path].append(body_line.rstrip("\r\n"))
+            continue
+        _run_line(serial, line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from actions.screen_state import (
+    FULL_REGION,
+    SCREEN_MATCH_THRESHOLD,
+    Frame,
+    capture_frame,
+    load_frame,
+    load_template,
+    load_templates,
+    match_score,
+    save_template,
+    template_dir_for,
+    template_from_frame,
+)
+from engine.portal_check import MINIMAP_REGION, SIGNATURE_KINDS, signature_path
+
+DEFAULT_ROUTE_ROOT = PROJECT_ROOT / "routes" / "natlan_v2"
+
+
+def _next_template_path(template_dir: str, state: str) -> str:
+    path = os.path.join(template_dir, f"{state}.json")
+    index = 1
+    while os.path.exists(path):
+        index += 1
+        path = os.path.join(template_dir, f"{state}.{index}.json")
+    return path
+
+
+def _frame(args: argparse.Namespace) -> Frame:
+    if args.frame:
+        return load_frame(str(args.frame))
+    frame = capture_frame(args.serial)
+    if args.save_frame:
+        args.save_frame.parent.mkdir(parents=True, exist_ok=True)
+        with args.save_frame.open("wb") as f:
+            f.write(struct.pack("<III", frame.width, frame.height, frame.pixel_format))
+            f.write(frame.pixels)
+        print(f"[INFO] raw frame saved to {args.save_frame}")
+    return frame
+
+
+def _write(args: argparse.Namespace, frame: Frame, state: str, path: str) -> int:
+    template = template_from_frame(frame, state, args.region, threshold=args.threshold)
+    print(f"[INFO] frame {frame.width}x{frame.height} format={frame.pixel_format} region={list(template.region)}")
+    if not args.apply:
+        print(f"[DRY-RUN] Would write {path}. Add --apply to save it.")
+        return 0
+    save_template(template, path)
+    print(f"[DONE] {path}")
+    return 0
+
+
+def cmd_capture(args: argparse.Namespace) -> int:
+    template_dir = args.template_dir or template_dir_for(args.mapping)
+    return _write(args, _frame(args), args.state, _next_template_path(template_dir, args.state))
+
+
+def cmd_signature(args: argparse.Namespace) -> int:
+    path = signature_path(str(args.route_root), args.mapping, args.route, args.kind)
+    if os.path.exists(path):
+        print(f"[INFO] Replacing existing signature {path}")
+    return _write(args, _frame(args), f"{args.route}.{args.kind}", path)
+
+
+def cmd_check(args: argparse.Namespace) -> int:
+    template_dir = args.template_dir or template_dir_for(args.mapping)
+    templates = load_templates(template_dir)
+    if args.route is not None:
+        for kind in SIGNATURE_KINDS:
+            path = signature_path(str(args.route_root), args.mapping, args.route, kind)
+            if os.path.exists(path):
+                signature = load_template(path)
+                templates.setdefault(signature.state, []).append(signature)
+    for frame_path in args.frames:
+        frame = load_frame(str(frame_path))
+        matched: List[str] = []
+        for state in sorted(templates):
+            for template in templates[state]:
+                score = match_score(frame, template)
+                hit = score <= template.threshold
+                if hit and state not in matched:
+                    matched.append(state)
+                print(
+                    f"[CHECK] {frame_path.name} {template.name}: score={score:.1f} "
+                    f"threshold={template.threshold:.1f} {'MATCH' if hit else '-'}"
+                )
+        print(f"[STATE] {frame_path.name}: {', '.join(matched) or 'none'}")
+    if not templates:
+        print(f"[ERROR] No templates in {template_dir}")
+        return 1
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Build and check the screen-state templates used by AUTO_SCREEN_STATE=1 "
+            "(map_open, loaded). Frames are raw `adb exec-out screencap` dumps."
+        )
+    )
+    parser.add_argument("--mapping", required=True, help="Mapping module of the device, e.g. mapping.oppo_findx9pro.")
+    parser.add_argument("--template-dir", help="Override the template directory (default: AUTO_SCREEN_TEMPLATE_DIR/<mapping>).")
+
+    parser.add_argument("--route-root", type=Path, default=DEFAULT_ROUTE_ROOT, help="Route directory (portal signatures).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_capture_args(command: argparse.ArgumentParser, default_region, region_help: str) -> None:
+        command.add_argument("--frame", type=Path, help="Raw screencap dump to use instead of the device.")
+        command.add_argument("--serial", default=os.environ.get("ANDROID_SERIAL"), help="adb serial.")
+        command.add_argument("--save-frame", type=Path, help="Also keep the captured raw frame (fixture for `check`).")
+        command.add_argument(
+            "--region",
+            type=float,
+            nargs=4,
+            default=list(default_region),
+            metavar=("X0", "Y0", "X1", "Y1"),
+            help=region_help,
+        )
+        command.add_argument(
+            "--threshold",
+            type=float,
+            default=SCREEN_MATCH_THRESHOLD,
+            help=f"Max mean gray difference that still matches. Default: {SCREEN_MATCH_THRESHOLD}",
+        )
+        command.add_argument("--apply", action="store_true", help="Write the file. Without it only prints the plan.")
+
+    capture = sub.add_parser("capture", help="Create a screen-state template from the current screen or a saved frame.")
+    capture.add_argument("--state", required=True, help="State name, e.g. map_open or loaded.")
+    add_capture_args(capture, FULL_REGION, "Normalized region to compare; pick static UI (map close button, HUD icons).")
+    capture.set_defaults(func=cmd_capture)
+
+    signature = sub.add_parser(
+        "signature", help="Store the minimap/HUD signature of where a route's PORTAL or NEXT_PORTAL lands."
+    )
+    signature.add_argument("--route", type=int, required=True, help="Route suffix.")
+    signature.add_argument("--kind", choices=SIGNATURE_KINDS, default="portal")
+    add_capture_args(signature, MINIMAP_REGION, f"Normalized minimap/HUD region. Default: {list(MINIMAP_REGION)}")
+    signature.set_defaults(func=cmd_signature)
+
+    check = sub.add_parser("check", help="Score saved frames against the templates (offline).")
+    check.add_argument("frames", type=Path, nargs="+", help="Raw screencap dumps.")
+    check.add_argument("--route", type=int, help="Also score against this route's portal signatures.")
+    check.set_defaults(func=cmd_check)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from recording.trim import MOTION_THRESHOLD, PAD_SEC, TrimDecision, analyze, trim
+
+MANIFEST_NAME = "_trim_manifest.json"
+TRIM_SUFFIX = ".trim.mp4"
+
+
+def _iter_segments(base_dir: Path) -> List[Path]:
+    """Finished segment files: <label>/<segment dir>/<config_id>.mp4, skipping _raw, staging leftovers and outputs."""
+    paths: List[Path] = []
+    for path in sorted(base_dir.rglob("*.mp4")):
+        rel_parts = path.relative_to(base_dir).parts
+        if any(part.startswith(("_", ".")) for part in rel_parts[:-1]):
+            continue
+        if path.name.endswith((TRIM_SUFFIX, ".part.mp4")):
+            continue
+        paths.append(path)
+    return paths
+
+
+def _output_path(source: Path, in_place: bool) -> Path:
+    return source if in_place else source.with_name(source.name[: -len(".mp4")] + TRIM_SUFFIX)
+
+
+def _stat(path: Path) -> Dict[str, float]:
+    st = path.stat()
+    return {"size": st.st_size, "mtime": round(st.st_mtime, 3)}
+
+
+def _load_manifest(path: Path) -> Dict[str, dict]:
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(path: Path, manifest: Dict[str, dict]) -> None:
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _is_done(entry: Optional[dict], source: Path, output: Path) -> bool:
+    """The manifest already describes the current files (an in-place trim left the output in source)."""
+    if entry is None or not output.exists():
+        return False
+    if output == source:
+        return entry.get("output_stat") == _stat(output)
+    return entry.get("source_stat") == _stat(source) and entry.get("output_stat") == _stat(output)
+
+
+def _analyze(job: Tuple[str, float, float]) -> TrimDecision:
+    path, threshold, pad = job
+    return analyze(path, threshold, pad)
+
+
+def _trim(job: Tuple[TrimDecision, str]) -> str:
+    decision, output = job
+    return trim(decision, output)
+
+
+def _finished_decision(base_dir: Path, entry: dict) -> Tuple[TrimDecision, Path]:
+    """(decision that re-cuts a finished file, its output) from its manifest entry."""
+    source = base_dir / entry["path"]
+    output = base_dir / entry["output"]
+    if output == source:
+        # In-place: the source already is the trimmed cut, starting at 0.
+        length = entry["end"] - entry["start"]
+        return TrimDecision(str(source), length, 0.0, length, 0.0, length), output
+    fields = ("duration", "active_start", "active_end", "start", "end")
+    return TrimDecision(str(source), *(entry[key] for key in fields)), output
+
+
+def _normalize(
+    decisions: Sequence[TrimDecision], finished: Sequence[TrimDecision] = ()
+) -> Tuple[Dict[str, List[TrimDecision]], List[TrimDecision]]:
+    """Per segment directory, shorten every cut to the shortest one so all configs last the same.
+
+    `finished` are files of earlier runs (from the manifest); they count towards the
+    shortest length of their directory. -> (new decisions by directory, finished files to re-cut).
+    """
+    by_dir: Dict[str, List[TrimDecision]] = defaultdict(list)
+    for decision in decisions:
+        by_dir[os.path.dirname(decision.path)].append(decision)
+    finished_by_dir: Dict[str, List[TrimDecision]] = defaultdict(list)
+    for decision in finished:
+        finished_by_dir[os.path.dirname(decision.path)].append(decision)
+    recut: List[TrimDecision] = []
+    for directory, group in by_dir.items():
+        done = finished_by_dir.get(directory, [])
+        target = min(decision.length for decision in [*group, *done])
+        by_dir[directory] = [decision.with_length(target) for decision in group]
+        recut += [decision.with_length(target) for decision in done if decision.length > target + 1e-3]
+    return by_dir, recut
+
+
+def _print_plan(base_dir: Path, by_dir: Dict[str, List[TrimDecision]]) -> None:
+    for directory in sorted(by_dir):
+        group = by_dir[directory]
+        lead = sum(d.start for d in group) / len(group)
+        tail = sum(d.duration - d.end for d in group) / len(group)
+        before = [d.duration for d in group]
+        after = [d.length for d in group]
+        print(
+            f"[TRIM] {Path(directory).relative_to(base_dir)}: {len(group)} files, "
+            f"lead-in -{lead:.2f}s tail -{tail:.2f}s avg, "
+            f"length {min(before):.2f}-{max(before):.2f}s -> {min(after):.2f}-{max(after):.2f}s"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Trim idle lead-in and tail off finished segment recordings (frame-difference analysis, "
+            "keyframe-aware stream copy), optionally normalizing every segment directory to one duration."
+        )
+    )
+    parser.add_argument("--base-dir", type=Path, required=True, help="VIDEO_BASE of one device.")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Worker processes.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=MOTION_THRESHOLD,
+        help=f"Mean gray-level difference per pixel that counts as motion. Default: {MOTION_THRESHOLD}",
+    )
+    parser.add_argument("--pad", type=float, default=PAD_SEC, help=f"Seconds kept around motion. Default: {PAD_SEC}")
+    parser.add_argument(
+        "--normalize",
+        action="store_true",
+        help="Cut all configs of a segment directory to the shortest trimmed length.",
+    )
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help=f"Replace the originals instead of writing <config_id>{TRIM_SUFFIX} next to them.",
+    )
+    parser.add_argument("--force", action="store_true", help="Re-analyze files the manifest marks as trimmed.")
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Actually write the trimmed files. Without this flag the script only prints the plan.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    base_dir = args.base_dir.expanduser().resolve()
+    if not base_dir.exists():
+        raise FileNotFoundError(f"Recording directory not found: {base_dir}")
+
+    manifest_path = base_dir / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path)
+    sources: List[Path] = []
+    finished: Dict[str, Tuple[TrimDecision, Path]] = {}
+    for path in _iter_segments(base_dir):
+        key = path.relative_to(base_dir).as_posix()
+        if not args.force and _is_done(manifest.get(key), path, _output_path(path, args.in_place)):
+            finished[key] = _finished_decision(base_dir, manifest[key])
+        else:
+            sources.append(path)
+    print(f"[INFO] base_dir={base_dir}")
+    print(f"[INFO] segments to analyze={len(sources)} jobs={args.jobs}")
+    if not sources:
+        return 0
+
+    failures: List[str] = []
+    trimmed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        decisions: List[TrimDecision] = []
+        jobs = [(str(path), args.threshold, args.pad) for path in sources]
+        for path, future in zip(sources, [pool.submit(_analyze, job) for job in jobs]):
+            try:
+                decisions.append(future.result())
+            except Exception as exc:
+                failures.append(f"{path}: {exc}")
+
+        recut: List[TrimDecision] = []
+        if args.normalize:
+            by_dir, recut = _normalize(decisions, [decision for decision, _ in finished.values()])
+        else:
+            by_dir = defaultdict(list)
+            for decision in decisions:
+                by_dir[os.path.dirname(decision.path)].append(decision)
+        _print_plan(base_dir, by_dir)
+        for decision in recut:
+            print(f"[TRIM] re-cut finished {Path(decision.path).relative_to(base_dir)} to {decision.length:.2f}s")
+
+        if not args.apply:
+            print("\n[DRY-RUN] Add --apply to write the trimmed files.")
+            return 0
+
+        planned = [decision for group in by_dir.values() for decision in group]
+        outputs = [str(_output_path(Path(decision.path), args.in_place)) for decision in planned]
+        futures = [pool.submit(_trim, (decision, output)) for decision, output in zip(planned, outputs)]
+        recut_outputs = [str(finished[Path(d.path).relative_to(base_dir).as_posix()][1]) for d in recut]
+        recut_futures = [pool.submit(_trim, (decision, output)) for decision, output in zip(recut, recut_outputs)]
+        for decision, output, future in zip(recut, recut_outputs, recut_futures):
+            source = Path(decision.path)
+            try:
+                future.result()
+            except Exception as exc:
+                failures.append(f"{source}: {exc}")
+                continue
+            trimmed += 1
+            entry = manifest[source.relative_to(base_dir).as_posix()]
+            # In-place cuts start at 0 of the earlier output, so only the end moves on the original timeline.
+            entry["end"] = entry["start"] + decision.length
+            entry["normalized"] = True
+            entry["output_stat"] = _stat(Path(output))
+        for decision, output, future in zip(planned, outputs, futures):
+            source = Path(decision.path)
+            try:
+                future.result()
+            except Exception as exc:
+                failures.append(f"{source}: {exc}")
+                continue
+            trimmed += 1
+            manifest[source.relative_to(base_dir).as_posix()] = {
+                **asdict(decision),
+                "path": source.relative_to(base_dir).as_posix(),
+                "output": Path(output).relative_to(base_dir).as_posix(),
+                "threshold": args.threshold,
+                "pad": args.pad,
+                "normalized": args.normalize,
+                "source_stat": None if args.in_place else _stat(source),
+                "output_stat": _stat(Path(output)),
+            }
+    _save_manifest(manifest_path, manifest)
+
+    for failure in failures:
+        print(f"[FAIL] {failure}")
+    print(f"\n[DONE] Trimmed {trimmed} files, manifest {manifest_path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())